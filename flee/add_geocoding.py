@@ -1,18 +1,21 @@
 """
 주소를 좌표(위도, 경도)로 변환하여 Supabase에 추가
+(--local: 로컬 DB fleamarket.db에 추가)
+(--grouped: 같은 장소는 1번만 조회하고 같은 좌표끼리 묶어 update로 반영)
 """
 import os
-import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 from dotenv import load_dotenv
-from supabase import create_client
 
-load_dotenv()
+from geocode_cache import get_geocode_cache
+from gazetteer import get_gazetteer
+from geocoder import GeocodeEngine, get_kakao_bucket
+from supabase_manager import MARKET_CHUNK_SIZE, count_rows, get_supabase, iter_rows, update_coordinates_by_url
 
-# Supabase 설정
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+load_dotenv()
 
 # Kakao API (무료, 하루 300,000회)
 KAKAO_API_KEY = os.getenv("KAKAO_REST_API_KEY")
@@ -20,6 +23,11 @@ KAKAO_API_KEY = os.getenv("KAKAO_REST_API_KEY")
 # 또는 Google Geocoding API
 # GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# 좌표 없는 행사 (서버 필터)
+NO_COORDS_FILTER = [("or_", "lat.is.null,lng.is.null")]
+
+FAILURE_LOG_FILE = "geocoding_failures.json"
+
 
 def clean_place_text(text):
     """장소명 정제 - 검색에 방해되는 요소 제거"""
@@ -43,10 +51,17 @@ def clean_place_text(text):
     return cleaned.strip()
 
 
-def geocode_kakao_address(address):
-    """Kakao Address Search API - 주소 검색"""
+def geocode_kakao_address(address, errors=None):
+    """
+    Kakao Address Search API - 주소 검색
+
+    Args:
+        errors: 리스트를 넘기면 API 키 누락/요청 오류를 기록 (결과 없음과 구분, 실패 캐시 여부 판단용)
+    """
     if not KAKAO_API_KEY:
         print("⚠️  KAKAO_API_KEY가 없습니다. .env에 추가하세요.")
+        if errors is not None:
+            errors.append("KAKAO_REST_API_KEY 없음")
         return None
 
     url = "https://dapi.kakao.com/v2/local/search/address.json"
@@ -54,6 +69,7 @@ def geocode_kakao_address(address):
     params = {"query": address}
 
     try:
+        get_kakao_bucket().acquire()  # 모든 스레드 공용 요청 한도
         response = requests.get(url, headers=headers, params=params, timeout=5)
         response.raise_for_status()
         data = response.json()
@@ -68,13 +84,17 @@ def geocode_kakao_address(address):
             }
     except Exception as e:
         print(f"  ⚠️  Address Search 오류: {e}")
+        if errors is not None:
+            errors.append(str(e))
 
     return None
 
 
-def geocode_kakao_keyword(keyword):
+def geocode_kakao_keyword(keyword, errors=None):
     """Kakao Keyword Search API - 장소명 검색"""
     if not KAKAO_API_KEY:
+        if errors is not None:
+            errors.append("KAKAO_REST_API_KEY 없음")
         return None
 
     url = "https://dapi.kakao.com/v2/local/search/keyword.json"
@@ -82,6 +102,7 @@ def geocode_kakao_keyword(keyword):
     params = {"query": keyword}
 
     try:
+        get_kakao_bucket().acquire()  # 모든 스레드 공용 요청 한도
         response = requests.get(url, headers=headers, params=params, timeout=5)
         response.raise_for_status()
         data = response.json()
@@ -97,11 +118,13 @@ def geocode_kakao_keyword(keyword):
             }
     except Exception as e:
         print(f"  ⚠️  Keyword Search 오류: {e}")
+        if errors is not None:
+            errors.append(str(e))
 
     return None
 
 
-def geocode_kakao(address):
+def geocode_kakao(address, errors=None):
     """
     다단계 Geocoding 전략:
     1. Address Search (주소 검색)
@@ -111,13 +134,13 @@ def geocode_kakao(address):
     print(f"  🔍 검색 시작: '{address}'")
 
     # Step 1: Address Search
-    result = geocode_kakao_address(address)
+    result = geocode_kakao_address(address, errors)
     if result:
         print(f"  ✅ [주소검색] 성공: {result['method']}")
         return result
 
     # Step 2: Keyword Search (원본)
-    result = geocode_kakao_keyword(address)
+    result = geocode_kakao_keyword(address, errors)
     if result:
         print(f"  ✅ [키워드검색-원본] 성공: {result.get('place_name', '')}")
         return result
@@ -126,7 +149,33 @@ def geocode_kakao(address):
     cleaned = clean_place_text(address)
     if cleaned and cleaned != address:
         print(f"  🧹 정제 시도: '{cleaned}'")
-        result = geocode_kakao_keyword(cleaned)
+        result = geocode_kakao_keyword(cleaned, errors)
+        if result:
+            print(f"  ✅ [키워드검색-정제] 성공: {result.get('place_name', '')}")
+            return result
+
+    return None
+
+
+def geocode_kakao_parallel(address, errors=None):
+    """
+    geocode_kakao와 같은 우선순위로 결과를 고르되 주소 검색과 키워드 검색(원본)을 동시에 요청
+    (요청 수는 늘지만 대기 시간이 짧음 → 처리할 장소가 적을 때 사용)
+    """
+    print(f"  🔍 검색 시작 (동시): '{address}'")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        by_address = pool.submit(geocode_kakao_address, address, errors)
+        by_keyword = pool.submit(geocode_kakao_keyword, address, errors)
+        result = by_address.result() or by_keyword.result()
+    if result:
+        print(f"  ✅ [{result['method']}] 성공: {result.get('place_name', '')}")
+        return result
+
+    cleaned = clean_place_text(address)
+    if cleaned and cleaned != address:
+        print(f"  🧹 정제 시도: '{cleaned}'")
+        result = geocode_kakao_keyword(cleaned, errors)
         if result:
             print(f"  ✅ [키워드검색-정제] 성공: {result.get('place_name', '')}")
             return result
@@ -134,7 +183,7 @@ def geocode_kakao(address):
     return None
 
 
-def geocode_google(address):
+def geocode_google(address, errors=None):
     """Google Geocoding API로 주소 → 좌표 변환"""
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
     
@@ -162,10 +211,230 @@ def geocode_google(address):
             }
     except Exception as e:
         print(f"  ❌ Geocoding 오류: {e}")
+        if errors is not None:
+            errors.append(str(e))
     
     return None
 
 
+def geocode_place(place, parallel=False):
+    """
+    장소명 → 좌표 (모든 지오코딩 진입점 공용)
+    캐시 → 오프라인 장소 사전 → Kakao → Google 순서, 결과는 실패 포함 캐시에 저장 (요청 오류로 실패한 경우는 저장 안 함)
+
+    Args:
+        parallel: True면 Kakao 주소/키워드 검색을 동시에 요청 (geocode_kakao_parallel)
+    """
+    cache = get_geocode_cache()
+    found, coords = cache.lookup(place)
+    if found:
+        print(f"  🗃️  캐시 {'적중' if coords else '적중 (최근 실패한 장소)'}: '{place}'")
+        return coords
+
+    # 자주 나오는 역/공원/시장 등은 오프라인 사전으로 (낮은 신뢰도면 API 조회)
+    gazetteer = get_gazetteer()
+    coords = gazetteer.lookup(place)
+    if coords:
+        print(f"  📖 사전 적중: '{place}' → {coords['place_name']} (점수 {coords['confidence']:.2f})")
+        return coords
+
+    errors = []
+    kakao = geocode_kakao_parallel if parallel else geocode_kakao
+    coords, provider = kakao(place, errors), "kakao"
+    if not coords:
+        coords, provider = geocode_google(place, errors), "google"
+
+    if coords:
+        coords["provider"] = provider
+        cache.store(place, coords, provider)
+        gazetteer.add(place, coords["lat"], coords["lng"], "history")
+    elif not errors:
+        cache.store(place, None)
+    return coords
+
+
+def save_failed_cases(failed_cases, log_file=FAILURE_LOG_FILE, stats=None):
+    """
+    실패 케이스를 구조화된 리포트로 저장 (없으면 저장 안 함)
+    {"generated_at", "total", "by_reason": {사유: 개수}, "stats", "failures": [...]}
+    """
+    if not failed_cases:
+        return
+    import json
+    from collections import Counter
+    from datetime import datetime
+
+    report = {
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "total": len(failed_cases),
+        "by_reason": dict(Counter(case["reason"] for case in failed_cases).most_common()),
+        "stats": stats or {},
+        "failures": failed_cases,
+    }
+    with open(log_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📋 실패 케이스가 '{log_file}'에 저장되었습니다.")
+    print(f"   파일을 확인하여 수동으로 수정하거나 프롬프트를 개선하세요.")
+
+
+def group_by_place(markets):
+    """
+    행사를 정제한 장소명(캐시 키) 기준으로 묶음
+
+    Returns:
+        (정제 키 → 행사 리스트, 장소 정보 없는 행사 리스트)
+    """
+    from geocode_cache import normalize_key
+
+    groups = {}
+    no_place = []
+    for market in markets:
+        place = market.get("place")
+        key = normalize_key(place) if place and place != "미정" else ""
+        if key:
+            groups.setdefault(key, []).append(market)
+        else:
+            no_place.append(market)
+    return groups, no_place
+
+
+def _failed_case(market, reason):
+    return {
+        "id": market["id"],
+        "url": market.get("url"),
+        "market_name": market["market_name"],
+        "place": market["place"],
+        "reason": reason,
+    }
+
+
+def geocode_by_place(markets):
+    """
+    행사를 장소별로 묶어 장소마다 1번만 지오코딩
+
+    Args:
+        markets: {"id", "url", "market_name", "place"} 리스트
+
+    Returns:
+        ([(행사, 좌표)], 실패 케이스 리스트, 통계 dict)
+    """
+    cache_before = dict(get_geocode_cache().stats)
+    gazetteer_before = get_gazetteer().stats["hits"]
+    groups, no_place = group_by_place(markets)
+    failed_cases = [_failed_case(market, "장소 정보 없음") for market in no_place]
+
+    found = []
+    with GeocodeEngine() as engine:
+        results = engine.imap(list(groups.values()), place_of=lambda group: group[0]["place"])
+        for i, (group, coords) in enumerate(results, 1):
+            label = group[0]["place"][:30]
+            if not coords:
+                print(f"[{i}/{len(groups)}] ❌ {label} - Geocoding 실패 (행사 {len(group)}개)")
+                failed_cases.extend(_failed_case(market, "Geocoding 실패 (모든 검색 방법 실패)") for market in group)
+                continue
+            print(f"[{i}/{len(groups)}] ✅ {label} ({coords['lat']:.6f}, {coords['lng']:.6f}) → 행사 {len(group)}개")
+            found.extend((market, coords) for market in group)
+    engine.print_stats()
+
+    # 이번 호출의 캐시 적중 (프로세스 공용 캐시라 호출 전 값과의 차이)
+    cache = {key: value - cache_before.get(key, 0) for key, value in get_geocode_cache().stats.items()}
+    lookups = cache["hits"] + cache["negative_hits"] + cache["misses"]
+    stats = {
+        "markets": len(markets),
+        "unique_places": len(groups),
+        # 장소별로 묶지 않았다면 행사마다 조회했을 횟수 - 실제 조회한 장소 수
+        "api_calls_saved": sum(len(group) for group in groups.values()) - len(groups),
+        "geocoded": len(found),
+        "cache_hits": cache["hits"] + cache["negative_hits"],
+        "cache_misses": cache["misses"],
+        "cache_hit_rate": (lookups - cache["misses"]) / lookups if lookups else 0.0,
+        "coalesced": engine.stats["coalesced"],
+        "gazetteer_hits": get_gazetteer().stats["hits"] - gazetteer_before,
+    }
+    return found, failed_cases, stats
+
+
+def geocode_markets_grouped(markets, chunk_size=MARKET_CHUNK_SIZE):
+    """
+    좌표 없는 행사를 장소별로 묶어 장소마다 1번만 지오코딩 → 좌표만 url 기준 update로 Supabase에 반영
+    - 조회 시점의 장소와 같을 때만 갱신 (그사이 동기화로 장소가 바뀐 행사는 건드리지 않음)
+
+    Args:
+        markets: {"id", "url", "market_name", "place"} 리스트
+
+    Returns:
+        (통계 dict, 실패 케이스 리스트)
+    """
+    found, failed_cases, stats = geocode_by_place(markets)
+    rows = [
+        {"url": market["url"], "place": market["place"], "lat": coords["lat"], "lng": coords["lng"]}
+        for market, coords in found
+    ]
+
+    updated, sent, failed_urls = update_coordinates_by_url(rows, chunk_size)
+    failed_cases.extend(
+        _failed_case(market, "DB 업데이트 실패") for market, _ in found if market["url"] in failed_urls
+    )
+
+    stats.update({
+        "updated": updated,
+        "failed": len(failed_cases),
+        "write_requests": sent,
+        "rows_per_request": updated / sent if sent else 0.0,
+    })
+    return stats, failed_cases
+
+
+def geocode_new_markets(failure_log=FAILURE_LOG_FILE, db_path=None):
+    """
+    파이프라인용 증분 지오코딩 (입력 대기 없음)
+    - 로컬 DB에서 좌표 없는 행사(신규, 또는 장소가 바뀌어 좌표가 초기화된 행사)만 장소별로 묶어 조회
+    - 좌표는 로컬 DB에 저장하고 같은 트랜잭션에서 Supabase 복제 대기열(outbox)에 기록
+
+    Returns:
+        통계 dict (geocode_by_place 통계 + "updated", "failed", "failure_report")
+    """
+    from db_manager import DB_PATH, fetch_markets_without_coordinates, update_coordinates
+
+    db_path = db_path or DB_PATH
+    markets = fetch_markets_without_coordinates(db_path)
+    print(f"🎯 좌표 없음: {len(markets)}개")
+
+    found, failed_cases, stats = geocode_by_place(markets)
+    coords_by_url = {market["url"]: (coords["lat"], coords["lng"]) for market, coords in found}
+    stats["updated"] = update_coordinates(coords_by_url, db_path, outbox=True) if coords_by_url else 0
+    stats["failed"] = len(failed_cases)
+    stats["failure_report"] = failure_log if failed_cases else None
+    save_failed_cases(failed_cases, failure_log, stats)
+    return stats
+
+
+def add_coordinates_grouped(chunk_size=MARKET_CHUNK_SIZE):
+    """Supabase의 좌표 없는 행사를 장소별로 묶어 좌표 추가 (lat, lng 컬럼이 이미 있어야 함)"""
+    print("=" * 80)
+    print("🗺️ 주소 → 좌표 변환 (장소별 묶음) 및 Supabase 일괄 업데이트")
+    print("=" * 80)
+
+    markets = list(iter_rows("markets", "url, market_name, place", NO_COORDS_FILTER))
+    print(f"🎯 좌표 없음: {len(markets)}개\n")
+    if not markets:
+        print("✅ 모든 행사에 좌표가 있습니다!")
+        return
+
+    stats, failed_cases = geocode_markets_grouped(markets, chunk_size)
+
+    print("=" * 80)
+    print(f"✅ 좌표 변환 완료")
+    print(f"   고유 장소: {stats['unique_places']}개 (행사 {stats['markets']}개, API 조회 {stats['api_calls_saved']}회 절약)")
+    print(f"   성공: {stats['updated']}개")
+    print(f"   실패: {stats['failed']}개")
+    print(f"   update 요청: {stats['write_requests']}회 (요청당 {stats['rows_per_request']:.1f}행)")
+    print("=" * 80)
+    get_geocode_cache().print_stats()
+    get_gazetteer().print_stats()
+    save_failed_cases(failed_cases)
+
+
 def add_coordinates_to_supabase():
     """Supabase의 모든 행사에 좌표 추가"""
 
@@ -190,7 +459,9 @@ ADD COLUMN IF NOT EXISTS lng DOUBLE PRECISION;
 CREATE INDEX IF NOT EXISTS idx_markets_location ON markets(lat, lng);
 """)
     print()
-    input("위 쿼리를 실행한 후 Enter를 누르세요...")
+    # 터미널에서 직접 실행할 때만 대기 (스케줄러/파이프라인에서는 바로 진행)
+    if sys.stdin.isatty():
+        input("위 쿼리를 실행한 후 Enter를 누르세요...")
     
     # 2. 좌표 없는 데이터 가져오기
     print()
@@ -198,29 +469,29 @@ CREATE INDEX IF NOT EXISTS idx_markets_location ON markets(lat, lng);
     print("-" * 80)
     
     try:
-        response = supabase.table("markets").select("id, market_name, place, lat, lng").execute()
-        markets = response.data
-        
-        print(f"📊 총 {len(markets)}개 행사")
-        
-        # 좌표 없는 것만 필터링
-        no_coords = [m for m in markets if not m.get("lat") or not m.get("lng")]
-        print(f"🎯 좌표 없음: {len(no_coords)}개")
+        # 좌표 없는 행사만 서버에서 걸러 페이지 단위로 조회 (전체 테이블을 내려받지 않음)
+        total = count_rows("markets", NO_COORDS_FILTER)
+        print(f"🎯 좌표 없음: {total}개")
         print()
         
-        if not no_coords:
+        if not total:
             print("✅ 모든 행사에 좌표가 있습니다!")
             return
         
+        no_coords = iter_rows("markets", "market_name, place", NO_COORDS_FILTER)
+        
         success = 0
         fail = 0
         
-        for i, market in enumerate(no_coords, 1):
+        # 여러 장소를 동시에 조회 (요청 한도는 공유 토큰 버킷이 관리, 결과는 조회 순서대로)
+        engine = GeocodeEngine()
+        results = engine.imap(no_coords, place_of=lambda m: m["place"] if m.get("place") and m["place"] != "미정" else None)
+        for i, (market, coords) in enumerate(results, 1):
             market_id = market["id"]
             market_name = market["market_name"]
             place = market["place"]
             
-            print(f"[{i}/{len(no_coords)}] {market_name[:30]}")
+            print(f"[{i}/{total}] {market_name[:30]}")
             print(f"  장소: {place}")
             
             if not place or place == "미정":
@@ -234,23 +505,16 @@ CREATE INDEX IF NOT EXISTS idx_markets_location ON markets(lat, lng);
                 fail += 1
                 continue
 
-            # Geocoding 시도
-            coords = geocode_kakao(place)
-
-            # Kakao 실패시 Google 시도
-            if not coords:
-                coords = geocode_google(place)
-
             if coords:
                 # Supabase 업데이트
                 try:
-                    supabase.table("markets").update({
+                    get_supabase().table("markets").update({
                         "lat": coords["lat"],
                         "lng": coords["lng"]
                     }).eq("id", market_id).execute()
 
                     print(f"  ✅ 좌표: ({coords['lat']:.6f}, {coords['lng']:.6f})")
-                    print(f"  📍 방법: {coords.get('method', 'google')}")
+                    print(f"  📍 방법: {coords.get('method') or coords.get('provider', 'google')}")
                     success += 1
                 except Exception as e:
                     print(f"  ❌ 업데이트 실패: {e}")
@@ -270,25 +534,19 @@ CREATE INDEX IF NOT EXISTS idx_markets_location ON markets(lat, lng);
                     "reason": "Geocoding 실패 (모든 검색 방법 실패)"
                 })
                 fail += 1
-            
-            # API 제한 방지 (초당 10회)
-            time.sleep(0.1)
             print()
+        engine.close()
         
         print("=" * 80)
         print(f"✅ 좌표 변환 완료")
         print(f"   성공: {success}개")
         print(f"   실패: {fail}개")
         print("=" * 80)
+        engine.print_stats()
+        get_geocode_cache().print_stats()
+        get_gazetteer().print_stats()
 
-        # 실패 케이스 저장
-        if failed_cases:
-            import json
-            log_file = "geocoding_failures.json"
-            with open(log_file, 'w', encoding='utf-8') as f:
-                json.dump(failed_cases, f, ensure_ascii=False, indent=2)
-            print(f"\n📋 실패 케이스가 '{log_file}'에 저장되었습니다.")
-            print(f"   파일을 확인하여 수동으로 수정하거나 프롬프트를 개선하세요.")
+        save_failed_cases(failed_cases)
 
     except Exception as e:
         print(f"❌ 오류: {e}")
@@ -296,6 +554,51 @@ CREATE INDEX IF NOT EXISTS idx_markets_location ON markets(lat, lng);
         traceback.print_exc()
 
 
+def add_coordinates_to_local_db():
+    """로컬 DB(fleamarket.db)의 좌표 없는 행사에 좌표 추가 (지도 범위 검색용)"""
+    from db_manager import fetch_markets_without_coordinates, update_coordinates
+
+    print("=" * 80)
+    print("🗺️ 주소 → 좌표 변환 및 로컬 DB 업데이트")
+    print("=" * 80)
+
+    markets = fetch_markets_without_coordinates()
+    print(f"🎯 좌표 없음: {len(markets)}개\n")
+
+    coords_by_url = {}
+    fail = 0
+    # 같은 장소는 진행 중인 조회를 함께 사용 (GeocodeEngine), 끝난 장소는 캐시에서 바로 반환
+    with GeocodeEngine() as engine:
+        results = engine.imap(markets, place_of=lambda m: m["place"] if m["place"] and m["place"] != "미정" else None)
+        for i, (market, coords) in enumerate(results, 1):
+            if not market["place"] or market["place"] == "미정":
+                fail += 1
+                continue
+
+            if coords:
+                coords_by_url[market["url"]] = (coords["lat"], coords["lng"])
+                print(f"[{i}/{len(markets)}] ✅ {market['market_name'][:30]} ({coords['lat']:.6f}, {coords['lng']:.6f})")
+            else:
+                fail += 1
+                print(f"[{i}/{len(markets)}] ❌ {market['market_name'][:30]} - Geocoding 실패")
+    engine.print_stats()
+
+    updated = update_coordinates(coords_by_url)
+
+    print("=" * 80)
+    print(f"✅ 좌표 변환 완료")
+    print(f"   성공: {updated}개")
+    print(f"   실패: {fail}개")
+    print("=" * 80)
+    get_geocode_cache().print_stats()
+    get_gazetteer().print_stats()
+
+
 if __name__ == "__main__":
-    add_coordinates_to_supabase()
+    if "--local" in sys.argv:
+        add_coordinates_to_local_db()
+    elif "--grouped" in sys.argv:
+        add_coordinates_grouped()
+    else:
+        add_coordinates_to_supabase()
 
@@ -0,0 +1,399 @@
+"""
+비동기 LLM 정제 엔진 (AsyncOpenAI)
+- 게시글마다 텍스트 → (필드 재질의) → 이미지 → 보정 단계를 코루틴 체인으로 실행
+- 모든 호출이 하나의 RateLimiter를 공유
+  · 응답의 x-ratelimit-remaining-requests / remaining-tokens 헤더로 남은 한도 추적
+  · 한도가 바닥나면 x-ratelimit-reset-* 시각까지 대기
+- 429 / 5xx / 연결 오류는 지터가 있는 지수 백오프로 재시도
+"""
+import asyncio
+import os
+import random
+import re
+import time
+
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, RateLimitError
+
+from llm_processor import (
+    LLM_STATS,
+    COMBINED_CONTEXT_CHARS,
+    IMAGE_MODE,
+    REASK_CONTEXT_CHARS,
+    apply_fixed_fields,
+    build_image_messages,
+    build_messages,
+    finalize_result,
+    find_invalid_fields,
+    has_date_hint,
+    image_result_from_combined,
+    is_missing_info,
+    lookup_image,
+    merge_combined_result,
+    parse_json_output,
+    record_usage,
+)
+from image_cache import get_image_cache
+from output_schema import MARKET_RESPONSE_FORMAT
+from prompt_templates import (
+    get_text_prompt,
+    get_image_prompt,
+    get_refine_prompt,
+    get_fix_fields_prompt,
+    get_combined_image_prompt,
+)
+
+MODEL = "gpt-4o-mini"
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))  # 동시 요청 상한
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0    # 초
+BACKOFF_CAP = 60.0    # 초
+
+# 한도가 이 값 이하로 남으면 리셋 시각까지 대기
+SAFETY_REQUESTS = 1
+SAFETY_TOKENS = 2000
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_reset(value):
+    """"6m0s", "1.5s", "120ms" 형식 → 초"""
+    if not value:
+        return 0.0
+    return sum(float(num) * _UNIT_SECONDS[unit] for num, unit in _DURATION_RE.findall(value))
+
+
+def estimate_tokens(messages, max_tokens):
+    """요청 토큰 대략치 (한글 ≈ 2자/토큰, 이미지 ≈ 800토큰)"""
+    total = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            total += len(content) // 2
+        else:
+            for part in content:
+                total += len(part.get("text", "")) // 2 if part["type"] == "text" else 800
+    return total + (max_tokens or 1000)
+
+
+def backoff_delay(attempt):
+    """full jitter 지수 백오프"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+class RateLimiter:
+    """모든 코루틴이 공유하는 요청/토큰 한도 추적기"""
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, est_tokens):
+        """남은 한도가 충분해질 때까지 대기 후 예상 사용량만큼 미리 차감"""
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self.paused_until - now
+                if (self.remaining_requests is not None and self.remaining_requests <= SAFETY_REQUESTS
+                        and now < self.requests_reset_at):
+                    wait = max(wait, self.requests_reset_at - now)
+                if (self.remaining_tokens is not None and self.remaining_tokens < est_tokens + SAFETY_TOKENS
+                        and now < self.tokens_reset_at):
+                    wait = max(wait, self.tokens_reset_at - now)
+
+                if wait <= 0:
+                    if self.remaining_requests is not None:
+                        self.remaining_requests -= 1
+                    if self.remaining_tokens is not None:
+                        self.remaining_tokens -= est_tokens
+                    return
+
+            LLM_STATS["rate_limit_waits"] += 1
+            await asyncio.sleep(wait)
+
+    def update(self, headers):
+        """응답 헤더의 남은 한도 반영"""
+        if headers is None:
+            return
+        now = time.monotonic()
+        requests_left = headers.get("x-ratelimit-remaining-requests")
+        tokens_left = headers.get("x-ratelimit-remaining-tokens")
+        if requests_left is not None:
+            self.remaining_requests = int(requests_left)
+            self.requests_reset_at = now + parse_reset(headers.get("x-ratelimit-reset-requests"))
+        if tokens_left is not None:
+            self.remaining_tokens = int(tokens_left)
+            self.tokens_reset_at = now + parse_reset(headers.get("x-ratelimit-reset-tokens"))
+
+    def pause(self, seconds):
+        """429 → 모든 코루틴 일시 정지"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class AsyncExtractor:
+    """게시글 단위 비동기 정제기"""
+
+    def __init__(self, api_key=None, max_concurrency=MAX_CONCURRENCY, image_mode=None):
+        # SDK 자체 재시도는 끄고 공유 리미터 + 백오프로 제어
+        self.client = AsyncOpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            max_retries=0,
+        )
+        self.limiter = RateLimiter(max_concurrency)
+        self.image_mode = image_mode or IMAGE_MODE
+
+    async def chat(self, kind, messages, max_tokens=None, **kwargs):
+        """공유 리미터를 거쳐 chat.completions 호출 (429/5xx 백오프 재시도)"""
+        est_tokens = estimate_tokens(messages, max_tokens)
+        if max_tokens:
+            kwargs["max_tokens"] = max_tokens
+        last_error = None
+
+        for attempt in range(MAX_RETRIES):
+            await self.limiter.acquire(est_tokens)
+            try:
+                async with self.limiter.semaphore:
+                    raw = await self.client.chat.completions.with_raw_response.create(
+                        model=MODEL, messages=messages, **kwargs
+                    )
+                self.limiter.update(raw.headers)
+                response = raw.parse()
+                record_usage(response, kind)
+                return response
+            except RateLimitError as e:
+                last_error = e
+                self.limiter.update(e.response.headers)
+                retry_after = float(e.response.headers.get("retry-after", 0) or 0)
+                self.limiter.pause(max(retry_after, backoff_delay(attempt)))
+                LLM_STATS["http_429"] += 1
+            except APIStatusError as e:
+                if e.status_code < 500:
+                    raise
+                last_error = e
+                LLM_STATS["http_5xx"] += 1
+            except APIConnectionError as e:
+                last_error = e
+                LLM_STATS["connection_errors"] += 1
+
+            LLM_STATS["backoff_retries"] += 1
+            await asyncio.sleep(backoff_delay(attempt))
+
+        raise last_error
+
+    async def extract_text(self, prompt, max_retries=3):
+        """텍스트 분석 (파싱 실패 시 전체 재시도)"""
+        for attempt in range(max_retries):
+            try:
+                response = await self.chat(
+                    "text",
+                    build_messages("너는 JSON 변환기 역할을 한다.", prompt),
+                    temperature=0.2,
+                    response_format=MARKET_RESPONSE_FORMAT,
+                )
+            except Exception as e:
+                print(f"❌ 텍스트 분석 오류 (시도 {attempt+1}): {e}")
+            else:
+                data = parse_json_output(response.choices[0].message.content)
+                if isinstance(data, dict) and data:
+                    return data
+                LLM_STATS["wasted_tokens"] += response.usage.total_tokens if response.usage else 0
+            if attempt < max_retries - 1:
+                LLM_STATS["full_retries"] += 1
+        return None
+
+    async def repair(self, data, context_text):
+        """잘못된 필드만 재질의"""
+        invalid = find_invalid_fields(data)
+        if not invalid:
+            return data
+
+        prompt = get_fix_fields_prompt(context_text[:REASK_CONTEXT_CHARS], invalid)
+        fixed = None
+        try:
+            response = await self.chat(
+                "reask",
+                build_messages("너는 JSON 보정 전문가야.", prompt),
+                max_tokens=300,
+                temperature=0,
+                response_format={"type": "json_object"},
+            )
+            LLM_STATS["reask_tokens"] += response.usage.total_tokens if response.usage else 0
+            fixed = parse_json_output(response.choices[0].message.content)
+        except Exception as e:
+            print(f"❌ 필드 재질의 오류: {e}")
+        return apply_fixed_fields(data, invalid, fixed)
+
+    async def _image_ref(self, image_url):
+        """이미지 캐시 조회 (다운로드는 스레드에서)"""
+        return await asyncio.to_thread(lookup_image, image_url)
+
+    async def refine(self, img_data, market_name, place, url):
+        """이미지 date_info/time_info → 세션"""
+        date_info = img_data.get("date_info", "")
+        time_info = img_data.get("time_info", "")
+        try:
+            response = await self.chat(
+                "refine",
+                build_messages("너는 JSON 보정 전문가야.", get_refine_prompt(market_name, place, url, date_info, time_info)),
+                temperature=0.2,
+                response_format=MARKET_RESPONSE_FORMAT,
+            )
+        except Exception as e:
+            print(f"❌ 이미지 기반 보정 실패: {e}")
+            return None
+        refined = parse_json_output(response.choices[0].message.content)
+        if refined and refined.get("sessions"):
+            return await self.repair(refined, f"날짜: {date_info}\n시간: {time_info}")
+        return None
+
+    async def analyze_image(self, image_url):
+        """포스터 Vision 분석 (chain 방식 1단계)"""
+        cached = await self._image_ref(image_url)
+        if cached and cached["result"]:
+            LLM_STATS["vision_cache_hits"] += 1
+            return cached["result"]
+
+        image_ref = cached["data_url"] if cached else image_url
+        try:
+            response = await self.chat(
+                "vision",
+                build_image_messages(get_image_prompt(), image_ref),
+                max_tokens=800,
+                temperature=0.2,
+                response_format={"type": "json_object"},
+            )
+        except Exception as e:
+            print(f"❌ 이미지 분석 오류: {e}")
+            return None
+
+        result = parse_json_output(response.choices[0].message.content)
+        if result and cached:
+            await asyncio.to_thread(get_image_cache().store_result, cached["key"], result)
+        return result
+
+    async def combined(self, image_url, market_name, place, url, post_date="", raw_text=""):
+        """이미지 + 게시글 문맥 통합 1회 호출"""
+        cached = await self._image_ref(image_url)
+        if cached and cached["result"]:
+            LLM_STATS["vision_cache_hits"] += 1
+            img_data = cached["result"]
+            refined = await self.refine(img_data, market_name, img_data.get("place") or place, url)
+            if refined and img_data.get("place"):
+                refined["place"] = img_data["place"]
+            return refined
+
+        image_ref = cached["data_url"] if cached else image_url
+        prompt = get_combined_image_prompt(
+            market_name, place, url, post_date, (raw_text or "")[:COMBINED_CONTEXT_CHARS]
+        )
+        try:
+            response = await self.chat(
+                "combined",
+                build_image_messages(prompt, image_ref),
+                max_tokens=800,
+                temperature=0.2,
+                response_format=MARKET_RESPONSE_FORMAT,
+            )
+        except Exception as e:
+            print(f"❌ 이미지 통합 분석 오류: {e}")
+            return None
+
+        data = parse_json_output(response.choices[0].message.content)
+        if not isinstance(data, dict):
+            return None
+        data = await self.repair(data, raw_text or "")
+        if cached and data:
+            result = image_result_from_combined(data)
+            if result:
+                await asyncio.to_thread(get_image_cache().store_result, cached["key"], result)
+        return data
+
+    async def extract_post(self, detail):
+        """게시글 1개: 텍스트 → 재질의 → 이미지 → 보정 코루틴 체인"""
+        url = detail.get("url", "")
+        title = detail.get("title", "").strip()
+        raw_text = detail.get("raw_text", "").strip()
+        image_url = detail.get("image_url", "")
+        if not image_url or not image_url.startswith("http"):
+            image_url = ""
+        original_place = detail.get("place", "").strip()
+        post_date = detail.get("post_date", "").strip()
+
+        # 본문에 날짜가 없으면 이미지 호출을 텍스트 호출과 동시에 시작
+        speculative = None
+        if self.image_mode == "combined" and image_url and not has_date_hint(raw_text):
+            speculative = asyncio.create_task(
+                self.combined(image_url, title, original_place, url, post_date, raw_text)
+            )
+            LLM_STATS["speculative_calls"] += 1
+
+        data = await self.extract_text(get_text_prompt(raw_text, url, original_place, post_date))
+        if not data:
+            if speculative:
+                speculative.cancel()
+            return None
+
+        data = await self.repair(data, raw_text)
+        data["url"] = url
+        if not data.get("market_name"):
+            data["market_name"] = title or "제목 미정"
+
+        if is_missing_info(data) and image_url:
+            if self.image_mode == "combined":
+                combined = await speculative if speculative else await self.combined(
+                    image_url, data["market_name"], data.get("place", ""), url, post_date, raw_text
+                )
+                merge_combined_result(data, combined)
+            else:
+                img_data = await self.analyze_image(image_url)
+                if img_data:
+                    if img_data.get("place"):
+                        data["place"] = img_data["place"]
+                    refined = await self.refine(img_data, data.get("market_name", ""), data["place"], url)
+                    if refined:
+                        data["sessions"] = refined["sessions"]
+        elif speculative:
+            LLM_STATS["speculative_unused"] += 1
+            # 이미 보낸 요청이면 결과만 버림 (취소해도 토큰은 이미 과금될 수 있음)
+            speculative.cancel()
+
+        return finalize_result(data)
+
+    async def extract_many(self, details, on_result=None):
+        """
+        여러 게시글을 동시에 정제
+
+        Args:
+            on_result: (detail, result, error) 콜백 - 완료되는 순서대로 호출
+
+        Returns:
+            [(detail, result, error), ...] (입력 순서)
+        """
+        async def run(detail):
+            try:
+                result, error = await self.extract_post(detail), None
+            except Exception as e:
+                result, error = None, f"{type(e).__name__}: {e}"
+            if on_result:
+                on_result(detail, result, error)
+            return detail, result, error
+
+        try:
+            return await asyncio.gather(*(run(d) for d in details))
+        finally:
+            await self.client.close()
+
+
+def extract_many(details, on_result=None, max_concurrency=MAX_CONCURRENCY, image_mode=None):
+    """동기 코드에서 호출하는 진입점"""
+    async def main():
+        extractor = AsyncExtractor(max_concurrency=max_concurrency, image_mode=image_mode)
+        return await extractor.extract_many(details, on_result)
+
+    return asyncio.run(main())
@@ -0,0 +1,260 @@
+"""
+LLM 정제 단계 벤치마크
+- 텍스트에 날짜가 없는 게시글(이미지 보완 대상)만 골라
+  chain(이미지 분석 → 보정, 2회 왕복) vs combined(통합 1회 왕복) 지연 시간 비교
+- 실제 API를 호출하므로 --limit으로 개수를 제한해서 실행
+- --throughput: 정제 방식(combined / chain / async / route)별 처리량(posts/s),
+  재시도 증폭(HTTP 요청 수 / 유효 응답 수), 토큰 사용량 비교
+- --mock: 로컬 mock LLM 서버(mock_llm_server.py)를 띄워 비용 없이 실행
+
+사용법:
+    python benchmark_extraction.py --limit 10
+    python benchmark_extraction.py --throughput --mock --limit 200 --latency lognormal:-0.7,0.4 --rate-429 0.05
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import mock_llm_server
+
+# --mock: llm_processor / async_extractor / model_router가 클라이언트를 만들기 전에 mock 서버를 가리키도록 설정
+MOCK_BASE_URL = f"http://127.0.0.1:{mock_llm_server.DEFAULT_PORT}/v1"
+if "--mock" in sys.argv:
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    os.environ["OPENAI_BASE_URL"] = MOCK_BASE_URL
+    os.environ["LLM_SMALL_BASE_URL"] = MOCK_BASE_URL
+
+import async_extractor
+import llm_processor
+from llm_processor import extract_fleamarket_info, has_date_hint, get_llm_stats, reset_llm_stats
+from model_router import route_cheap
+
+RESULT_FILE = "benchmark_results.json"
+THROUGHPUT_MODES = ["combined", "chain", "async", "route"]
+
+
+def load_incomplete_posts(input_file, limit):
+    """이미지가 있고 본문에 날짜 표현이 없는 게시글"""
+    with open(input_file, "r", encoding="utf-8") as f:
+        details = json.load(f)
+    posts = [
+        d for d in details
+        if d.get("url") and d.get("image_url", "").startswith("http")
+        and not has_date_hint(d.get("raw_text", ""))
+    ]
+    return posts[:limit]
+
+
+def run_post(detail, mode):
+    """게시글 1개 정제 → (소요 시간, 호출 수, 토큰 수, 성공 여부)"""
+    reset_llm_stats()
+    started = time.perf_counter()
+    result = extract_fleamarket_info(
+        detail.get("raw_text", "").strip(),
+        detail["url"],
+        detail.get("title", "").strip(),
+        detail.get("image_url", ""),
+        detail.get("place", "").strip(),
+        detail.get("post_date", "").strip(),
+        image_mode=mode,
+    )
+    elapsed = time.perf_counter() - started
+    llm_stats = get_llm_stats()
+    complete = bool(result and result["sessions"][0].get("start_date"))
+    return elapsed, llm_stats.get("calls", 0), llm_stats.get("total_tokens", 0), complete
+
+
+def summarize(rows):
+    latencies = sorted(r[0] for r in rows)
+    return {
+        "posts": len(rows),
+        "latency_mean": round(statistics.mean(latencies), 3),
+        "latency_median": round(statistics.median(latencies), 3),
+        "latency_p90": round(latencies[int(0.9 * (len(latencies) - 1))], 3),
+        "calls_per_post": round(sum(r[1] for r in rows) / len(rows), 2),
+        "tokens_per_post": round(sum(r[2] for r in rows) / len(rows), 1),
+        "complete_rate": round(sum(1 for r in rows if r[3]) / len(rows), 3),
+    }
+
+
+def benchmark_image_modes(input_file="fleamarket_detail.json", limit=10):
+    """chain vs combined 게시글당 지연 시간 비교"""
+    posts = load_incomplete_posts(input_file, limit)
+    if not posts:
+        print("⚠️  벤치마크 대상(날짜 없는 + 이미지 있는 게시글)이 없습니다.")
+        return None
+
+    # 캐시가 두 번째 모드에 유리하게 작용하지 않도록 비활성화
+    llm_processor.IMAGE_CACHE_ENABLED = False
+
+    rows = {"chain": [], "combined": []}
+    for i, detail in enumerate(posts, 1):
+        # 순서 효과를 줄이기 위해 번갈아 먼저 실행
+        order = ["chain", "combined"] if i % 2 else ["combined", "chain"]
+        for mode in order:
+            rows[mode].append(run_post(detail, mode))
+        print(f"[{i}/{len(posts)}] chain {rows['chain'][-1][0]:.2f}s / combined {rows['combined'][-1][0]:.2f}s")
+
+    report = {mode: summarize(r) for mode, r in rows.items()}
+
+    print()
+    print("=" * 80)
+    print("📊 이미지 보완 방식별 게시글당 지연 시간")
+    print("=" * 80)
+    for mode, summary in report.items():
+        print(f"[{mode}] 평균 {summary['latency_mean']}s / 중앙값 {summary['latency_median']}s "
+              f"/ p90 {summary['latency_p90']}s / 호출 {summary['calls_per_post']}회 "
+              f"/ 토큰 {summary['tokens_per_post']} / 완성률 {summary['complete_rate']:.0%}")
+    print("=" * 80)
+
+    with open(RESULT_FILE, "w", encoding="utf-8") as f:
+        json.dump({"image_modes": report}, f, ensure_ascii=False, indent=2)
+    print(f"📋 결과 저장: {RESULT_FILE}")
+
+    return report
+
+
+def extract_one(detail, mode):
+    """동기 방식 게시글 1개 정제 (route는 저비용 단계 → 실패 시 기본 파이프라인)"""
+    if mode == "route":
+        routed, _, _ = route_cheap(detail)
+        if routed:
+            return routed
+        mode = None
+    return extract_fleamarket_info(
+        detail.get("raw_text", "").strip(),
+        detail["url"],
+        detail.get("title", "").strip(),
+        detail.get("image_url", ""),
+        detail.get("place", "").strip(),
+        detail.get("post_date", "").strip(),
+        image_mode=mode,
+    )
+
+
+def run_mode(posts, mode, base_url):
+    """정제 방식 1개 실행 → 처리량/재시도 증폭/토큰 요약"""
+    reset_llm_stats()
+    mock_llm_server.reset_stats(base_url)
+
+    started = time.perf_counter()
+    if mode == "async":
+        results = [result for _, result, _ in async_extractor.extract_many(posts)]
+    else:
+        results = [extract_one(detail, mode) for detail in posts]
+    elapsed = time.perf_counter() - started
+
+    llm_stats = get_llm_stats()
+    server = mock_llm_server.fetch_stats(base_url) or {}
+    complete = sum(1 for r in results if r and r["sessions"] and r["sessions"][0].get("start_date"))
+
+    # 재시도 증폭 = 보낸 HTTP 요청 수 / 쓸 수 있었던 응답 수 (429, 잘못된 JSON, SDK 내부 재시도 포함)
+    # mock 서버가 아니면 클라이언트 집계로 근사 (SDK 내부 재시도는 보이지 않음)
+    if server:
+        requests_sent = server.get("requests", 0)
+        useful = server.get("ok", 0) - server.get("malformed", 0)
+    else:
+        requests_sent = llm_stats.get("calls", 0) + llm_stats.get("http_429", 0) + llm_stats.get("http_5xx", 0)
+        useful = llm_stats.get("calls", 0) - llm_stats.get("full_retries", 0)
+
+    return {
+        "posts": len(posts),
+        "elapsed": round(elapsed, 2),
+        "posts_per_sec": round(len(posts) / elapsed, 2) if elapsed else 0.0,
+        "complete_rate": round(complete / len(posts), 3),
+        "llm_calls": llm_stats.get("calls", 0),
+        "http_requests": requests_sent,
+        "retry_amplification": round(requests_sent / useful, 3) if useful else None,
+        "rate_limited": server.get("rate_limited", llm_stats.get("http_429", 0)),
+        "malformed": server.get("malformed", 0),
+        "prompt_tokens": llm_stats.get("prompt_tokens", 0),
+        "completion_tokens": llm_stats.get("completion_tokens", 0),
+        "total_tokens": llm_stats.get("total_tokens", 0),
+        "tokens_per_post": round(llm_stats.get("total_tokens", 0) / len(posts), 1),
+        "wasted_tokens": llm_stats.get("wasted_tokens", 0),
+        "reask_tokens": llm_stats.get("reask_tokens", 0),
+        "tiers": {k[5:]: v for k, v in llm_stats.items() if k.startswith("tier_")},
+    }
+
+
+def benchmark_throughput(input_file="fleamarket_detail.json", limit=50, modes=None, base_url=None):
+    """정제 방식별 처리량 / 재시도 증폭 / 토큰 사용량 비교"""
+    with open(input_file, "r", encoding="utf-8") as f:
+        posts = [d for d in json.load(f) if d.get("url")][:limit]
+    if not posts:
+        print("⚠️  벤치마크 대상 게시글이 없습니다.")
+        return None
+
+    base_url = base_url or os.getenv("OPENAI_BASE_URL") or ""
+    # 이미지 다운로드/캐시가 처리량에 섞이지 않도록 비활성화
+    llm_processor.IMAGE_CACHE_ENABLED = False
+
+    report = {}
+    for mode in modes or THROUGHPUT_MODES:
+        print(f"\n▶️  [{mode}] {len(posts)}개 정제 중...")
+        report[mode] = run_mode(posts, mode, base_url)
+
+    print()
+    print("=" * 80)
+    print("📊 정제 방식별 처리량 / 재시도 증폭 / 토큰")
+    print("=" * 80)
+    for mode, summary in report.items():
+        amplification = summary["retry_amplification"]
+        print(f"[{mode}] {summary['posts_per_sec']} posts/s ({summary['elapsed']}s) "
+              f"/ 완성률 {summary['complete_rate']:.0%}")
+        print(f"   HTTP 요청 {summary['http_requests']}회 (LLM 호출 {summary['llm_calls']}회, "
+              f"429 {summary['rate_limited']}회, 잘못된 JSON {summary['malformed']}회) "
+              f"→ 재시도 증폭 {amplification if amplification is not None else '-'}x")
+        print(f"   토큰 {summary['total_tokens']:,} (입력 {summary['prompt_tokens']:,} / 출력 {summary['completion_tokens']:,}) "
+              f"/ 게시글당 {summary['tokens_per_post']} / 재시도 낭비 {summary['wasted_tokens']:,} / 재질의 {summary['reask_tokens']:,}")
+        if summary["tiers"]:
+            print(f"   라우팅: {', '.join(f'{t} {n}개' for t, n in summary['tiers'].items())}")
+    print("=" * 80)
+
+    try:
+        with open(RESULT_FILE, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        saved = {}
+    saved["throughput"] = report
+    with open(RESULT_FILE, "w", encoding="utf-8") as f:
+        json.dump(saved, f, ensure_ascii=False, indent=2)
+    print(f"📋 결과 저장: {RESULT_FILE}")
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM 정제 단계 벤치마크")
+    parser.add_argument("--input", default="fleamarket_detail.json", help="입력 detail JSON")
+    parser.add_argument("--limit", type=int, default=10, help="벤치마크할 게시글 수")
+    parser.add_argument("--throughput", action="store_true", help="정제 방식별 처리량/재시도 증폭/토큰 비교")
+    parser.add_argument("--modes", default=",".join(THROUGHPUT_MODES), help="--throughput에서 비교할 방식 (쉼표 구분)")
+    parser.add_argument("--mock", action="store_true", help="로컬 mock LLM 서버로 실행 (API 비용 없음)")
+    parser.add_argument("--latency", default="lognormal:-0.7,0.4", help="mock 서버 지연 시간 분포")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="mock 서버 429 응답 확률")
+    parser.add_argument("--malformed", type=float, default=0.0, help="mock 서버 잘못된 JSON 응답 확률")
+    parser.add_argument("--seed", type=int, default=0, help="mock 서버 난수 시드")
+    args = parser.parse_args()
+
+    server = None
+    if args.mock:
+        config = mock_llm_server.MockConfig(
+            latency=args.latency, rate_429=args.rate_429, malformed=args.malformed,
+            seed=args.seed, retry_after=0.5,
+        )
+        server, _ = mock_llm_server.start_server(config)
+        print(f"🧪 mock LLM 서버: {MOCK_BASE_URL} (지연 {args.latency} / 429 {args.rate_429:.0%} / 잘못된 JSON {args.malformed:.0%})")
+
+    try:
+        if args.throughput:
+            modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+            benchmark_throughput(args.input, args.limit, modes)
+        else:
+            benchmark_image_modes(args.input, args.limit)
+    finally:
+        if server:
+            server.shutdown()
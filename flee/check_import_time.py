@@ -0,0 +1,118 @@
+"""
+파이프라인 모듈 import 시간 점검 (python -X importtime)
+- 모듈마다 새 인터프리터에서 import만 실행해 누적 import 시간 측정
+- 자격 증명(API 키, Supabase 키)을 모두 뺀 환경에서 실행 → import 단계에서 키가 필요하면 실패
+- 해당 단계에서 쓰지 않는 무거운 패키지(selenium, openai, supabase, bs4)가 로드되면 실패
+- 예산을 넘거나 금지 패키지가 로드되면 종료 코드 1 (회귀 검사용)
+
+사용법:
+    python check_import_time.py
+    python check_import_time.py --top 15        # 모듈별로 느린 import 상위 15개 출력
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# 모듈 → (import 예산 ms, import 시 로드되면 안 되는 패키지)
+IMPORT_BUDGETS = {
+    "master_pipeline": (100, {"selenium", "openai", "supabase", "bs4"}),
+    "extract_to_json": (400, {"selenium", "openai", "supabase", "bs4"}),
+    "structured_to_db": (100, {"selenium", "openai", "supabase", "bs4"}),
+    "supabase_manager": (150, {"selenium", "openai", "supabase", "bs4"}),
+    "add_geocoding": (400, {"selenium", "openai", "supabase", "bs4"}),
+    "migrate_to_supabase": (150, {"selenium", "openai", "supabase", "bs4"}),
+}
+
+# import 단계에서 필요 없어야 하는 자격 증명
+CREDENTIAL_VARS = [
+    "OPENAI_API_KEY",
+    "SUPABASE_URL",
+    "SUPABASE_SERVICE_KEY",
+    "KAKAO_REST_API_KEY",
+]
+
+# "import time:       self [us] |  cumulative | imported package"
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module):
+    """
+    새 인터프리터에서 module import
+
+    Returns:
+        (성공 여부, 누적 시간 ms, [(누적 us, 패키지명, 깊이)], 오류 메시지)
+    """
+    # 이미 설정된 값은 load_dotenv가 덮어쓰지 않으므로 빈 값으로 지정해 .env의 키도 가림
+    env = dict(os.environ, **{name: "" for name in CREDENTIAL_VARS})
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+    entries = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        depth = (len(indent) - 1) // 2
+        entries.append((cumulative, name, depth))
+        if name == module:
+            total_us = cumulative
+
+    error = ""
+    if result.returncode != 0:
+        error = [l for l in result.stderr.splitlines() if not l.startswith("import time:")][-1:]
+        error = error[0] if error else f"종료 코드 {result.returncode}"
+    return result.returncode == 0, total_us / 1000, entries, error
+
+
+def check_imports(top=0):
+    """모든 대상 모듈 점검 → 실패 목록"""
+    failures = []
+
+    print("=" * 80)
+    print("⏱️  모듈 import 시간 점검 (자격 증명 없이)")
+    print("=" * 80)
+
+    for module, (budget_ms, forbidden) in IMPORT_BUDGETS.items():
+        ok, total_ms, entries, error = measure(module)
+        if not ok:
+            print(f"❌ {module}: import 실패 - {error}")
+            failures.append(module)
+            continue
+
+        loaded = {name.split(".")[0] for _, name, _ in entries}
+        heavy = sorted(loaded & forbidden)
+        over_budget = total_ms > budget_ms
+
+        status = "❌" if heavy or over_budget else "✅"
+        print(f"{status} {module}: {total_ms:.1f}ms (예산 {budget_ms}ms)"
+              + (f" / 불필요한 패키지 로드: {', '.join(heavy)}" if heavy else ""))
+        if heavy or over_budget:
+            failures.append(module)
+
+        if top:
+            for cumulative, name, _ in sorted(entries, reverse=True)[1:top + 1]:
+                print(f"     {cumulative / 1000:8.1f}ms  {name}")
+
+    print("=" * 80)
+    if failures:
+        print(f"❌ 실패: {', '.join(failures)}")
+    else:
+        print("✅ 모든 모듈 통과")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="파이프라인 모듈 import 시간 점검")
+    parser.add_argument("--top", type=int, default=0, help="모듈별로 느린 import 상위 N개 출력")
+    args = parser.parse_args()
+
+    sys.exit(1 if check_imports(args.top) else 0)
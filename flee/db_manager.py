@@ -1,16 +1,128 @@
+import re
 import sqlite3
+from datetime import date
+from itertools import islice
 
 DB_PATH = "fleamarket.db"
 
+# 대량 저장 시 한 트랜잭션에 넣을 게시글 수
+BULK_CHUNK_SIZE = 1000
+
+# 한 번에 IN (...)으로 조회할 url 수 (SQLite 변수 개수 제한 이하)
+LOOKUP_BATCH_SIZE = 500
+
+# 이 프로세스에서 테이블 생성을 이미 확인했는지
+_tables_ready = False
+
+# "2025-10-25", "2025.10.25", "2025/10/25", "2025년 10월 25일"
+_DATE_RE = re.compile(r"(\d{4})\s*(?:년|[.\-/])\s*(\d{1,2})\s*(?:월|[.\-/])\s*(\d{1,2})")
+
+# 조회 패턴별 인덱스 (db_query.py)
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_sessions_market_id ON sessions(market_id)",
+    # 기간 겹침 조회: end_day >= 시작 AND start_day <= 끝 (지난 행사가 대부분이라 end_day 쪽이 선택적)
+    "CREATE INDEX IF NOT EXISTS idx_sessions_end_day ON sessions(end_day, start_day)",
+    # 다가오는 세션: start_day 순서 그대로 읽어 정렬 생략
+    "CREATE INDEX IF NOT EXISTS idx_sessions_start_day ON sessions(start_day, start_time)",
+    # 장소 접두어 조회 (place >= ? AND place < ?)
+    "CREATE INDEX IF NOT EXISTS idx_markets_place ON markets(place)",
+]
+
+# 전문 검색 (rowid = markets.id)
+# - market_search: trigram 토크나이저 → 띄어쓰기/조사와 무관하게 3글자 이상 부분 일치, snippet 지원
+# - market_search_bigram: 2글자 검색어용 (한국어 지명/행사명은 2글자가 많음), 내용 미저장
+SEARCH_TABLES = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS market_search
+       USING fts5(market_name, place, notes, raw_text, tokenize='trigram')""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS market_search_bigram
+       USING fts5(body, content='', tokenize='unicode61')""",
+]
+
+_WORD_RE = re.compile(r"\w+")
+
+# 좌표 공간 인덱스 (id = markets.id, 점이므로 min = max)
+# markets.lat/lng가 바뀌면 트리거로 자동 동기화
+RTREE_TABLE = "CREATE VIRTUAL TABLE IF NOT EXISTS market_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)"
+RTREE_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS markets_rtree_insert AFTER INSERT ON markets
+       WHEN new.lat IS NOT NULL AND new.lng IS NOT NULL
+       BEGIN
+           INSERT OR REPLACE INTO market_rtree VALUES (new.id, new.lat, new.lat, new.lng, new.lng);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS markets_rtree_update AFTER UPDATE OF lat, lng ON markets
+       BEGIN
+           DELETE FROM market_rtree WHERE id = old.id;
+           INSERT INTO market_rtree
+           SELECT new.id, new.lat, new.lat, new.lng, new.lng
+           WHERE new.lat IS NOT NULL AND new.lng IS NOT NULL;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS markets_rtree_delete AFTER DELETE ON markets
+       BEGIN
+           DELETE FROM market_rtree WHERE id = old.id;
+       END""",
+]
+
+# 변경분 동기화 상태 (sync_state.py)
+# - sync_state: url별 정규화 structured 데이터 해시 ("deleted"면 삭제 표시)
+# - sync_pushed: 싱크(local, supabase)별로 마지막으로 보낸 해시
+SYNC_TABLES = [
+    """CREATE TABLE IF NOT EXISTS sync_state (
+           url TEXT PRIMARY KEY,
+           content_hash TEXT NOT NULL,
+           updated_at TEXT
+       )""",
+    """CREATE TABLE IF NOT EXISTS sync_pushed (
+           url TEXT,
+           sink TEXT,
+           pushed_hash TEXT,
+           pushed_at TEXT,
+           PRIMARY KEY(url, sink)
+       )""",
+]
+
+# Supabase 복제 대기열 (outbox.py)
+# - 로컬 데이터 변경과 같은 트랜잭션에서 기록 → 로컬 DB와 복제 대기열이 어긋나지 않음
+# - idempotency_key = url:해시 (같은 상태는 한 번만 대기)
+OUTBOX_TABLES = [
+    """CREATE TABLE IF NOT EXISTS outbox (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           url TEXT NOT NULL,
+           op TEXT NOT NULL,
+           payload TEXT,
+           content_hash TEXT,
+           idempotency_key TEXT UNIQUE,
+           attempts INTEGER NOT NULL DEFAULT 0,
+           next_attempt_at TEXT,
+           last_error TEXT,
+           created_at TEXT
+       )""",
+    "CREATE INDEX IF NOT EXISTS idx_outbox_url ON outbox(url)",
+]
+
 
 def get_connection():
     """DB 연결 반환"""
     return sqlite3.connect(DB_PATH)
 
 
-def init_db():
-    """테이블 생성 (최초 1회만 실행되지만 save_to_db 안에서 보장됨)"""
-    conn = get_connection()
+def get_write_connection(db_path=DB_PATH):
+    """
+    대량 쓰기용 연결 (WAL 모드)
+    - WAL: 쓰는 동안에도 다른 연결에서 읽기 가능, 커밋 시 fsync 감소
+    - synchronous=NORMAL: WAL에서는 전원 장애 시 마지막 트랜잭션만 잃을 수 있음 (DB 손상 없음)
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def init_db(conn=None):
+    """테이블 생성 (conn을 주면 해당 연결에서 실행)"""
+    global _tables_ready
+    own_conn = conn is None
+    conn = conn or get_connection()
     cur = conn.cursor()
 
     # markets 테이블
@@ -20,10 +132,18 @@ def init_db():
             market_name TEXT,
             place TEXT,
             url TEXT UNIQUE,
-            image_url TEXT
+            image_url TEXT,
+            lat REAL,
+            lng REAL
         )
     """)
 
+    # 기존 DB: 좌표 컬럼 추가
+    market_columns = {row[1] for row in cur.execute("PRAGMA table_info(markets)")}
+    if "lat" not in market_columns:
+        cur.execute("ALTER TABLE markets ADD COLUMN lat REAL")
+        cur.execute("ALTER TABLE markets ADD COLUMN lng REAL")
+
     # sessions 테이블
     cur.execute("""
         CREATE TABLE IF NOT EXISTS sessions (
@@ -34,13 +154,76 @@ def init_db():
             start_time TEXT,
             end_time TEXT,
             notes TEXT,
+            start_day TEXT,
+            end_day TEXT,
             UNIQUE(market_id, start_date, end_date, start_time, end_time, notes),
             FOREIGN KEY(market_id) REFERENCES markets(id)
         )
     """)
 
+    # 기존 DB: 정규화 날짜 컬럼 추가 후 채우기
+    columns = {row[1] for row in cur.execute("PRAGMA table_info(sessions)")}
+    if "start_day" not in columns:
+        cur.execute("ALTER TABLE sessions ADD COLUMN start_day TEXT")
+        cur.execute("ALTER TABLE sessions ADD COLUMN end_day TEXT")
+        rows = cur.execute("SELECT id, start_date, end_date FROM sessions").fetchall()
+        cur.executemany(
+            "UPDATE sessions SET start_day = ?, end_day = ? WHERE id = ?",
+            [(*normalize_days(start, end), session_id) for session_id, start, end in rows],
+        )
+
+    for sql in INDEXES:
+        cur.execute(sql)
+
+    # 검색 인덱스가 새로 생기면 기존 행사로 채움 (raw_text는 structured_to_db에서 보충)
+    has_search = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'market_search'"
+    ).fetchone()
+    for sql in SEARCH_TABLES:
+        cur.execute(sql)
+    if not has_search:
+        market_ids = [row[0] for row in cur.execute("SELECT id FROM markets")]
+        index_markets(cur, dict.fromkeys(market_ids))
+
+    # 좌표 공간 인덱스 (새로 만들면 기존 좌표로 채움)
+    has_rtree = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'market_rtree'"
+    ).fetchone()
+    cur.execute(RTREE_TABLE)
+    for sql in RTREE_TRIGGERS:
+        cur.execute(sql)
+    if not has_rtree:
+        cur.execute("""
+            INSERT INTO market_rtree
+            SELECT id, lat, lat, lng, lng FROM markets
+            WHERE lat IS NOT NULL AND lng IS NOT NULL
+        """)
+
+    for sql in SYNC_TABLES + OUTBOX_TABLES:
+        cur.execute(sql)
+
     conn.commit()
-    conn.close()
+    if own_conn:
+        conn.close()
+    _tables_ready = True
+
+
+def normalize_date(value):
+    """자유 형식 날짜 → "YYYY-MM-DD" (인식 불가/빈 값이면 None)"""
+    match = _DATE_RE.search(value or "")
+    if not match:
+        return None
+    try:
+        return date(*(int(g) for g in match.groups())).isoformat()
+    except ValueError:
+        return None
+
+
+def normalize_days(start_date, end_date):
+    """세션 날짜 → (start_day, end_day), 종료일이 없으면 시작일과 같게"""
+    start_day = normalize_date(start_date)
+    end_day = normalize_date(end_date) or start_day
+    return start_day, end_day
 
 
 def is_url_exist(url: str) -> bool:
@@ -62,8 +245,9 @@ def save_to_db(data, image_url=None):
     conn = get_connection()
     cur = conn.cursor()
 
-    # 테이블 보장
-    init_db()
+    # 테이블 보장 (프로세스당 1회)
+    if not _tables_ready:
+        init_db()
 
     # 1) markets 중복 확인
     cur.execute("SELECT id FROM markets WHERE url = ?", (data["url"],))
@@ -73,29 +257,358 @@ def save_to_db(data, image_url=None):
         market_id = row[0]
     else:
         cur.execute(
-            "INSERT INTO markets (market_name, place, url, image_url) VALUES (?, ?, ?, ?)",
-            (data.get("market_name", "제목 미정"), data.get("place", "미정"), data["url"], image_url or "")
+            "INSERT INTO markets (market_name, place, url, image_url, lat, lng) VALUES (?, ?, ?, ?, ?, ?)",
+            (data.get("market_name", "제목 미정"), data.get("place", "미정"), data["url"], image_url or "",
+             data.get("lat"), data.get("lng"))
         )
         market_id = cur.lastrowid
 
     # 2) sessions 저장 (중복 방지)
-    for session in data.get("sessions", []):
+    for row in _session_rows(market_id, data):
         try:
-            cur.execute("""
-                INSERT OR IGNORE INTO sessions 
-                (market_id, start_date, end_date, start_time, end_time, notes)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                market_id,
-                session.get("start_date", ""),
-                session.get("end_date", ""),
-                session.get("start_time", ""),
-                session.get("end_time", ""),
-                session.get("notes", "")
-            ))
+            cur.execute(INSERT_SESSION_SQL, row)
         except Exception as e:
             print(f"❌ 세션 저장 오류: {e}")
 
+    # 3) 검색 인덱스 갱신 (원문은 기존 값 유지)
+    index_markets(cur, {market_id: None})
+
     conn.commit()
     conn.close()
     print(f"✅ {data.get('market_name', '제목 미정')} 저장 완료 (중복 방지 적용)")
+
+
+# 🔹 대량 저장
+UPSERT_MARKET_SQL = """
+    INSERT INTO markets (market_name, place, url, image_url, lat, lng)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(url) DO UPDATE SET
+        market_name = excluded.market_name,
+        place = excluded.place,
+        image_url = excluded.image_url,
+        -- 장소가 바뀌면 기존 좌표를 버려 다음 지오코딩 대상이 되도록 함
+        lat = CASE WHEN excluded.place IS markets.place THEN COALESCE(excluded.lat, markets.lat) ELSE excluded.lat END,
+        lng = CASE WHEN excluded.place IS markets.place THEN COALESCE(excluded.lng, markets.lng) ELSE excluded.lng END
+"""
+
+INSERT_SESSION_SQL = """
+    INSERT OR IGNORE INTO sessions
+    (market_id, start_date, end_date, start_time, end_time, notes, start_day, end_day)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def fetch_existing_urls(conn):
+    """저장된 전체 url → market id (쿼리 1회)"""
+    return dict(conn.execute("SELECT url, id FROM markets"))
+
+
+def _fetch_market_ids(cur, urls):
+    ids = {}
+    for start in range(0, len(urls), LOOKUP_BATCH_SIZE):
+        batch = urls[start:start + LOOKUP_BATCH_SIZE]
+        placeholders = ",".join("?" * len(batch))
+        cur.execute(f"SELECT url, id FROM markets WHERE url IN ({placeholders})", batch)
+        ids.update(cur.fetchall())
+    return ids
+
+
+def _market_row(data):
+    image_url = data.get("image_url") or data.get("_source", {}).get("image_url", "")
+    return (
+        data.get("market_name", "제목 미정"),
+        data.get("place", "미정"),
+        data["url"],
+        image_url or "",
+        data.get("lat"),
+        data.get("lng"),
+    )
+
+
+def _session_rows(market_id, data):
+    return [
+        (
+            market_id,
+            session.get("start_date", ""),
+            session.get("end_date", ""),
+            session.get("start_time", ""),
+            session.get("end_time", ""),
+            session.get("notes", ""),
+            *normalize_days(session.get("start_date", ""), session.get("end_date", "")),
+        )
+        for session in data.get("sessions", [])
+    ]
+
+
+def _write_chunk(cur, chunk, raw_texts=None, outbox=False):
+    """
+    markets upsert → id 조회 → sessions 교체 → 검색 인덱스 갱신 (→ 복제 대기열 기록)
+    - structured 데이터가 게시글의 전체 상태이므로 기존 세션은 지우고 다시 삽입 (Supabase sync_sessions와 같은 결과)
+    - 같은 url이 청크에 여러 번 있으면 마지막 값의 세션만 사용
+    """
+    latest = {d["url"]: d for d in chunk}
+    if outbox:
+        # 장소가 바뀌는 행사 (UPSERT_MARKET_SQL이 좌표를 지우므로 Supabase 좌표도 지우도록 기록)
+        previous = _select_in(cur, "SELECT url, place FROM markets WHERE url IN ({ids})", list(latest))
+        place_changed = {url for url, place in previous if place != _market_row(latest[url])[1]}
+    cur.executemany(UPSERT_MARKET_SQL, [_market_row(d) for d in chunk])
+    ids = _fetch_market_ids(cur, list(latest))
+    cur.executemany("DELETE FROM sessions WHERE market_id = ?", [(market_id,) for market_id in ids.values()])
+    cur.executemany(INSERT_SESSION_SQL, [row for d in latest.values() for row in _session_rows(ids[d["url"]], d)])
+    index_markets(cur, {ids[d["url"]]: (raw_texts or {}).get(d["url"]) for d in chunk})
+    if outbox:
+        from outbox import enqueue_upserts
+
+        enqueue_upserts(cur, chunk, place_changed)
+
+
+# 🔹 검색 인덱스
+def bigram_text(*texts):
+    """단어별 2글자 조각 (1글자 단어는 그대로) → 공백 구분 문자열"""
+    tokens = []
+    for word in _WORD_RE.findall(" ".join(t or "" for t in texts).lower()):
+        if len(word) < 3:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return " ".join(tokens)
+
+
+def _select_in(cur, sql, ids):
+    """sql의 {ids} 자리에 id 목록을 나눠 넣어 실행한 결과 전체"""
+    rows = []
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        batch = ids[start:start + LOOKUP_BATCH_SIZE]
+        rows.extend(cur.execute(sql.format(ids=",".join("?" * len(batch))), batch).fetchall())
+    return rows
+
+
+def _unindex_markets(cur, ids):
+    """검색 인덱스에서 행사 제거 → 제거 전 값 {market id: (행사명, 장소, 메모, 원문)}"""
+    old = {row[0]: row[1:] for row in _select_in(
+        cur, "SELECT rowid, market_name, place, notes, raw_text FROM market_search WHERE rowid IN ({ids})", ids
+    )}
+
+    # 내용 미저장 테이블은 삭제할 때 기존 값을 다시 넘겨야 함
+    cur.executemany(
+        "INSERT INTO market_search_bigram(market_search_bigram, rowid, body) VALUES('delete', ?, ?)",
+        [(market_id, bigram_text(*values)) for market_id, values in old.items()],
+    )
+    cur.executemany("DELETE FROM market_search WHERE rowid = ?", [(market_id,) for market_id in old])
+    return old
+
+
+def index_markets(cur, raw_texts):
+    """
+    행사 검색 인덱스 갱신 (호출측 트랜잭션 안에서 실행)
+
+    Args:
+        raw_texts: market id → 게시글 원문 (None이면 기존 원문 유지)
+    """
+    ids = list(raw_texts)
+    if not ids:
+        return
+
+    old = _unindex_markets(cur, ids)
+
+    rows = []
+    for market_id, market_name, place, notes in _select_in(cur, """
+        SELECT m.id, m.market_name, m.place, group_concat(s.notes, ' ')
+        FROM markets m LEFT JOIN sessions s ON s.market_id = m.id
+        WHERE m.id IN ({ids})
+        GROUP BY m.id
+    """, ids):
+        raw_text = raw_texts.get(market_id)
+        if raw_text is None:
+            raw_text = old[market_id][3] if market_id in old else ""
+        rows.append((market_id, market_name or "", place or "", (notes or "").strip(), raw_text))
+
+    cur.executemany(
+        "INSERT INTO market_search(rowid, market_name, place, notes, raw_text) VALUES (?, ?, ?, ?, ?)", rows
+    )
+    cur.executemany(
+        "INSERT INTO market_search_bigram(rowid, body) VALUES (?, ?)",
+        [(row[0], bigram_text(*row[1:])) for row in rows],
+    )
+
+
+def fill_search_raw_text(raw_texts, db_path=DB_PATH):
+    """
+    검색 인덱스에 원문이 비어 있는 행사만 원문 보충 (이미 저장된 행사용)
+
+    Args:
+        raw_texts: url → 게시글 원문 (fleamarket_detail.json)
+
+    Returns:
+        보충한 행사 수
+    """
+    conn = get_write_connection(db_path)
+    try:
+        init_db(conn)
+        missing = conn.execute("""
+            SELECT m.url, m.id FROM markets m
+            JOIN market_search f ON f.rowid = m.id
+            WHERE f.raw_text = ''
+        """).fetchall()
+        targets = {market_id: raw_texts[url] for url, market_id in missing if raw_texts.get(url)}
+        with conn:
+            index_markets(conn.cursor(), targets)
+        return len(targets)
+    finally:
+        conn.close()
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def save_many(records, skip_existing=True, chunk_size=BULK_CHUNK_SIZE, db_path=DB_PATH, raw_texts=None,
+              outbox=False):
+    """
+    structured 데이터 여러 개를 한 연결/청크 트랜잭션으로 저장
+
+    Args:
+        records: structured 데이터 iterable (리스트 또는 제너레이터)
+        skip_existing: True면 이미 있는 url 스킵, False면 markets 필드 덮어쓰기
+        chunk_size: 한 트랜잭션에 넣을 게시글 수
+        raw_texts: url → 게시글 원문 (검색 인덱스용, 없으면 기존 원문 유지)
+        outbox: True면 같은 트랜잭션에서 Supabase 복제 대기열(outbox)에 기록
+
+    Returns:
+        {"new", "updated", "skipped", "failed"} 개수 + "failed_urls" (저장 실패한 url 리스트)
+    """
+    stats = {"new": 0, "updated": 0, "skipped": 0, "failed": 0, "failed_urls": []}
+
+    conn = get_write_connection(db_path)
+    try:
+        init_db(conn)
+        cur = conn.cursor()
+        existing = fetch_existing_urls(conn)
+        seen = set()
+
+        def accept(data):
+            url = data.get("url")
+            if not url:
+                stats["failed"] += 1
+                return False
+            if skip_existing and (url in existing or url in seen):
+                stats["skipped"] += 1
+                return False
+            seen.add(url)
+            return True
+
+        saved = 0
+        for chunk in _chunks((d for d in records if accept(d)), chunk_size):
+            try:
+                with conn:
+                    _write_chunk(cur, chunk, raw_texts, outbox)
+                written = chunk
+            except sqlite3.Error as e:
+                # 청크 전체가 롤백됨 → 문제 게시글만 골라내도록 1개씩 다시 저장
+                print(f"⚠️  청크 저장 실패 ({e}) → 개별 저장으로 재시도")
+                written = []
+                for data in chunk:
+                    try:
+                        with conn:
+                            _write_chunk(cur, [data], raw_texts, outbox)
+                        written.append(data)
+                    except sqlite3.Error as item_error:
+                        stats["failed"] += 1
+                        stats["failed_urls"].append(data["url"])
+                        print(f"  ❌ {data.get('url')} 저장 실패: {item_error}")
+
+            for data in written:
+                stats["updated" if data["url"] in existing else "new"] += 1
+            saved += len(written)
+            print(f"  💾 {saved}개 저장")
+    finally:
+        conn.close()
+
+    return stats
+
+
+def delete_markets(urls, db_path=DB_PATH, outbox=False):
+    """
+    url 목록의 행사 삭제 (세션, 검색 인덱스 포함 / 좌표 인덱스는 트리거로 삭제)
+    - outbox=True면 같은 트랜잭션에서 Supabase 복제 대기열에 삭제 기록
+
+    Returns:
+        삭제한 행사 수
+    """
+    urls = list(urls)
+    if not urls:
+        return 0
+
+    conn = get_write_connection(db_path)
+    try:
+        init_db(conn)
+        cur = conn.cursor()
+        with conn:
+            ids = list(_fetch_market_ids(cur, urls).values())
+            _unindex_markets(cur, ids)
+            cur.executemany("DELETE FROM sessions WHERE market_id = ?", [(market_id,) for market_id in ids])
+            cur.executemany("DELETE FROM markets WHERE id = ?", [(market_id,) for market_id in ids])
+            if outbox:
+                from outbox import enqueue_deletes
+
+                enqueue_deletes(cur, urls)
+    finally:
+        conn.close()
+
+    return len(ids)
+
+
+# 🔹 좌표
+def fetch_markets_without_coordinates(db_path=DB_PATH):
+    """좌표가 없는 행사 [{"id", "url", "market_name", "place"}]"""
+    conn = sqlite3.connect(db_path)
+    try:
+        init_db(conn)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT id, url, market_name, place FROM markets WHERE lat IS NULL OR lng IS NULL")
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def update_coordinates(coords, db_path=DB_PATH, outbox=False):
+    """
+    좌표 일괄 저장 (공간 인덱스는 트리거로 갱신)
+
+    Args:
+        coords: {url: (lat, lng)}
+        outbox: True면 같은 트랜잭션에서 Supabase 복제 대기열(outbox)에 좌표 기록
+
+    Returns:
+        갱신된 행사 수
+    """
+    conn = get_write_connection(db_path)
+    try:
+        init_db(conn)
+        with conn:
+            cur = conn.executemany(
+                "UPDATE markets SET lat = ?, lng = ? WHERE url = ?",
+                [(lat, lng, url) for url, (lat, lng) in coords.items()],
+            )
+            updated = cur.rowcount
+            if outbox:
+                from outbox import enqueue_coordinates
+
+                urls = list(coords)
+                rows = []
+                for start in range(0, len(urls), LOOKUP_BATCH_SIZE):
+                    batch = urls[start:start + LOOKUP_BATCH_SIZE]
+                    rows.extend(conn.execute(
+                        f"""SELECT url, lat, lng FROM markets
+                            WHERE url IN ({",".join("?" * len(batch))})""",
+                        batch,
+                    ))
+                enqueue_coordinates(conn, rows)
+        return updated
+    finally:
+        conn.close()
@@ -0,0 +1,376 @@
+"""
+로컬 DB(fleamarket.db) 조회 모듈
+- 자주 쓰는 조회를 파라미터 바인딩 쿼리로 제공 (SQL 문자열이 고정이라 연결의 statement 캐시 재사용)
+    · 기간 안에 열리는 행사
+    · 다가오는 세션
+    · 장소 접두어로 행사 찾기
+    · 키워드 전문 검색 (FTS5, 순위 + 발췌)
+    · 지도 화면 범위(bbox) + 기간 (R*Tree)
+- 결과는 작은 LRU 캐시에 보관, DB에 쓰기가 있으면 자동 무효화
+  (PRAGMA data_version: 다른 연결/프로세스가 커밋하면 값이 바뀜)
+- check_query_plans(): EXPLAIN QUERY PLAN으로 전체 스캔/인덱스 미사용 회귀 검사 (tests/test_db_query.py)
+
+사용법:
+    python db_query.py --upcoming 20
+    python db_query.py --between 2025-11-01 2025-11-02
+    python db_query.py --place "서울특별시 마포구"
+    python db_query.py --search "망원 플리마켓"
+    python db_query.py --bbox 37.54 126.89 37.57 126.93 --between 2025-11-01 2025-11-02
+"""
+import argparse
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from db_manager import DB_PATH, bigram_text, init_db, normalize_date
+
+CACHE_SIZE = 256
+DEFAULT_LIMIT = 50
+SEARCH_LIMIT = 20
+
+# 검색 순위 가중치 (market_name, place, notes, raw_text 순, bm25는 작을수록 관련도 높음)
+SEARCH_WEIGHTS = (5.0, 3.0, 1.0, 1.0)
+RANK_FUNCTION = f"bm25({', '.join(map(str, SEARCH_WEIGHTS))})"
+SNIPPET_TOKENS = 16
+SNIPPET_CHARS = 40
+
+# 조회 이름 → SQL (모두 인덱스 검색이 되도록 작성, check_query_plans로 확인)
+QUERIES = {
+    # 기간 [start, end]와 겹치는 세션이 있는 행사
+    # (INDEXED BY: 정렬을 피하려고 start_day 인덱스로 지난 세션 전체를 훑는 플랜 방지)
+    "active_between": """
+        SELECT m.id, m.market_name, m.place, m.url, m.image_url,
+               s.start_day, s.end_day, s.start_time, s.end_time, s.notes
+        FROM sessions s INDEXED BY idx_sessions_end_day
+        JOIN markets m ON m.id = s.market_id
+        WHERE s.end_day >= :start AND s.start_day <= :end
+        ORDER BY s.start_day, s.start_time
+        LIMIT :limit
+    """,
+    # 오늘 이후 시작하는 세션 (인덱스 순서 그대로 읽음)
+    "upcoming": """
+        SELECT m.id, m.market_name, m.place, m.url, m.image_url,
+               s.start_day, s.end_day, s.start_time, s.end_time, s.notes
+        FROM sessions s
+        JOIN markets m ON m.id = s.market_id
+        WHERE s.start_day >= :today
+        ORDER BY s.start_day, s.start_time
+        LIMIT :limit
+    """,
+    # 장소 접두어 (LIKE 대신 범위 조건 → 대소문자/콜레이션과 무관하게 인덱스 사용)
+    "by_place_prefix": """
+        SELECT id, market_name, place, url, image_url
+        FROM markets
+        WHERE place >= :prefix AND place < :prefix_end
+        ORDER BY place
+        LIMIT :limit
+    """,
+    # 화면 범위 안 + 기간과 겹치는 세션
+    # (CROSS JOIN: 공간 인덱스로 후보를 먼저 좁히고 행사/세션은 키로 조회하도록 순서 고정)
+    "in_bbox": """
+        SELECT m.id, m.market_name, m.place, m.url, m.image_url, m.lat, m.lng,
+               s.start_day, s.end_day, s.start_time, s.end_time, s.notes
+        FROM market_rtree r
+        CROSS JOIN markets m ON m.id = r.id
+        CROSS JOIN sessions s ON s.market_id = m.id
+        WHERE r.min_lat <= :max_lat AND r.max_lat >= :min_lat
+          AND r.min_lng <= :max_lng AND r.max_lng >= :min_lng
+          AND m.lat BETWEEN :min_lat AND :max_lat
+          AND m.lng BETWEEN :min_lng AND :max_lng
+          AND s.end_day >= :start AND s.start_day <= :end
+        ORDER BY s.start_day, s.start_time
+        LIMIT :limit
+    """,
+}
+
+# 조회별로 플랜에 있어야 하는 인덱스 사용 (check_query_plans)
+EXPECTED_PLANS = {
+    "active_between": "INDEX idx_sessions_end_day ",
+    "upcoming": "INDEX idx_sessions_start_day ",
+    "by_place_prefix": "INDEX idx_markets_place ",
+    "in_bbox": "VIRTUAL TABLE INDEX 2:",   # R*Tree 범위 검색 (0이면 전체 스캔)
+}
+
+# check_query_plans에서 사용할 예시 파라미터
+SAMPLE_PARAMS = {
+    "active_between": {"start": "2025-11-01", "end": "2025-11-02", "limit": DEFAULT_LIMIT},
+    "upcoming": {"today": "2025-11-01", "limit": DEFAULT_LIMIT},
+    "by_place_prefix": {"prefix": "서울", "prefix_end": "서울\U0010ffff", "limit": DEFAULT_LIMIT},
+    "in_bbox": {
+        "min_lat": 37.54, "min_lng": 126.89, "max_lat": 37.57, "max_lng": 126.93,
+        "start": "2025-11-01", "end": "2025-11-02", "limit": DEFAULT_LIMIT,
+    },
+}
+
+_WORD_SPLIT_RE = re.compile(r"[\s\"]+")
+
+_conn = None
+_lock = threading.RLock()
+_cache = OrderedDict()
+_cache_version = None
+CACHE_STATS = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def get_read_connection(db_path=DB_PATH):
+    """조회 전용 연결 (최초 사용 시 테이블/인덱스 보장 후 생성)"""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(db_path, check_same_thread=False)
+        init_db(_conn)
+        _conn.row_factory = sqlite3.Row
+    return _conn
+
+
+def close():
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+        _cache.clear()
+
+
+def invalidate_cache():
+    """결과 캐시 비우기 (같은 연결로 쓴 경우 등 수동 무효화)"""
+    with _lock:
+        _cache.clear()
+        CACHE_STATS["invalidations"] += 1
+
+
+def _check_version(conn):
+    """다른 연결이 커밋했으면 캐시 비우기"""
+    global _cache_version
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if version != _cache_version:
+        if _cache:
+            _cache.clear()
+            CACHE_STATS["invalidations"] += 1
+        _cache_version = version
+
+
+def _cached(key, execute):
+    """LRU 캐시 조회, 없으면 execute(conn) 결과 저장"""
+    with _lock:
+        conn = get_read_connection()
+        _check_version(conn)
+        if key in _cache:
+            _cache.move_to_end(key)
+            CACHE_STATS["hits"] += 1
+            return _cache[key]
+
+        CACHE_STATS["misses"] += 1
+        rows = execute(conn)
+        _cache[key] = rows
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+        return rows
+
+
+def run_query(name, **params):
+    """이름으로 조회 실행 → dict 리스트 (LRU 캐시)"""
+    key = (name, tuple(sorted(params.items())))
+    return _cached(key, lambda conn: [dict(row) for row in conn.execute(QUERIES[name], params)])
+
+
+def markets_active_between(start, end, limit=DEFAULT_LIMIT):
+    """
+    기간과 겹치는 세션 목록 (세션 1개 = 1행)
+
+    Args:
+        start, end: 날짜 (YYYY-MM-DD 또는 "2025.11.01" 같은 자유 형식)
+    """
+    start_day, end_day = normalize_date(start), normalize_date(end)
+    if not start_day or not end_day:
+        raise ValueError(f"날짜 형식 오류: {start!r} ~ {end!r}")
+    return run_query("active_between", start=start_day, end=end_day, limit=limit)
+
+
+def upcoming_sessions(limit=DEFAULT_LIMIT, today=None):
+    """오늘(또는 today) 이후 시작하는 세션, 시작일/시간 순"""
+    today = normalize_date(today) if today else date.today().isoformat()
+    return run_query("upcoming", today=today, limit=limit)
+
+
+def markets_by_place_prefix(prefix, limit=DEFAULT_LIMIT):
+    """장소가 prefix로 시작하는 행사"""
+    prefix = (prefix or "").strip()
+    if not prefix:
+        return []
+    return run_query("by_place_prefix", prefix=prefix, prefix_end=prefix + "\U0010ffff", limit=limit)
+
+
+def markets_in_bbox(min_lat, min_lng, max_lat, max_lng, start=None, end=None, limit=DEFAULT_LIMIT):
+    """
+    화면 범위(위경도 사각형) 안에서 기간과 겹치는 세션
+
+    Args:
+        start, end: 기간 (기본: 오늘 ~ 오늘부터 7일)
+    """
+    start_day = normalize_date(start) if start else date.today().isoformat()
+    if not start_day:
+        raise ValueError(f"날짜 형식 오류: {start!r} ~ {end!r}")
+    end_day = normalize_date(end) if end else (date.fromisoformat(start_day) + timedelta(days=7)).isoformat()
+    if not end_day:
+        raise ValueError(f"날짜 형식 오류: {start!r} ~ {end!r}")
+    return run_query(
+        "in_bbox",
+        min_lat=min(min_lat, max_lat), max_lat=max(min_lat, max_lat),
+        min_lng=min(min_lng, max_lng), max_lng=max(min_lng, max_lng),
+        start=start_day, end=end_day, limit=limit,
+    )
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _make_snippet(text, terms):
+    """bigram 검색 결과용 발췌 (첫 일치 위치 주변)"""
+    lowered = text.lower()
+    positions = [lowered.find(t.lower()) for t in terms if t.lower() in lowered]
+    if not positions:
+        return text[:SNIPPET_CHARS * 2]
+    pos = min(positions)
+    start = max(0, pos - SNIPPET_CHARS)
+    snippet = text[start:pos + SNIPPET_CHARS]
+    for term in terms:
+        snippet = re.sub(re.escape(term), lambda m: f"[{m.group(0)}]", snippet, flags=re.I)
+    return ("…" if start else "") + " ".join(snippet.split()) + "…"
+
+
+def _search_trigram(conn, long_terms, short_terms, limit):
+    """3글자 이상 검색어: trigram MATCH + 짧은 검색어는 같은 행 안에서 부분 일치로 거름"""
+    filters = "".join(
+        " AND (market_search.market_name || ' ' || market_search.place || ' '"
+        " || market_search.notes || ' ' || market_search.raw_text) LIKE ?"
+        for _ in short_terms
+    )
+    match = " AND ".join(_quote(t) for t in long_terms)
+
+    # FTS5가 일치 글 전체를 rank(가중 bm25) 순으로 골라 상위 limit개에만 발췌/조인
+    sql = f"""
+        SELECT m.id, m.market_name, m.place, m.url, m.image_url, r.snippet, r.score
+        FROM (
+            SELECT rowid, snippet(market_search, -1, '[', ']', '…', {SNIPPET_TOKENS}) AS snippet, rank AS score
+            FROM market_search
+            WHERE market_search MATCH ? AND rank MATCH ?{filters}
+            ORDER BY rank
+            LIMIT ?
+        ) r
+        JOIN markets m ON m.id = r.rowid
+        ORDER BY r.score
+    """
+    params = [match, RANK_FUNCTION, *(f"%{t}%" for t in short_terms), limit]
+    return [dict(row) for row in conn.execute(sql, params)]
+
+
+def _search_bigram(conn, terms, limit):
+    """2글자 이하 검색어만 있을 때: bigram 인덱스로 후보 → 원문에서 발췌"""
+    query = " AND ".join(
+        _quote(bigram_text(t)) if len(t) > 1 else _quote(t) + "*"
+        for t in terms
+    )
+    rows = conn.execute("""
+        SELECT m.id, m.market_name, m.place, m.url, m.image_url, f.notes, f.raw_text, r.score
+        FROM (
+            SELECT rowid, rank AS score
+            FROM market_search_bigram
+            WHERE market_search_bigram MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        ) r
+        JOIN market_search f ON f.rowid = r.rowid
+        JOIN markets m ON m.id = r.rowid
+        ORDER BY r.score
+    """, (query, limit)).fetchall()
+
+    results = []
+    for row in rows:
+        result = {k: row[k] for k in ("id", "market_name", "place", "url", "image_url", "score")}
+        text = " ".join(filter(None, (row["market_name"], row["place"], row["notes"], row["raw_text"])))
+        result["snippet"] = _make_snippet(text, terms)
+        results.append(result)
+    return results
+
+
+def search(keyword, limit=SEARCH_LIMIT):
+    """
+    키워드 전문 검색 (행사명, 장소, 세션 메모, 게시글 원문)
+
+    Returns:
+        관련도 순 dict 리스트 (snippet: 일치 부분을 [ ]로 표시한 발췌)
+    """
+    terms = [t for t in _WORD_SPLIT_RE.split(keyword or "") if t]
+    if not terms:
+        return []
+    long_terms = [t for t in terms if len(t) >= 3]
+    short_terms = [t for t in terms if len(t) < 3]
+
+    key = ("search", tuple(terms), limit)
+    if long_terms:
+        return _cached(key, lambda conn: _search_trigram(conn, long_terms, short_terms, limit))
+    return _cached(key, lambda conn: _search_bigram(conn, short_terms, limit))
+
+
+def explain(name, params=None):
+    """EXPLAIN QUERY PLAN 결과 (detail 문자열 리스트)"""
+    conn = get_read_connection()
+    params = params or SAMPLE_PARAMS[name]
+    with _lock:
+        return [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + QUERIES[name], params)]
+
+
+def check_query_plans(verbose=True):
+    """
+    모든 조회의 쿼리 플랜 점검
+
+    Returns:
+        전체 스캔("SCAN ...")이 있거나 기대한 인덱스를 쓰지 않는 조회 이름 리스트
+        (가상 테이블은 EXPECTED_PLANS의 인덱스 번호로 범위 검색 여부 확인)
+    """
+    regressions = []
+    for name in QUERIES:
+        plan = explain(name)
+        scans = [detail for detail in plan if detail.startswith("SCAN") and "VIRTUAL TABLE" not in detail]
+        uses_index = any(EXPECTED_PLANS[name] in detail for detail in plan)
+        failed = bool(scans) or not uses_index
+        if failed:
+            regressions.append(name)
+        if verbose:
+            print(f"{'❌' if failed else '✅'} {name} (기대 플랜: {EXPECTED_PLANS[name].strip()})")
+            for detail in plan:
+                print(f"     {detail}")
+    return regressions
+
+
+def _print_rows(rows):
+    for row in rows:
+        when = f" {row['start_day']} {row['start_time'] or ''}".rstrip() if "start_day" in row else ""
+        print(f"-{when} {row['market_name'][:40]} @ {row['place']}")
+    print(f"({len(rows)}개)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="로컬 DB 조회")
+    parser.add_argument("--upcoming", type=int, metavar="N", help="다가오는 세션 N개")
+    parser.add_argument("--between", nargs=2, metavar=("START", "END"), help="기간 안에 열리는 행사 (--bbox와 함께 쓰면 기간 조건)")
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("MIN_LAT", "MIN_LNG", "MAX_LAT", "MAX_LNG"),
+                        help="화면 범위 안의 행사 (기본 기간: 오늘부터 7일)")
+    parser.add_argument("--place", help="장소 접두어로 행사 찾기")
+    parser.add_argument("--search", help="키워드 전문 검색")
+    args = parser.parse_args()
+
+    if args.upcoming:
+        _print_rows(upcoming_sessions(args.upcoming))
+    if args.bbox:
+        _print_rows(markets_in_bbox(*args.bbox, *(args.between or [])))
+    elif args.between:
+        _print_rows(markets_active_between(*args.between))
+    if args.place:
+        _print_rows(markets_by_place_prefix(args.place))
+    if args.search:
+        for row in search(args.search):
+            print(f"- {row['market_name'][:40]} @ {row['place']}")
+            print(f"    {row['snippet']}")
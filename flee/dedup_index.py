@@ -0,0 +1,234 @@
+"""
+게시글 근접 중복(near-duplicate) 탐지 인덱스
+- raw_text를 문자 단위 shingle로 나눈 뒤 MinHash 시그니처 생성
+- LSH 밴딩으로 후보를 빠르게 찾고, 시그니처 일치율로 유사도 판정
+- 인덱스와 중복 클러스터는 JSON 파일로 저장되어 실행 간 유지됨
+"""
+import difflib
+import json
+import random
+import re
+import zlib
+from datetime import datetime
+
+INDEX_FILE = "fleamarket_dedup_index.json"
+CLUSTER_FILE = "fleamarket_dedup_clusters.json"
+
+# MinHash / LSH 설정 (16 밴드 × 8 행 → 유사도 약 0.7 이상부터 후보로 잡힘)
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+# 유사도 기준
+REUSE_THRESHOLD = 0.9    # 이 이상이면서 날짜/시간이 같으면 기존 정제 결과 그대로 재사용
+VERIFY_THRESHOLD = 0.7   # 이 이상이면 차이점만 LLM으로 검증
+
+# 일정 비교용 토큰 ("2025.10.25", "10월 25일", "10/25" / "오후 1시", "13:00", "6시 반")
+_DATE_TOKEN = re.compile(r"(?:(\d{4})\s*(?:년|[.\-/])\s*)?(\d{1,2})\s*(?:월|[.\-/])\s*(\d{1,2})\s*일?")
+_TIME_TOKEN = re.compile(r"(오전|오후|낮|저녁|밤)?\s*(\d{1,2})\s*(?::\s*(\d{2})|시\s*(반|\d{1,2}\s*분)?)")
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# 해시 함수 파라미터 (시드 고정 → 실행 간 시그니처 호환)
+_rng = random.Random(20251029)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize_text(text):
+    """비교용 텍스트 정규화 (URL, 공백, 특수문자 제거)"""
+    if not text:
+        return ""
+    text = re.sub(r"https?://\S+", "", text)
+    text = re.sub(r"[^가-힣a-zA-Z0-9]", "", text)
+    return text.lower()
+
+
+def shingles(text):
+    """문자 n-gram shingle 집합"""
+    normalized = normalize_text(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text):
+    """raw_text → MinHash 시그니처 (길이 NUM_PERM 정수 리스트)"""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(text)]
+    if not hashes:
+        return None
+    return [
+        min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMS
+    ]
+
+
+def signature_similarity(sig_a, sig_b):
+    """두 시그니처의 추정 Jaccard 유사도"""
+    same = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+    return same / NUM_PERM
+
+
+def _band_keys(signature):
+    """LSH 밴드 키 목록"""
+    return [
+        f"{band}:{zlib.crc32(repr(signature[band * ROWS:(band + 1) * ROWS]).encode())}"
+        for band in range(BANDS)
+    ]
+
+
+def schedule_tokens(text):
+    """
+    본문의 날짜/시간 토큰 집합 (공백 제거, 날짜는 연/월/일 숫자로 정규화)
+    - 같은 템플릿의 월간 모집글처럼 날짜만 바뀐 게시글은 유사도가 높아도 토큰이 달라짐
+    """
+    tokens = set()
+    for m in _DATE_TOKEN.finditer(text or ""):
+        year, month, day = m.group(1), int(m.group(2)), int(m.group(3))
+        if 1 <= month <= 12 and 1 <= day <= 31:
+            tokens.add(f"{year or ''}-{month:02d}-{day:02d}")
+    for m in _TIME_TOKEN.finditer(text or ""):
+        tokens.add("t" + re.sub(r"\s", "", m.group(0)))
+    return tokens
+
+
+def same_schedule(old_text, new_text):
+    """두 게시글의 날짜/시간 토큰이 모두 같은지 (그대로 재사용해도 되는지)"""
+    return schedule_tokens(old_text) == schedule_tokens(new_text)
+
+
+def post_context_diff(old_detail, new_detail):
+    """
+    게시글 작성 연도/크롤링 장소 차이 (검증 프롬프트용 ndiff 형식 줄 리스트, 같으면 빈 리스트)
+    - 프롬프트는 작성일로 연도를 추정하므로 1년 뒤 다시 올라온 같은 글은 그대로 재사용하면 안 됨
+    - 기존 게시글 정보가 없으면 차이 있음으로 취급
+    """
+    if old_detail is None:
+        return [f"+ 작성일: {new_detail.get('post_date', '')}", f"+ 장소: {new_detail.get('place', '')}"]
+    lines = []
+    old_date, new_date = (old_detail.get("post_date") or "").strip(), (new_detail.get("post_date") or "").strip()
+    if old_date[:4] != new_date[:4]:
+        lines += [f"- 작성일: {old_date}", f"+ 작성일: {new_date}"]
+    old_place, new_place = " ".join((old_detail.get("place") or "").split()), " ".join((new_detail.get("place") or "").split())
+    if old_place != new_place:
+        lines += [f"- 장소: {old_place}", f"+ 장소: {new_place}"]
+    return lines
+
+
+def text_diff(old_text, new_text, max_chars=1500):
+    """두 게시글의 달라진 줄만 추출 (검증 프롬프트용)"""
+    old_lines = [l.strip() for l in (old_text or "").splitlines() if l.strip()]
+    new_lines = [l.strip() for l in (new_text or "").splitlines() if l.strip()]
+    changed = [
+        line for line in difflib.ndiff(old_lines, new_lines)
+        if line.startswith(("+ ", "- "))
+    ]
+    return "\n".join(changed)[:max_chars]
+
+
+class DedupIndex:
+    """실행 간 유지되는 MinHash LSH 인덱스"""
+
+    def __init__(self, index_file=INDEX_FILE, cluster_file=CLUSTER_FILE):
+        self.index_file = index_file
+        self.cluster_file = cluster_file
+        self.signatures = {}   # url → signature
+        self.raw_texts = {}    # url → raw_text (diff 생성용)
+        self.buckets = {}      # band key → [url, ...]
+        self.clusters = {}     # 대표 url → {"members": [...]}
+
+    @classmethod
+    def load(cls, index_file=INDEX_FILE, cluster_file=CLUSTER_FILE):
+        """저장된 인덱스 로드 (없거나 손상되면 빈 인덱스)"""
+        index = cls(index_file, cluster_file)
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            for url, entry in saved.get("entries", {}).items():
+                if len(entry.get("sig", [])) == NUM_PERM:
+                    index._insert(url, entry["sig"], entry.get("raw_text", ""))
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            print(f"⚠️  {index_file} 손상 - 중복 인덱스 새로 생성")
+
+        try:
+            with open(cluster_file, "r", encoding="utf-8") as f:
+                index.clusters = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            index.clusters = {}
+
+        return index
+
+    def save(self):
+        """인덱스 + 클러스터 파일 저장"""
+        entries = {
+            url: {"sig": sig, "raw_text": self.raw_texts.get(url, "")}
+            for url, sig in self.signatures.items()
+        }
+        with open(self.index_file, "w", encoding="utf-8") as f:
+            json.dump({"num_perm": NUM_PERM, "bands": BANDS, "entries": entries}, f, ensure_ascii=False)
+        with open(self.cluster_file, "w", encoding="utf-8") as f:
+            json.dump(self.clusters, f, ensure_ascii=False, indent=2)
+
+    def __contains__(self, url):
+        return url in self.signatures
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _insert(self, url, signature, raw_text):
+        self.signatures[url] = signature
+        self.raw_texts[url] = raw_text
+        for key in _band_keys(signature):
+            self.buckets.setdefault(key, []).append(url)
+
+    def add(self, url, raw_text, signature=None):
+        """정제 완료된 게시글을 인덱스에 등록"""
+        if url in self.signatures:
+            return
+        signature = signature or minhash_signature(raw_text)
+        if signature:
+            self._insert(url, signature, raw_text)
+
+    def find_duplicate(self, signature, candidates=None):
+        """
+        가장 유사한 기존 게시글 검색
+
+        Args:
+            signature: 새 게시글의 MinHash 시그니처
+            candidates: 재사용 가능한 url 집합 (None이면 전체)
+
+        Returns:
+            (url, similarity) 또는 (None, 0.0)
+        """
+        if not signature:
+            return None, 0.0
+
+        seen = set()
+        best_url, best_sim = None, 0.0
+        for key in _band_keys(signature):
+            for url in self.buckets.get(key, []):
+                if url in seen or (candidates is not None and url not in candidates):
+                    continue
+                seen.add(url)
+                sim = signature_similarity(signature, self.signatures[url])
+                if sim > best_sim:
+                    best_url, best_sim = url, sim
+
+        if best_sim < VERIFY_THRESHOLD:
+            return None, 0.0
+        return best_url, best_sim
+
+    def record_duplicate(self, url, canonical_url, similarity, mode):
+        """중복 클러스터 기록 (감사용)"""
+        cluster = self.clusters.setdefault(canonical_url, {"members": []})
+        if any(m["url"] == url for m in cluster["members"]):
+            return
+        cluster["members"].append({
+            "url": url,
+            "similarity": round(similarity, 3),
+            "mode": mode,
+            "detected_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        })
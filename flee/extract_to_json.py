@@ -2,22 +2,59 @@
 fleamarket_detail.json → LLM 정제 → fleamarket_structured.json
 (DB 저장하지 않고 JSON만 생성)
 """
+import copy
 import json
 import sys
 import io
-from llm_processor import extract_fleamarket_info
+from llm_processor import extract_fleamarket_info, verify_duplicate, get_llm_stats, reset_llm_stats
+from dedup_index import DedupIndex, minhash_signature, post_context_diff, same_schedule, text_diff, REUSE_THRESHOLD
+from failure_ledger import FailureLedger
+from model_router import route_cheap
 
 # Windows 인코딩: BAT 파일의 chcp 65001이 처리
 
 OUTPUT_FILE = "fleamarket_structured.json"
 
-def extract_to_json(input_file="fleamarket_detail.json", force_update=False):
+def build_source(title, image_url, raw_text, **extra):
+    """structured 데이터에 붙는 _source 메타데이터"""
+    source = {
+        "title": title,
+        "image_url": image_url,
+        "raw_text_length": len(raw_text)
+    }
+    source.update(extra)
+    return source
+
+
+def print_llm_stats(llm_stats):
+    """LLM 호출/토큰 통계 출력"""
+    if not llm_stats.get("calls"):
+        return
+    print(f"   LLM 호출: {llm_stats['calls']}회 / 토큰: {llm_stats.get('total_tokens', 0):,}")
+    print(f"   전체 재시도: {llm_stats.get('full_retries', 0)}회 "
+          f"(낭비 토큰 {llm_stats.get('wasted_tokens', 0):,})")
+    print(f"   Vision 호출: {llm_stats.get('vision_calls', 0)}회 "
+          f"(캐시 사용 {llm_stats.get('vision_cache_hits', 0)}회)")
+    tiers = {k[5:]: v for k, v in llm_stats.items() if k.startswith("tier_")}
+    if tiers:
+        print(f"   라우팅: {', '.join(f'{t} {n}개' for t, n in tiers.items())} "
+              f"(승격 {llm_stats.get('escalations', 0)}회)")
+    print(f"   필드 재질의: {llm_stats.get('reask_calls', 0)}회 "
+          f"(토큰 {llm_stats.get('reask_tokens', 0):,}, 비운 필드 {llm_stats.get('blanked_fields', 0)}개)")
+
+
+def extract_to_json(input_file="fleamarket_detail.json", force_update=False, use_dedup=True, retry_dead_letters=False,
+                    use_async=False, use_router=False):
     """
     detail.json → LLM 정제 → structured.json
     
     Args:
         input_file: 입력 JSON 파일
         force_update: True면 전체 재처리, False면 신규만 처리
+        use_dedup: True면 근접 중복 게시글은 기존 결과 재사용
+        retry_dead_letters: True면 dead-letter 게시글도 다시 시도
+        use_async: True면 비동기 엔진으로 여러 게시글을 동시에 정제
+        use_router: True면 규칙 파서/소형 모델을 먼저 시도하고 신뢰도가 낮을 때만 기본 모델 사용
     """
     
     print("=" * 80)
@@ -54,13 +91,68 @@ def extract_to_json(input_file="fleamarket_detail.json", force_update=False):
     else:
         print("🔄 전체 재처리 모드")
     
-    # 3. LLM 정제
+    # 3. 근접 중복 인덱스 준비 (기존 정제 결과만 재사용 대상)
+    structured_by_url = {s["url"]: s for s in existing_structured}
+    dedup = None
+    if use_dedup:
+        dedup = DedupIndex() if force_update else DedupIndex.load()
+        for detail in details:
+            url = detail.get("url", "")
+            if url in structured_by_url and url not in dedup:
+                dedup.add(url, detail.get("raw_text", "").strip())
+        print(f"✅ 중복 인덱스: {len(dedup)}개 게시글")
+
+    # 실패 기록 (백오프 중이거나 dead-letter인 게시글은 LLM 호출 안 함)
+    ledger = FailureLedger()
+    if retry_dead_letters:
+        released = ledger.release_dead_letters()
+        print(f"🔁 dead-letter 재시도: {len(released)}개")
+
+    # 4. LLM 정제
     new_structured = []
     success_count = 0
     skip_count = 0
     fail_count = 0
+    reuse_count = 0
+    verify_count = 0
+    backoff_count = 0
+    dead_letter_count = 0
     
     print(f"\n🤖 LLM 정제 시작 ({len(details)}개 처리)...\n")
+    reset_llm_stats()
+
+    def handle_result(detail, structured_data, failure_reason, signature, tier="strong", confidence=None):
+        """LLM 정제 결과 반영 (성공 → 추가 / 실패 → 실패 기록)"""
+        nonlocal success_count, fail_count, dead_letter_count
+        url = detail["url"]
+        raw_text = detail.get("raw_text", "").strip()
+
+        if structured_data:
+            # 추가 메타데이터
+            structured_data["_source"] = build_source(
+                detail.get("title", "").strip(), detail.get("image_url", ""), raw_text, tier=tier
+            )
+            if confidence is not None:
+                structured_data["_source"]["confidence"] = confidence
+            
+            new_structured.append(structured_data)
+            structured_by_url[url] = structured_data
+            if dedup is not None:
+                dedup.add(url, raw_text, signature)
+            success_count += 1
+            print(f"  ✅ 성공")
+        else:
+            fail_count += 1
+            if ledger.record_failure(url, failure_reason, detail.get("title", "").strip()):
+                dead_letter_count += 1
+                print(f"  ❌ 실패 → dead-letter 이동 (재시도 한도 초과)")
+            else:
+                print(f"  ❌ 실패")
+
+    # 비동기 모드: LLM 정제가 필요한 게시글을 모았다가 한 번에 처리
+    pending = []
+    # 근접 중복의 원래 게시글 작성일/장소 비교용
+    details_by_url = {detail.get("url"): detail for detail in details if detail.get("url")}
     
     for i, detail in enumerate(details, 1):
         url = detail.get("url", "")
@@ -79,32 +171,103 @@ def extract_to_json(input_file="fleamarket_detail.json", force_update=False):
             skip_count += 1
             continue
 
+        # 반복 실패한 게시글은 백오프 / dead-letter
+        if not force_update and ledger.skip_reason(url):
+            backoff_count += 1
+            continue
+
         print(f"[{i}/{len(details)}] {title[:40]}")
 
+        # 근접 중복 확인 → 재사용 또는 차이점 검증
+        signature = None
+        if dedup is not None:
+            signature = minhash_signature(raw_text)
+            dup_url, similarity = dedup.find_duplicate(signature, structured_by_url)
+
+            # 날짜/시간이 하나라도 다르거나 (예: 월간 모집글의 "10월 25일" → "11월 22일")
+            # 작성 연도/장소가 다르면 (1년 뒤 재게시 → 연도 추정이 달라짐) 차이 검증으로
+            context_diff = post_context_diff(details_by_url.get(dup_url), detail) if dup_url else []
+            if (dup_url and similarity >= REUSE_THRESHOLD and not context_diff
+                    and same_schedule(dedup.raw_texts.get(dup_url, ""), raw_text)):
+                structured_data = copy.deepcopy(structured_by_url[dup_url])
+                structured_data["url"] = url
+                structured_data["_source"] = build_source(
+                    title, image_url, raw_text, duplicate_of=dup_url, similarity=round(similarity, 3)
+                )
+                dedup.record_duplicate(url, dup_url, similarity, "reused")
+                new_structured.append(structured_data)
+                structured_by_url[url] = structured_data
+                reuse_count += 1
+                success_count += 1
+                print(f"  ♻️  근접 중복 재사용 (유사도 {similarity:.2f})")
+                continue
+
+            if dup_url:
+                diff = "\n".join(context_diff + [text_diff(dedup.raw_texts.get(dup_url, ""), raw_text)]).strip()
+                verified = verify_duplicate(structured_by_url[dup_url], diff, url)
+                if verified:
+                    verified["_source"] = build_source(
+                        title, image_url, raw_text, duplicate_of=dup_url, similarity=round(similarity, 3)
+                    )
+                    dedup.record_duplicate(url, dup_url, similarity, "verified")
+                    dedup.add(url, raw_text, signature)
+                    new_structured.append(verified)
+                    structured_by_url[url] = verified
+                    verify_count += 1
+                    success_count += 1
+                    print(f"  🔎 근접 중복 차이 검증 완료 (유사도 {similarity:.2f})")
+                    continue
+
+        # 저비용 단계(규칙 파서 → 소형 모델) 우선 시도
+        if use_router:
+            routed, tier, confidence = route_cheap(detail)
+            if routed:
+                handle_result(detail, routed, None, signature, tier=tier, confidence=confidence)
+                continue
+            print(f"  ⬆️  저비용 단계 신뢰도 부족 ({confidence:.2f}) → 기본 모델")
+
+        if use_async:
+            pending.append((detail, signature))
+            continue
+
         # LLM 정제 (원본 장소 정보 + 게시글 작성일 전달)
-        structured_data = extract_fleamarket_info(raw_text, url, title, image_url, original_place, post_date)
-        
-        if structured_data:
-            # 추가 메타데이터
-            structured_data["_source"] = {
-                "title": title,
-                "image_url": image_url,
-                "raw_text_length": len(raw_text)
-            }
-            
-            new_structured.append(structured_data)
-            success_count += 1
-            print(f"  ✅ 성공")
-        else:
-            fail_count += 1
-            print(f"  ❌ 실패")
+        failure_reason = "텍스트 기반 JSON 변환 실패"
+        try:
+            structured_data = extract_fleamarket_info(raw_text, url, title, image_url, original_place, post_date)
+        except Exception as e:
+            structured_data = None
+            failure_reason = f"{type(e).__name__}: {e}"
+
+        handle_result(detail, structured_data, failure_reason, signature)
+
+    if pending:
+        from async_extractor import extract_many
+
+        print(f"\n⚡ 비동기 정제: {len(pending)}개 게시글 동시 처리\n")
+        done = []
+
+        def on_progress(detail, result, error):
+            done.append(detail)
+            status = "✅" if result else "❌"
+            print(f"[{len(done)}/{len(pending)}] {status} {detail.get('title', '').strip()[:40]}")
+
+        results = extract_many([detail for detail, _ in pending], on_result=on_progress)
+        for (detail, signature), (_, structured_data, error) in zip(pending, results):
+            handle_result(detail, structured_data, error or "텍스트 기반 JSON 변환 실패", signature)
     
-    # 4. 기존 + 신규 병합
+    # 5. 기존 + 신규 병합
     all_structured = existing_structured + new_structured
     
-    # 5. JSON 저장
+    # 6. JSON 저장
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         json.dump(all_structured, f, ensure_ascii=False, indent=2)
+
+    if dedup is not None:
+        dedup.save()
+
+    for data in new_structured:
+        ledger.record_success(data["url"])
+    ledger.save()
     
     print()
     print("=" * 80)
@@ -112,7 +275,11 @@ def extract_to_json(input_file="fleamarket_detail.json", force_update=False):
     print(f"   총 데이터: {len(all_structured)}개")
     print(f"   신규 추가: {success_count}개")
     print(f"   기존 유지: {skip_count}개")
-    print(f"   실패: {fail_count}개")
+    if dedup is not None:
+        print(f"   중복 재사용: {reuse_count}개 / 차이 검증: {verify_count}개")
+    print(f"   실패: {fail_count}개 (dead-letter 이동 {dead_letter_count}개)")
+    print(f"   백오프/dead-letter 스킵: {backoff_count}개")
+    print_llm_stats(get_llm_stats())
     print("=" * 80)
     
     return OUTPUT_FILE
@@ -122,9 +289,14 @@ if __name__ == "__main__":
     import sys
     
     force = "--force" in sys.argv or "-f" in sys.argv
+    no_dedup = "--no-dedup" in sys.argv
+    retry_dead = "--retry-dead-letters" in sys.argv
+    use_async = "--async" in sys.argv
+    use_router = "--route" in sys.argv
     
     if force:
         print("⚠️  전체 재처리 모드 활성화\n")
     
-    extract_to_json(force_update=force)
+    extract_to_json(force_update=force, use_dedup=not no_dedup, retry_dead_letters=retry_dead, use_async=use_async,
+                    use_router=use_router)
 
@@ -0,0 +1,110 @@
+"""
+LLM 정제 실패 기록 (negative cache + dead-letter queue)
+- 실패한 게시글의 실패 사유와 시도 횟수를 저장
+- 재시도 간격은 지수 백오프 (1시간 → 2시간 → 4시간 ...)
+- MAX_ATTEMPTS번 실패하면 dead-letter 파일로 이동해 자동 재시도 중단
+- dead-letter는 `python extract_to_json.py --retry-dead-letters`로 수동 재시도
+"""
+import json
+from datetime import datetime, timedelta
+
+LEDGER_FILE = "extraction_failures.json"
+DEAD_LETTER_FILE = "extraction_dead_letter.json"
+
+MAX_ATTEMPTS = 5
+BASE_BACKOFF_HOURS = 1
+MAX_BACKOFF_HOURS = 72
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _load(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        print(f"⚠️  {path} 손상 - 빈 기록으로 시작")
+        return {}
+
+
+def backoff_delay(attempts):
+    """attempts번 실패 후 다음 재시도까지 대기 시간"""
+    hours = min(BASE_BACKOFF_HOURS * (2 ** (attempts - 1)), MAX_BACKOFF_HOURS)
+    return timedelta(hours=hours)
+
+
+class FailureLedger:
+    """url → 실패 기록 (실패 사유, 시도 횟수, 다음 재시도 시각)"""
+
+    def __init__(self, ledger_file=LEDGER_FILE, dead_letter_file=DEAD_LETTER_FILE):
+        self.ledger_file = ledger_file
+        self.dead_letter_file = dead_letter_file
+        self.failures = _load(ledger_file)
+        self.dead_letters = _load(dead_letter_file)
+
+    def save(self):
+        with open(self.ledger_file, "w", encoding="utf-8") as f:
+            json.dump(self.failures, f, ensure_ascii=False, indent=2)
+        with open(self.dead_letter_file, "w", encoding="utf-8") as f:
+            json.dump(self.dead_letters, f, ensure_ascii=False, indent=2)
+
+    def skip_reason(self, url, now=None):
+        """
+        이번 실행에서 건너뛸 이유 (None이면 처리 대상)
+        - dead-letter에 있음
+        - 백오프 대기 중
+        """
+        if url in self.dead_letters:
+            return "dead_letter"
+        entry = self.failures.get(url)
+        if entry:
+            now = now or datetime.now()
+            if now < datetime.strptime(entry["next_retry_at"], TIME_FORMAT):
+                return "backoff"
+        return None
+
+    def record_failure(self, url, reason, title=""):
+        """
+        실패 기록
+
+        Returns:
+            True면 시도 한도 초과로 dead-letter로 이동됨
+        """
+        now = datetime.now()
+        entry = self.failures.get(url, {"title": title, "attempts": 0, "first_failed_at": now.strftime(TIME_FORMAT)})
+        entry["attempts"] += 1
+        entry["reason"] = reason
+        entry["last_failed_at"] = now.strftime(TIME_FORMAT)
+        entry["next_retry_at"] = (now + backoff_delay(entry["attempts"])).strftime(TIME_FORMAT)
+
+        if entry["attempts"] >= MAX_ATTEMPTS:
+            self.failures.pop(url, None)
+            self.dead_letters[url] = entry
+            return True
+
+        self.failures[url] = entry
+        return False
+
+    def record_success(self, url):
+        """성공하면 실패 기록 삭제"""
+        self.failures.pop(url, None)
+        self.dead_letters.pop(url, None)
+
+    def release_dead_letters(self, urls=None):
+        """
+        dead-letter → 재시도 대상으로 복귀 (시도 횟수 초기화)
+
+        Args:
+            urls: 복귀시킬 url 목록 (None이면 전체)
+
+        Returns:
+            복귀된 url 리스트
+        """
+        targets = list(self.dead_letters) if urls is None else [u for u in urls if u in self.dead_letters]
+        for url in targets:
+            self.dead_letters.pop(url)
+            # 백오프 없이 바로 재시도 (실패 기록은 삭제)
+            self.failures.pop(url, None)
+        return targets
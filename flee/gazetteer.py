@@ -0,0 +1,297 @@
+"""
+오프라인 장소 사전 (gazetteer)
+- gazetteer.csv(지하철역, 공원, 시장, 광장 등 자주 나오는 장소) + 지오코딩 캐시의 성공 이력으로 구성
+- 정제한 장소명(공백 제거)의 2글자 n-gram 역색인으로 후보를 찾고 유사도로 점수 계산
+  - 사전 장소명이 입력에 단어 단위로 들어 있으면 ("홍대입구역 9번 출구 앞") 높은 점수, 여러 개면 가장 긴 이름
+    (단어 중간에 들어 있으면 다른 장소: "부천시청역" ≠ "시청역", "남동대문역" ≠ "동대문역")
+  - 그 외에는 n-gram Dice 유사도 ("홍대 입구" ↔ "홍대입구역")
+  - 번지 등 숫자가 있는 장소명은 숫자가 모두 같을 때만 유사도 인정 ("망원동 125-4" ≠ "망원동 123-4")
+- 번들 CSV는 서울 장소만 있으므로 입력에 다른 지역("대전", "부천시")이나 다른 자치구("은평구 신사역")가 있으면 낮은 신뢰도
+- 점수가 GAZETTEER_MIN_CONFIDENCE 미만이거나, 비슷한 점수의 후보가 서로 멀리 떨어져 있으면 미적중
+  → 외부 API(Kakao, Google)로 넘어감
+- add_geocoding.geocode_place가 캐시 다음, 외부 API 전에 조회
+
+사용법:
+    python gazetteer.py "홍대입구역 9번 출구"   # 매칭 결과와 점수
+    python gazetteer.py                         # 사전 현황
+"""
+import argparse
+import csv
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+GAZETTEER_CSV = Path(__file__).parent / "gazetteer.csv"
+
+# 이 점수 이상이면 외부 API 없이 사전 좌표 사용
+GAZETTEER_MIN_CONFIDENCE = 0.8
+
+# 사전 장소명이 입력에 포함된 경우 점수 (짧은 이름은 오매칭 위험이 커서 제외)
+CONTAINED_SCORE = 0.95
+MIN_CONTAINED_LENGTH = 3
+
+# 1·2위 후보 점수 차가 이보다 작고 거리가 AMBIGUOUS_KM보다 멀면 애매한 매칭으로 보고 미적중 처리
+AMBIGUOUS_MARGIN = 0.05
+AMBIGUOUS_KM = 1.0
+
+NGRAM = 2
+
+# 번들 CSV district 컬럼과 비교할 서울 자치구
+SEOUL_DISTRICTS = {
+    "강남구", "강동구", "강북구", "강서구", "관악구", "광진구", "구로구", "금천구", "노원구", "도봉구",
+    "동대문구", "동작구", "마포구", "서대문구", "서초구", "성동구", "성북구", "송파구", "양천구", "영등포구",
+    "용산구", "은평구", "종로구", "중구", "중랑구",
+}
+# 서울 밖 광역 지역명 (단어가 이 이름으로 시작하면 다른 지역)
+OTHER_REGIONS = (
+    "부산", "대구", "인천", "광주", "대전", "울산", "세종", "경기", "강원", "충북", "충남", "충청",
+    "전북", "전남", "전라", "경북", "경남", "경상", "제주",
+)
+
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def _compact(place):
+    """매칭용 문자열 (캐시 키와 같은 정제 + 공백 제거)"""
+    from geocode_cache import normalize_key
+
+    return normalize_key(place).replace(" ", "")
+
+
+def _words(place):
+    from geocode_cache import normalize_key
+
+    return normalize_key(place).split()
+
+
+def _word_bounds(words):
+    """공백 제거 문자열에서 원래 단어가 시작/끝나는 위치 집합"""
+    starts, ends, position = set(), set(), 0
+    for word in words:
+        starts.add(position)
+        position += len(word)
+        ends.add(position)
+    return starts, ends
+
+
+def _contained(key, query, starts, ends):
+    """
+    key가 query 안에 단어 경계에서 시작하고 끝나도록 들어 있는지
+    ("서울역 광장" O, "서울역사박물관" X, "부천시청역" ↔ "시청역" X)
+    """
+    start = query.find(key)
+    while start != -1:
+        if start in starts and start + len(key) in ends:
+            return True
+        start = query.find(key, start + 1)
+    return False
+
+
+def _other_region(words, districts):
+    """입력의 지역 단어가 사전 장소의 자치구와 맞지 않는지 (서울 밖 지역명 또는 다른 자치구)"""
+    for word in words:
+        if word.startswith("서울"):
+            continue
+        if word.startswith(OTHER_REGIONS):
+            return True
+        # "부천시", "양평군" 같은 시/군 단어 (2글자 "전시", "도시" 등 일반 단어 제외)
+        if 3 <= len(word) <= 5 and word[-1] in "시군" and not re.search(r"\d", word):
+            return True
+        if word in SEOUL_DISTRICTS and word not in districts:
+            return True
+    return False
+
+
+def _grams(text):
+    if len(text) < NGRAM:
+        return {text} if text else set()
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def _distance_km(a, b):
+    # 도시 규모 거리라 평면 근사로 충분 (위도 1도 ≈ 111km, 경도 1도 ≈ 88km @ 37°N)
+    return (((a["lat"] - b["lat"]) * 111) ** 2 + ((a["lng"] - b["lng"]) * 88) ** 2) ** 0.5
+
+
+class Gazetteer:
+    """정제한 장소명 → 좌표 (n-gram 역색인 유사 매칭)"""
+
+    def __init__(self):
+        self.entries = []          # {"key", "name", "lat", "lng", "source", "districts", "grams", "numbers"}
+        self.by_key = {}           # 정제 키 → entries 인덱스
+        self.index = {}            # n-gram → entries 인덱스 집합
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def add(self, name, lat, lng, source, replace=False, districts=()):
+        """
+        장소 추가 (같은 정제 키가 이미 있으면 replace=True일 때만 교체)
+        - districts: 장소가 속한 서울 자치구 (번들 CSV만, 입력의 지역 단어와 비교)
+
+        Returns:
+            추가/교체 여부
+        """
+        key = _compact(name)
+        if not key or lat is None or lng is None:
+            return False
+
+        with self.lock:
+            if key in self.by_key:
+                if not replace:
+                    return False
+                entry = self.entries[self.by_key[key]]
+                entry.update(name=name, lat=lat, lng=lng, source=source, districts=frozenset(districts))
+                return True
+
+            grams = _grams(key)
+            self.by_key[key] = len(self.entries)
+            for gram in grams:
+                self.index.setdefault(gram, set()).add(len(self.entries))
+            self.entries.append({
+                "key": key, "name": name, "lat": lat, "lng": lng, "source": source,
+                "districts": frozenset(districts), "grams": grams, "numbers": _NUMBER_RE.findall(key),
+            })
+        return True
+
+    def load_csv(self, path=GAZETTEER_CSV):
+        """번들 CSV (name, aliases, category, district, lat, lng) 로드 → 추가된 장소 수"""
+        added = 0
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                lat, lng = float(row["lat"]), float(row["lng"])
+                source = f"gazetteer:{row.get('category') or 'venue'}"
+                names = [row["name"]] + [alias for alias in (row.get("aliases") or "").split("|") if alias.strip()]
+                districts = [d.strip() for d in (row.get("district") or "").split("|") if d.strip()]
+                for name in names:
+                    added += self.add(name.strip(), lat, lng, source, replace=True, districts=districts)
+        return added
+
+    def load_history(self, cache=None):
+        """지오코딩 캐시의 성공 이력 로드 (번들 CSV와 겹치면 CSV 우선) → 추가된 장소 수"""
+        from geocode_cache import get_geocode_cache
+
+        cache = cache or get_geocode_cache()
+        added = 0
+        for query, place_name, lat, lng in cache.successes():
+            added += self.add(query, lat, lng, "history")
+            # 키워드 검색 결과의 장소명도 별칭으로 (주소 검색 결과는 번지라 제외)
+            if place_name and not re.search(r"\d", place_name):
+                added += self.add(place_name, lat, lng, "history")
+        return added
+
+    def match(self, place):
+        """
+        가장 비슷한 장소 → (entry, 점수) 또는 (None, 0.0)
+        애매한 매칭(비슷한 점수의 후보가 멀리 떨어짐), 다른 지역 입력에 걸린 번들 장소는 점수 0으로 반환
+        """
+        query = _compact(place)
+        grams = _grams(query)
+        if not grams:
+            return None, 0.0
+        words = _words(place)
+        starts, ends = _word_bounds(words)
+        numbers = _NUMBER_RE.findall(query)
+
+        with self.lock:
+            if query in self.by_key:
+                entry = self.entries[self.by_key[query]]
+                return entry, 0.0 if entry["districts"] and _other_region(words, entry["districts"]) else 1.0
+
+            overlaps = Counter()
+            for gram in grams:
+                for i in self.index.get(gram, ()):
+                    overlaps[i] += 1
+
+            scored = []
+            other_region = None
+            for i, overlap in overlaps.items():
+                entry = self.entries[i]
+                if entry["districts"] and _other_region(words, entry["districts"]):
+                    other_region = entry
+                    continue
+                contained = entry["key"] in query and _contained(entry["key"], query, starts, ends)
+                if entry["key"] in query and not contained:
+                    # 더 긴 다른 이름의 일부 ("구서울역" ↔ "서울역")
+                    continue
+                # 번지가 있는 이력(주소)은 포함 관계가 다른 번지에도 성립하므로 포함 점수 제외 ("종로3가역" 등 번들은 허용)
+                if (contained and len(entry["key"]) >= MIN_CONTAINED_LENGTH
+                        and (not entry["numbers"] or entry["districts"])):
+                    # 포함된 이름이 여러 개면 긴(구체적인) 이름 우선
+                    score = CONTAINED_SCORE + 0.001 * len(entry["key"])
+                elif entry["numbers"] and entry["numbers"] != numbers:
+                    # 번지/출구 번호가 다르면 글자가 거의 같아도 다른 장소
+                    continue
+                else:
+                    score = 2 * overlap / (len(grams) + len(entry["grams"]))
+                scored.append((score, entry))
+
+        if not scored:
+            return (other_region, 0.0) if other_region else (None, 0.0)
+        scored.sort(key=lambda item: item[0], reverse=True)
+        best_score, best = scored[0]
+        for score, other in scored[1:]:
+            if best_score - score >= AMBIGUOUS_MARGIN:
+                break
+            if _distance_km(best, other) > AMBIGUOUS_KM:
+                return best, 0.0
+        return best, min(best_score, 1.0)
+
+    def lookup(self, place, min_confidence=GAZETTEER_MIN_CONFIDENCE):
+        """장소명 → 좌표 dict (geocode_place 결과 형식) 또는 None (미적중/낮은 신뢰도)"""
+        entry, score = self.match(place)
+        hit = entry is not None and score >= min_confidence
+        with self.lock:
+            self.stats["hits" if hit else "low_confidence" if entry is not None else "misses"] += 1
+        if not hit:
+            return None
+
+        return {
+            "lat": entry["lat"],
+            "lng": entry["lng"],
+            "address": "",
+            "place_name": entry["name"],
+            "method": "사전",
+            "provider": "gazetteer",
+            "confidence": round(score, 3),
+        }
+
+    def print_stats(self):
+        s = self.stats
+        print(f"📖 장소 사전: 적중 {s['hits']}개 / 낮은 신뢰도 {s['low_confidence']}개 / 미적중 {s['misses']}개 "
+              f"(사전 {len(self.entries)}개)")
+
+
+_default_gazetteer = None
+_default_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """프로세스 공용 사전 (최초 사용 시 번들 CSV + 지오코딩 이력 로드)"""
+    global _default_gazetteer
+    with _default_lock:
+        if _default_gazetteer is None:
+            gazetteer = Gazetteer()
+            if GAZETTEER_CSV.exists():
+                gazetteer.load_csv()
+            gazetteer.load_history()
+            _default_gazetteer = gazetteer
+        return _default_gazetteer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="오프라인 장소 사전 조회")
+    parser.add_argument("place", nargs="?", help="조회할 장소명")
+    args = parser.parse_args()
+
+    gazetteer = get_gazetteer()
+    sources = Counter(entry["source"].split(":")[0] for entry in gazetteer.entries)
+    print(f"📖 장소 사전: {len(gazetteer.entries)}개 (번들 {sources['gazetteer']}개 / 이력 {sources['history']}개)")
+    if args.place:
+        entry, score = gazetteer.match(args.place)
+        if entry is None:
+            print(f"❌ '{args.place}' - 후보 없음")
+        else:
+            verdict = "✅ 사용" if score >= GAZETTEER_MIN_CONFIDENCE else "⚠️  API 조회 필요"
+            print(f"{verdict}: '{args.place}' → {entry['name']} ({entry['lat']:.6f}, {entry['lng']:.6f}) "
+                  f"점수 {score:.2f} [{entry['source']}]")
@@ -0,0 +1,186 @@
+"""
+지오코딩 결과 캐시 (SQLite, geocode_cache.db)
+- 키: clean_place_text로 정제한 장소명 (공백 정리, 소문자) → 표기만 다른 같은 장소는 한 번만 조회
+- 성공 결과는 좌표/주소/검색 방법/제공자(kakao, google)와 함께 오래 보관
+- 실패(모든 검색 방법에서 결과 없음)도 짧은 기간 보관 → 같은 실패 장소를 매번 다시 조회하지 않음
+- 네트워크 오류 등 일시적 실패는 저장하지 않음 (호출측에서 판단)
+- 모든 지오코딩 진입점(add_geocoding.geocode_place)이 같은 캐시 사용
+
+사용법:
+    python geocode_cache.py                   # 캐시 현황
+    python geocode_cache.py --clear-negative  # 실패 기록 삭제 (즉시 재조회)
+"""
+import argparse
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+GEOCODE_CACHE_DB = "geocode_cache.db"
+
+# 보관 기간 (실패는 장소 정보가 보강되거나 API 색인이 갱신될 수 있으므로 짧게)
+POSITIVE_TTL_DAYS = 365
+NEGATIVE_TTL_DAYS = 7
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def normalize_key(place):
+    """캐시 키 (괄호/층수/특수문자 제거 + 공백 정리 + 소문자)"""
+    from add_geocoding import clean_place_text
+
+    return " ".join(clean_place_text(place or "").split()).lower()
+
+
+class GeocodeCache:
+    """정제된 장소명 → 지오코딩 결과 (실패 포함)"""
+
+    def __init__(self, db_path=GEOCODE_CACHE_DB):
+        self.db_path = db_path
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "stores": 0, "negative_stores": 0}
+        # 동시 지오코딩 작업 스레드에서 공유하므로 연결 사용은 잠금
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                key TEXT PRIMARY KEY,
+                query TEXT,
+                status TEXT NOT NULL,
+                lat REAL,
+                lng REAL,
+                address TEXT,
+                place_name TEXT,
+                method TEXT,
+                provider TEXT,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT,
+                expires_at TEXT
+            )
+        """)
+        self._conn.commit()
+
+    def lookup(self, place):
+        """
+        장소명 → (캐시 적중 여부, 결과)
+        - (True, dict): 성공 결과
+        - (True, None): 최근 실패한 장소 (API 호출 생략)
+        - (False, None): 캐시 없음 또는 만료
+        """
+        key = normalize_key(place)
+        if not key:
+            return False, None
+
+        now = datetime.now().strftime(TIME_FORMAT)
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT status, lat, lng, address, place_name, method, provider FROM geocode_cache
+                   WHERE key = ? AND expires_at > ?""",
+                (key, now),
+            ).fetchone()
+            if not row:
+                self.stats["misses"] += 1
+                return False, None
+
+            self._conn.execute("UPDATE geocode_cache SET hits = hits + 1 WHERE key = ?", (key,))
+            self._conn.commit()
+            status, lat, lng, address, place_name, method, provider = row
+            if status != "ok":
+                self.stats["negative_hits"] += 1
+                return True, None
+
+            self.stats["hits"] += 1
+            return True, {
+                "lat": lat,
+                "lng": lng,
+                "address": address,
+                "place_name": place_name or "",
+                "method": method,
+                "provider": provider,
+                "cached": True,
+            }
+
+    def store(self, place, result, provider=None):
+        """결과 저장 (result가 None이면 실패로 저장, NEGATIVE_TTL_DAYS 후 만료)"""
+        key = normalize_key(place)
+        if not key:
+            return
+
+        now = datetime.now()
+        ttl = POSITIVE_TTL_DAYS if result else NEGATIVE_TTL_DAYS
+        result = result or {}
+        with self._lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO geocode_cache
+                   (key, query, status, lat, lng, address, place_name, method, provider, created_at, expires_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    key, place, "ok" if result else "miss",
+                    result.get("lat"), result.get("lng"), result.get("address"), result.get("place_name"),
+                    result.get("method"), provider if result else None,
+                    now.strftime(TIME_FORMAT), (now + timedelta(days=ttl)).strftime(TIME_FORMAT),
+                ),
+            )
+            self._conn.commit()
+            self.stats["stores" if result else "negative_stores"] += 1
+
+    def hit_rate(self):
+        """이번 실행의 캐시 적중률 (실패 기록 적중 포함)"""
+        lookups = self.stats["hits"] + self.stats["negative_hits"] + self.stats["misses"]
+        return (self.stats["hits"] + self.stats["negative_hits"]) / lookups if lookups else 0.0
+
+    def print_stats(self):
+        s = self.stats
+        print(f"🗃️  지오코딩 캐시: 적중 {s['hits']}개 / 실패 기록 적중 {s['negative_hits']}개 / "
+              f"미적중 {s['misses']}개 (적중률 {self.hit_rate():.0%})")
+
+    def summary(self):
+        """저장된 항목 현황 {"ok", "miss", "expired"}"""
+        now = datetime.now().strftime(TIME_FORMAT)
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM geocode_cache WHERE expires_at > ? GROUP BY status", (now,)
+            ).fetchall())
+            expired = self._conn.execute(
+                "SELECT COUNT(*) FROM geocode_cache WHERE expires_at <= ?", (now,)
+            ).fetchone()[0]
+        return {"ok": counts.get("ok", 0), "miss": counts.get("miss", 0), "expired": expired}
+
+    def successes(self):
+        """만료되지 않은 성공 결과 [(원본 장소명, 검색된 장소명, lat, lng)] (gazetteer 이력용)"""
+        now = datetime.now().strftime(TIME_FORMAT)
+        with self._lock:
+            return self._conn.execute(
+                "SELECT query, place_name, lat, lng FROM geocode_cache WHERE status = 'ok' AND expires_at > ?",
+                (now,),
+            ).fetchall()
+
+    def clear_negative(self):
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM geocode_cache WHERE status != 'ok'").rowcount
+            self._conn.commit()
+        return removed
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_geocode_cache():
+    """프로세스 공용 캐시 (최초 사용 시 연결, 동시 지오코딩 작업 스레드에서도 1개만 생성)"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = GeocodeCache()
+        return _default_cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="지오코딩 캐시 현황")
+    parser.add_argument("--clear-negative", action="store_true", help="실패 기록 삭제")
+    args = parser.parse_args()
+
+    cache = get_geocode_cache()
+    if args.clear_negative:
+        print(f"🧹 실패 기록 {cache.clear_negative()}개 삭제")
+    summary = cache.summary()
+    print(f"🗃️  성공 {summary['ok']}개 / 실패 기록 {summary['miss']}개 / 만료 {summary['expired']}개")
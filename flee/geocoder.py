@@ -0,0 +1,151 @@
+"""
+동시 지오코딩 엔진
+- 공유 토큰 버킷으로 Kakao 요청 속도 제한 (모든 스레드/진입점 합산, 기본 초당 10회)
+- 여러 장소를 작업 스레드에서 동시에 처리 → 대량 처리 시간이 요청 한도에 비례해 단축
+- 같은 장소(정제 키 기준)를 동시에 요청하면 진행 중인 조회 1개의 결과를 함께 사용
+- 처리할 장소가 작업 스레드보다 적으면 주소 검색과 키워드 검색을 동시에 보내 지연 시간 단축
+  (대량 처리 때는 요청 한도를 아끼기 위해 기존 순서대로 검색)
+"""
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+
+# Kakao 로컬 API 요청 한도 (초당 요청 수, 순간 최대 요청 수)
+KAKAO_RATE_PER_SEC = float(os.getenv("KAKAO_RATE_PER_SEC", "10"))
+KAKAO_BURST = int(os.getenv("KAKAO_BURST", "10"))
+
+GEOCODE_WORKERS = int(os.getenv("GEOCODE_WORKERS", "8"))
+
+# imap에서 한 번에 미리 제출해 두는 항목 수 (메모리 사용량 제한)
+IMAP_WINDOW = 200
+
+
+class TokenBucket:
+    """스레드 공용 토큰 버킷 (rate개/초 충전, 최대 burst개)"""
+
+    def __init__(self, rate=KAKAO_RATE_PER_SEC, burst=KAKAO_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        """토큰 1개 사용 (없으면 충전될 때까지 대기)"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+
+_kakao_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_kakao_bucket():
+    """프로세스 공용 Kakao 요청 토큰 버킷"""
+    global _kakao_bucket
+    with _bucket_lock:
+        if _kakao_bucket is None:
+            _kakao_bucket = TokenBucket()
+        return _kakao_bucket
+
+
+class GeocodeEngine:
+    """장소명 → 좌표를 작업 스레드에서 동시에 조회 (캐시/요청 한도 공유, 중복 조회 합침)"""
+
+    def __init__(self, workers=GEOCODE_WORKERS):
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.inflight = {}   # 정제 키 → Future
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def submit(self, place, parallel=False):
+        """
+        장소 조회 예약 → Future (같은 장소가 진행 중이면 그 Future를 공유)
+
+        Args:
+            parallel: True면 주소/키워드 검색 동시 요청 (요청 수보다 지연 시간이 중요할 때)
+        """
+        from geocode_cache import normalize_key
+
+        key = normalize_key(place)
+        with self.lock:
+            self.stats["requests"] += 1
+            future = self.inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+            future = self.pool.submit(self._resolve, place, parallel)
+            self.inflight[key] = future
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self.lock:
+            self.inflight.pop(key, None)
+
+    def _resolve(self, place, parallel):
+        from add_geocoding import geocode_place
+
+        try:
+            return geocode_place(place, parallel=parallel)
+        except Exception as e:
+            print(f"  ❌ 지오코딩 오류 ('{place}'): {e}")
+            return None
+
+    def geocode(self, place):
+        """장소 1개 조회 (결과까지 대기, 지연 시간 우선이라 검색 전략 동시 요청)"""
+        return self.submit(place, parallel=True).result()
+
+    def imap(self, items, place_of=lambda item: item, window=IMAP_WINDOW):
+        """
+        items를 순서대로 (item, 좌표)로 반환 (제너레이터)
+        - 최대 window개를 미리 제출해 두고 완료되는 대로 순서대로 내보냄
+        - 장소가 없는 item은 좌표 None
+        - 전체 항목이 작업 스레드 수보다 적으면 지연 시간 우선 (검색 전략 동시 요청)
+        """
+        iterator = iter(items)
+        first = list(islice(iterator, window))
+        parallel = len(first) < self.workers
+
+        def submit(item):
+            place = place_of(item)
+            if place:
+                return item, self.submit(place, parallel)
+            future = Future()
+            future.set_result(None)
+            return item, future
+
+        pending = deque(submit(item) for item in first)
+        while pending:
+            item, future = pending.popleft()
+            for next_item in islice(iterator, 1):
+                pending.append(submit(next_item))
+            yield item, future.result()
+
+    def print_stats(self):
+        bucket = get_kakao_bucket()
+        print(f"⚡ 동시 지오코딩: 요청 {self.stats['requests']}개 / 중복 합침 {self.stats['coalesced']}개 / "
+              f"요청 한도 대기 누적 {bucket.waited:.1f}초 (작업 스레드 {self.workers}개)")
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
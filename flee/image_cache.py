@@ -0,0 +1,191 @@
+"""
+포스터 이미지 캐시 (Vision API 호출 절감)
+- 포스터를 한 번만 다운로드하고 내용 해시(sha256)로 식별
+- 분석 결과 재사용은 sha256 일치 시에만 (비슷한 포스터는 날짜만 바뀐 회차별 포스터일 수 있음)
+- 모델에 필요한 해상도로 축소/여백 제거 후 base64로 전송
+- 이미지 해시별 Vision 분석 결과(JSON) 캐시
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import threading
+from datetime import datetime
+
+import requests
+
+try:
+    from PIL import Image, ImageChops
+except ImportError:  # Pillow 미설치 시 원본 그대로 전송 (축소 생략)
+    Image = None
+    ImageChops = None
+
+CACHE_DIR = "image_cache"
+INDEX_FILE = os.path.join(CACHE_DIR, "index.json")
+
+MAX_SIDE = 1024          # 긴 변 최대 픽셀 (gpt-4o-mini는 짧은 변을 768로 맞춤)
+JPEG_QUALITY = 85
+DOWNLOAD_TIMEOUT = 10
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+}
+
+
+def trim_border(img):
+    """단색 여백 잘라내기"""
+    rgb = img.convert("RGB")
+    background = Image.new("RGB", rgb.size, rgb.getpixel((0, 0)))
+    bbox = ImageChops.difference(rgb, background).getbbox()
+    if bbox and bbox != (0, 0) + rgb.size:
+        return img.crop(bbox)
+    return img
+
+
+def prepare_image(content):
+    """
+    다운로드한 바이트 → 전송용 JPEG 바이트
+    Pillow가 없거나 디코딩 실패 시 원본 바이트
+    """
+    if Image is None:
+        return content
+    try:
+        img = Image.open(io.BytesIO(content))
+        img.load()
+    except Exception:
+        return content
+
+    img = trim_border(img)
+    img.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buf.getvalue()
+
+
+def _mime_type(content):
+    if content[:4] == b"\x89PNG":
+        return "image/png"
+    if content[:4] == b"GIF8":
+        return "image/gif"
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+class ImageCache:
+    """이미지 해시 → 축소본 파일 + Vision 분석 결과"""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.images = {}   # sha256 → {"file", "result", ...}
+        self.urls = {}     # image_url → sha256
+        self.stats = {"url_hits": 0, "downloads": 0, "result_hits": 0}
+        # 비동기 엔진의 작업 스레드에서도 호출되므로 인덱스 변경/저장은 잠금
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            self.images = saved.get("images", {})
+            self.urls = saved.get("urls", {})
+            # 예전 버전이 비슷한 포스터에서 복사해 둔 분석 결과는 폐기 (다음 조회 때 다시 분석)
+            for entry in self.images.values():
+                if entry.pop("same_as", None):
+                    entry["result"] = None
+                entry.pop("phash", None)
+                entry.pop("similar_to", None)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def save(self):
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.index_file, "w", encoding="utf-8") as f:
+                json.dump({"images": self.images, "urls": self.urls}, f, ensure_ascii=False)
+
+    def _data_url(self, key):
+        entry = self.images[key]
+        path = os.path.join(self.cache_dir, entry["file"])
+        with open(path, "rb") as f:
+            content = f.read()
+        return f"data:{_mime_type(content)};base64,{base64.b64encode(content).decode()}"
+
+    def lookup(self, image_url):
+        """
+        이미지 url → {"key", "result", "data_url"}
+        - 분석 결과가 캐시돼 있으면 result 포함 (Vision 호출 불필요)
+        - 아니면 모델 전송용 data_url 포함
+        - 다운로드 실패 시 None (호출측에서 원격 url 사용)
+        """
+        key = self.urls.get(image_url)
+        if key in self.images and os.path.exists(os.path.join(self.cache_dir, self.images[key]["file"])):
+            self.stats["url_hits"] += 1
+        else:
+            key = self._download(image_url)
+            if not key:
+                return None
+
+        entry = self.images[key]
+        if entry.get("result"):
+            self.stats["result_hits"] += 1
+            return {"key": key, "result": entry["result"], "data_url": None}
+
+        return {"key": key, "result": None, "data_url": self._data_url(key)}
+
+    def _download(self, image_url):
+        try:
+            response = requests.get(image_url, headers=HEADERS, timeout=DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+            content = response.content
+        except Exception as e:
+            print(f"  ⚠️  이미지 다운로드 실패: {e}")
+            return None
+
+        key = hashlib.sha256(content).hexdigest()
+        filename = f"{key[:32]}.img"
+
+        # 축소/파일 저장은 잠금 밖에서 (다운로드와 함께 병렬 처리 가능)
+        if key not in self.images or not os.path.exists(os.path.join(self.cache_dir, filename)):
+            prepared = prepare_image(content)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(os.path.join(self.cache_dir, filename), "wb") as f:
+                f.write(prepared)
+            with self._lock:
+                previous = self.images.get(key, {})
+                self.images[key] = {
+                    "file": filename,
+                    "original_bytes": len(content),
+                    "prepared_bytes": len(prepared),
+                    "result": previous.get("result"),
+                }
+
+        with self._lock:
+            self.stats["downloads"] += 1
+            self.urls[image_url] = key
+        self.save()
+        return key
+
+    def store_result(self, key, result):
+        """Vision 분석 결과 저장"""
+        with self._lock:
+            if key not in self.images:
+                return
+            self.images[key]["result"] = result
+            self.images[key]["analyzed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.save()
+
+
+_default_cache = None
+
+
+def get_image_cache():
+    """프로세스 공용 캐시 (최초 사용 시 로드)"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ImageCache()
+    return _default_cache
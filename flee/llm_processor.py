@@ -1,24 +1,86 @@
 import json
 import os
-from openai import OpenAI
 from dotenv import load_dotenv
 import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from prompt_templates import (
     get_text_prompt,
     get_image_prompt,
     get_refine_prompt,
+    get_duplicate_verify_prompt,
+    get_fix_fields_prompt,
+    get_combined_image_prompt,
+)
+from image_cache import get_image_cache
+from output_schema import (
+    FORBIDDEN_PLACEHOLDERS,
+    MARKET_RESPONSE_FORMAT,
+    validate_market,
+    get_path,
+    set_path,
 )
 
 # ✅ 환경 변수 로드
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("❌ OPENAI_API_KEY가 설정되지 않았습니다. .env 파일을 확인하세요!")
 
-client = OpenAI(api_key=api_key)
+# OpenAI 클라이언트는 첫 호출 때 생성 (import만 하는 단계는 API 키/openai 불필요)
+_client = None
+
+# 🔹 호출/토큰 통계 (재시도로 낭비된 토큰 포함)
+LLM_STATS = Counter()
+
+# 원문이 길면 필드 재질의/이미지 통합 프롬프트에서는 앞부분만 사용
+REASK_CONTEXT_CHARS = 1500
+COMBINED_CONTEXT_CHARS = 1500
+
+# 이미지 보완 방식: "combined" (1회 호출) / "chain" (이미지 분석 → 보정 2회 호출)
+IMAGE_MODE = os.getenv("LLM_IMAGE_MODE", "combined")
+# 이미지 캐시 사용 여부 (벤치마크 등에서 끌 수 있음)
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE", "1") != "0"
+
+# "10월 25일", "10/25", "2025.10.25", "2025-10-25" 같은 날짜 표현
+DATE_HINT_RE = re.compile(r"\d{1,2}\s*월\s*\d{1,2}\s*일|\d{4}\s*[.\-/]\s*\d{1,2}\s*[.\-/]\s*\d{1,2}|\b\d{1,2}/\d{1,2}\b")
 
 
 # 🔹 공용 함수
+def get_client():
+    """
+    OpenAI 클라이언트 (최초 사용 시 생성 후 재사용)
+    OPENAI_BASE_URL로 OpenAI 호환 서버(로컬 모델, mock 서버)를 가리킬 수 있음
+    """
+    global _client
+    if _client is None:
+        from openai import OpenAI
+
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("❌ OPENAI_API_KEY가 설정되지 않았습니다. .env 파일을 확인하세요!")
+        _client = OpenAI(api_key=api_key, base_url=os.getenv("OPENAI_BASE_URL") or None)
+    return _client
+
+
+def record_usage(response, kind):
+    """응답의 토큰 사용량을 LLM_STATS에 누적하고 총 토큰 수 반환"""
+    usage = getattr(response, "usage", None)
+    total = getattr(usage, "total_tokens", 0) or 0
+    LLM_STATS["calls"] += 1
+    LLM_STATS[f"{kind}_calls"] += 1
+    LLM_STATS["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+    LLM_STATS["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+    LLM_STATS["total_tokens"] += total
+    return total
+
+
+def get_llm_stats():
+    """누적 통계 사본"""
+    return dict(LLM_STATS)
+
+
+def reset_llm_stats():
+    LLM_STATS.clear()
+
+
 def parse_json_output(raw_text):
     """AI 응답에서 JSON만 안전하게 파싱"""
     text = raw_text.strip()
@@ -39,7 +101,7 @@ def remove_mijeong_strings(data):
         return data
 
     # 금지된 플레이스홀더 목록
-    forbidden = ["미정", "추후 공지", "TBD", "미확정", "추가 예정", "추후 안내"]
+    forbidden = FORBIDDEN_PLACEHOLDERS
 
     # place 필드 정제
     if data.get("place") in forbidden:
@@ -59,128 +121,413 @@ def remove_mijeong_strings(data):
     return data
 
 
+def build_messages(system, prompt):
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def build_image_messages(prompt, image_ref):
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": image_ref}},
+            ],
+        }
+    ]
+
+
+def find_invalid_fields(data):
+    """
+    재질의가 필요한 필드 {경로: 현재 값}
+    (구조가 깨진 sessions는 비우고, 누락된 키는 빈 문자열로 채움)
+    """
+    errors = validate_market(data)
+    if not errors:
+        return {}
+
+    # 구조 자체가 깨진 경우(세션 목록이 아님 등)는 재질의 대상이 아님
+    if "sessions" in errors:
+        data["sessions"] = []
+        errors = validate_market(data)
+
+    # 누락된 키는 재질의 없이 빈 문자열로 채움
+    invalid = {}
+    for path in errors:
+        value = get_path(data, path)
+        if value is None:
+            set_path(data, path, "")
+        else:
+            invalid[path] = value
+    return invalid
+
+
+def apply_fixed_fields(data, invalid, fixed):
+    """재질의 결과 반영 후, 여전히 잘못된 필드는 빈 문자열로 비움"""
+    for path in invalid:
+        if fixed and isinstance(fixed.get(path), str):
+            set_path(data, path, fixed[path])
+
+    for path in validate_market(data):
+        set_path(data, path, "")
+        LLM_STATS["blanked_fields"] += 1
+
+    return data
+
+
+def repair_invalid_fields(data, context_text):
+    """
+    스키마 검증 실패 필드만 짧은 프롬프트로 재질의 (전체 재시도 대신)
+    재질의 후에도 잘못된 필드는 빈 문자열로 비움
+    """
+    invalid = find_invalid_fields(data)
+    if not invalid:
+        return data
+
+    print(f"  🔁 잘못된 필드 재질의: {', '.join(invalid)}")
+    prompt = get_fix_fields_prompt(context_text[:REASK_CONTEXT_CHARS], invalid)
+
+    fixed = None
+    try:
+        response = get_client().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=build_messages("너는 JSON 보정 전문가야.", prompt),
+            temperature=0,
+            max_tokens=300,
+            response_format={"type": "json_object"},
+        )
+        LLM_STATS["reask_tokens"] += record_usage(response, "reask")
+        fixed = parse_json_output(response.choices[0].message.content)
+    except Exception as e:
+        print(f"❌ 필드 재질의 오류: {e}")
+
+    return apply_fixed_fields(data, invalid, fixed)
+
+
+def is_missing_info(data):
+    """장소나 첫 세션 날짜가 비어 있으면 이미지 보완 대상"""
+    return (
+        not data.get("place")
+        or not data.get("sessions")
+        or not data["sessions"][0].get("start_date")
+    )
+
+
+def merge_combined_result(data, combined):
+    """이미지 통합 분석 결과를 텍스트 결과에 반영"""
+    if not combined:
+        return False
+    if combined.get("place") and not data.get("place"):
+        data["place"] = combined["place"]
+    if combined.get("sessions") and combined["sessions"][0].get("start_date"):
+        data["sessions"] = combined["sessions"]
+        return True
+    return False
+
+
+def finalize_result(data):
+    """기본값 채움 + "미정" 제거"""
+    # 🔹 기본값 채움 (빈 문자열 사용, "미정" 사용 금지)
+    if not data.get("place"):
+        data["place"] = ""  # "미정" 대신 빈 문자열
+    if not data.get("sessions"):
+        data["sessions"] = [
+            {
+                "start_date": "",
+                "end_date": "",
+                "start_time": "",
+                "end_time": "",
+                "notes": "",  # "날짜 미정" 대신 빈 문자열
+            }
+        ]
+
+    # 🔹 안전장치: LLM이 "미정"을 출력한 경우 제거
+    return remove_mijeong_strings(data)
+
+
+def lookup_image(image_url):
+    """이미지 캐시 조회 (비활성화 시 None → 원격 url 그대로 전송)"""
+    if not IMAGE_CACHE_ENABLED:
+        return None
+    return get_image_cache().lookup(image_url)
+
+
+def image_result_from_combined(data):
+    """
+    통합 호출 결과 → 이미지 분석 결과 형식 {"place", "date_info", "time_info"}
+    (같은 포스터가 다시 올라오면 캐시 적중 경로에서 보정 1회로 세션 복원)
+    """
+    sessions = [s for s in data.get("sessions") or [] if s.get("start_date")]
+    if not sessions:
+        return None
+    dates, times = [], []
+    for session in sessions:
+        start, end = session.get("start_date", ""), session.get("end_date", "")
+        dates.append(start if not end or end == start else f"{start} ~ {end}")
+        if session.get("start_time") or session.get("end_time"):
+            times.append(f"{session.get('start_time', '')}-{session.get('end_time', '')}")
+    return {
+        "place": data.get("place", ""),
+        "date_info": ", ".join(dates),
+        "time_info": ", ".join(dict.fromkeys(times)),
+    }
+
+
 # 🔹 이미지 분석
 def extract_from_image(image_url, max_retries=3):
     if not image_url or not image_url.startswith("http"):
         return None
 
+    # 🔹 이미지 캐시: 같은 포스터(내용 해시 sha256)는 분석 결과 재사용
+    cached = lookup_image(image_url)
+    if cached and cached["result"]:
+        LLM_STATS["vision_cache_hits"] += 1
+        print(f"♻️  이미지 분석 캐시 사용: {image_url[:50]}...")
+        return cached["result"]
+
+    # 축소된 base64 이미지 전송 (다운로드 실패 시 원격 url)
+    image_ref = cached["data_url"] if cached else image_url
     prompt = get_image_prompt()
 
     for attempt in range(max_retries):
         try:
-            response = client.chat.completions.create(
+            response = get_client().chat.completions.create(
                 model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": image_url}},
-                        ],
-                    }
-                ],
+                messages=build_image_messages(prompt, image_ref),
                 temperature=0.2,
                 max_tokens=800,
+                response_format={"type": "json_object"},
             )
+            tokens = record_usage(response, "vision")
 
             result = parse_json_output(response.choices[0].message.content)
             if result:
                 print(f"✅ 이미지 분석 성공: {image_url[:50]}...")
+                if cached:
+                    get_image_cache().store_result(cached["key"], result)
                 return result
+            LLM_STATS["wasted_tokens"] += tokens
         except Exception as e:
             print(f"❌ 이미지 분석 오류 (시도 {attempt+1}): {e}")
+        if attempt < max_retries - 1:
+            LLM_STATS["full_retries"] += 1
 
     print(f"⚠️ 이미지 분석 실패: {image_url}")
     return None
 
 
-# 🔹 텍스트 기반 추출
-def extract_fleamarket_info(raw_text, url, title, image_url=None, original_place="", post_date="", max_retries=3):
-    prompt = get_text_prompt(raw_text, url, original_place, post_date)
-
+# 🔹 텍스트 분석 (스키마 강제 + 실패 시 전체 재시도)
+def extract_from_text(prompt, max_retries=3, model="gpt-4o-mini", llm_client=None, kind="text"):
+    """
+    Args:
+        model / llm_client: 라우팅 단계별 모델과 클라이언트 (기본값: gpt-4o-mini + 공용 client)
+        kind: 통계 구분용 호출 종류
+    """
+    llm_client = llm_client or get_client()
     data = None
     for attempt in range(max_retries):
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",  # ✅ 비용 최적화
-                messages=[
-                    {"role": "system", "content": "너는 JSON 변환기 역할을 한다."},
-                    {"role": "user", "content": prompt},
-                ],
+            response = llm_client.chat.completions.create(
+                model=model,  # ✅ 비용 최적화
+                messages=build_messages("너는 JSON 변환기 역할을 한다.", prompt),
                 temperature=0.2,
+                response_format=MARKET_RESPONSE_FORMAT,  # ✅ 스키마 강제
             )
+            tokens = record_usage(response, kind)
 
             data = parse_json_output(response.choices[0].message.content)
+            if not isinstance(data, dict):
+                data = None
             if data:
                 break
+            # 파싱 실패한 응답의 토큰은 전부 낭비
+            LLM_STATS["wasted_tokens"] += tokens
         except Exception as e:
             print(f"❌ 텍스트 분석 오류 (시도 {attempt+1}): {e}")
+        if attempt < max_retries - 1:
+            LLM_STATS["full_retries"] += 1
+    return data
+
+
+def has_date_hint(raw_text):
+    """본문에 날짜로 보이는 표현이 있는지 (없으면 이미지 호출을 미리 시작)"""
+    return bool(DATE_HINT_RE.search(raw_text or ""))
+
+
+# 🔹 이미지 정보(date_info/time_info) → 세션 보정 (기존 2단계 방식의 2번째 호출)
+def refine_from_image_info(img_data, market_name, place, url):
+    date_info = img_data.get("date_info", "")
+    time_info = img_data.get("time_info", "")
+    refine_prompt = get_refine_prompt(market_name, place, url, date_info, time_info)
+    try:
+        response = get_client().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=build_messages("너는 JSON 보정 전문가야.", refine_prompt),
+            temperature=0.2,
+            response_format=MARKET_RESPONSE_FORMAT,
+        )
+        record_usage(response, "refine")
+        refined = parse_json_output(response.choices[0].message.content)
+        if refined and refined.get("sessions"):
+            return repair_invalid_fields(refined, f"날짜: {date_info}\n시간: {time_info}")
+    except Exception as e:
+        print(f"❌ 이미지 기반 보정 실패: {e}")
+    return None
+
+
+# 🔹 이미지 + 게시글 문맥을 한 번에 보내 최종 세션까지 받는 통합 호출
+def extract_with_image(image_url, market_name, place, url, post_date="", raw_text=""):
+    """
+    Returns:
+        {"place", "sessions", ...} JSON 또는 None
+    """
+    if not image_url or not image_url.startswith("http"):
+        return None
+
+    # 이미 분석된 포스터면 이미지 전송 없이 텍스트 보정 1회
+    cached = lookup_image(image_url)
+    if cached and cached["result"]:
+        LLM_STATS["vision_cache_hits"] += 1
+        img_data = cached["result"]
+        refined = refine_from_image_info(img_data, market_name, img_data.get("place") or place, url)
+        if refined and img_data.get("place"):
+            refined["place"] = img_data["place"]
+        return refined
+
+    image_ref = cached["data_url"] if cached else image_url
+    prompt = get_combined_image_prompt(
+        market_name, place, url, post_date, (raw_text or "")[:COMBINED_CONTEXT_CHARS]
+    )
+    try:
+        response = get_client().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=build_image_messages(prompt, image_ref),
+            temperature=0.2,
+            max_tokens=800,
+            response_format=MARKET_RESPONSE_FORMAT,
+        )
+        record_usage(response, "combined")
+        data = parse_json_output(response.choices[0].message.content)
+    except Exception as e:
+        print(f"❌ 이미지 통합 분석 오류: {e}")
+        return None
+
+    if not isinstance(data, dict):
+        return None
+    data = repair_invalid_fields(data, raw_text or "")
+    if cached and data:
+        result = image_result_from_combined(data)
+        if result:
+            get_image_cache().store_result(cached["key"], result)
+    return data
+
+
+# 🔹 텍스트 기반 추출
+def extract_fleamarket_info(raw_text, url, title, image_url=None, original_place="", post_date="", max_retries=3, image_mode=None):
+    """
+    Args:
+        image_mode: "combined" (이미지+문맥 1회 호출, 기본값) 또는 "chain" (이미지 분석 → 보정 2회 호출)
+    """
+    image_mode = image_mode or IMAGE_MODE
+    prompt = get_text_prompt(raw_text, url, original_place, post_date)
+
+    # 🔹 본문에 날짜가 전혀 없으면 이미지 호출을 텍스트 호출과 동시에 시작
+    speculative = None
+    executor = None
+    if image_mode == "combined" and image_url and not has_date_hint(raw_text):
+        executor = ThreadPoolExecutor(max_workers=1)
+        speculative = executor.submit(
+            extract_with_image, image_url, title, original_place, url, post_date, raw_text
+        )
+        LLM_STATS["speculative_calls"] += 1
+
+    try:
+        data = extract_from_text(prompt, max_retries)
+    finally:
+        if executor:
+            executor.shutdown(wait=False)
 
     if not data:
         print("❌ 텍스트 기반 JSON 변환 실패")
         return None
 
+    # 🔹 형식 오류 필드만 재질의
+    data = repair_invalid_fields(data, raw_text)
+
     # 🔹 필수 필드 보완
     data["url"] = url
     if not data.get("market_name"):
         data["market_name"] = title or "제목 미정"
 
     # 🔹 이미지 보완
-    missing_info = (
-        not data.get("place")
-        or not data.get("sessions")
-        or not data["sessions"][0].get("start_date")
-    )
-
-    if missing_info and image_url:
+    if is_missing_info(data) and image_url:
         print("⚠️ 텍스트 정보 부족 → 이미지 분석 보완 시도")
-        img_data = extract_from_image(image_url)
-
-        if img_data:
-            place = img_data.get("place", "")
-            date_info = img_data.get("date_info", "")
-            time_info = img_data.get("time_info", "")
-            if place:
-                data["place"] = place
-
-            # 🔄 재보정 프롬프트
-            refine_prompt = get_refine_prompt(
-                data.get("market_name", ""), data["place"], url, date_info, time_info
+
+        if image_mode == "combined":
+            combined = speculative.result() if speculative else extract_with_image(
+                image_url, data["market_name"], data.get("place", ""), url, post_date, raw_text
             )
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "너는 JSON 보정 전문가야."},
-                        {"role": "user", "content": refine_prompt},
-                    ],
-                    temperature=0.2,
-                )
-                refined = parse_json_output(response.choices[0].message.content)
-                if refined and refined.get("sessions"):
+            if merge_combined_result(data, combined):
+                print("✅ 이미지 통합 분석으로 세션 정보 보완 완료")
+        else:
+            img_data = extract_from_image(image_url)
+
+            if img_data:
+                place = img_data.get("place", "")
+                if place:
+                    data["place"] = place
+
+                # 🔄 재보정 프롬프트
+                refined = refine_from_image_info(img_data, data.get("market_name", ""), data["place"], url)
+                if refined:
                     data["sessions"] = refined["sessions"]
                     print("✅ 이미지 정보로 세션 정보 보완 완료")
-            except Exception as e:
-                print(f"❌ 이미지 기반 보정 실패: {e}")
+    elif speculative:
+        # 텍스트만으로 충분했음 → 미리 시작한 이미지 호출은 사용 안 함
+        LLM_STATS["speculative_unused"] += 1
 
-    # 🔹 기본값 채움 (빈 문자열 사용, "미정" 사용 금지)
-    if not data.get("place"):
-        data["place"] = ""  # "미정" 대신 빈 문자열
-    if not data.get("sessions"):
-        data["sessions"] = [
-            {
-                "start_date": "",
-                "end_date": "",
-                "start_time": "",
-                "end_time": "",
-                "notes": "",  # "날짜 미정" 대신 빈 문자열
-            }
-        ]
+    return finalize_result(data)
 
-    # 🔹 안전장치: LLM이 "미정"을 출력한 경우 제거
-    data = remove_mijeong_strings(data)
 
-    return data
+# 🔹 근접 중복 게시글 검증 (차이점만 전달하는 저비용 호출)
+def verify_duplicate(base_data, diff_text, url):
+    """
+    기존 정제 결과 + 달라진 줄만 보내 새 게시글의 JSON을 얻음
+
+    Returns:
+        보정된 JSON (실패 시 None → 호출측에서 전체 정제로 폴백)
+    """
+    base = {k: v for k, v in base_data.items() if not k.startswith("_")}
+    prompt = get_duplicate_verify_prompt(
+        json.dumps(base, ensure_ascii=False), diff_text or "(차이 없음)", url
+    )
+
+    try:
+        response = get_client().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=build_messages("너는 JSON 보정 전문가야.", prompt),
+            temperature=0,
+            max_tokens=600,
+            response_format=MARKET_RESPONSE_FORMAT,
+        )
+        record_usage(response, "verify")
+        data = parse_json_output(response.choices[0].message.content)
+    except Exception as e:
+        print(f"❌ 중복 검증 오류: {e}")
+        return None
+
+    if not data or not data.get("sessions"):
+        return None
+
+    data = repair_invalid_fields(data, diff_text or "")
+
+    data["url"] = url
+    if not data.get("market_name"):
+        data["market_name"] = base_data.get("market_name", "")
+    return remove_mijeong_strings(data)
 
 
 # 🔹 테스트 실행 예시
@@ -1,14 +1,14 @@
 """
 통합 마스터 파이프라인
-크롤링 → LLM 정제 → 로컬 DB → Supabase 저장까지 전체 자동화
+크롤링 → LLM 정제 → 로컬 DB → Supabase 저장 + 지오코딩까지 전체 자동화
 """
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
 import logging
 from pathlib import Path
-from flea_list_fast import main as crawl_list
 
 
 # 인코딩 설정 (안전하게 처리)
@@ -40,6 +40,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Supabase 복제 단계 제한 시간 (초), 남은 대기열은 다음 실행에서 처리
+OUTBOX_DRAIN_SECONDS = int(os.getenv("OUTBOX_DRAIN_SECONDS", "120"))
+
 # 실행 통계 저장용
 class PipelineStats:
     def __init__(self):
@@ -48,8 +51,14 @@ class PipelineStats:
         self.steps = {
             'crawling': {'success': None, 'error': None, 'duration': None},
             'llm_processing': {'success': None, 'error': None, 'duration': None},
-            'local_db': {'success': None, 'error': None, 'duration': None},
-            'supabase': {'success': None, 'error': None, 'duration': None, 'success_count': 0, 'fail_count': 0}
+            'local_db': {'success': None, 'error': None, 'duration': None, 'pushed': 0, 'deleted': 0, 'unchanged': 0},
+            'supabase': {'success': None, 'error': None, 'duration': None, 'success_count': 0, 'fail_count': 0,
+                         'sessions_unchanged': 0, 'sessions_added': 0, 'sessions_removed': 0, 'pending': 0,
+                         'requests': 0, 'retries': 0, 'errors': 0, 'circuit_opened': 0, 'rows_per_sec': 0.0},
+            'geocoding': {'success': None, 'error': None, 'duration': None, 'markets': 0, 'unique_places': 0,
+                          'geocoded': 0, 'failed': 0, 'api_calls_saved': 0, 'cache_hits': 0, 'cache_misses': 0,
+                          'cache_hit_rate': 0.0, 'coalesced': 0, 'gazetteer_hits': 0, 'replicated': 0,
+                          'failure_report': None}
         }
 
     def save_report(self, output_file="summary.txt"):
@@ -80,9 +89,30 @@ class PipelineStats:
                     if step_data['error']:
                         f.write(f"  오류: {step_data['error']}\n")
 
+                    if step_name == 'local_db' and step_data['success']:
+                        f.write(f"  전송: {step_data['pushed']}개 / 삭제: {step_data['deleted']}개 / "
+                                f"변경 없음: {step_data['unchanged']}개\n")
+
                     if step_name == 'supabase' and step_data['success']:
                         f.write(f"  성공: {step_data['success_count']}개\n")
                         f.write(f"  실패: {step_data['fail_count']}개\n")
+                        f.write(f"  복제 대기: {step_data['pending']}개\n")
+                        f.write(f"  요청: {step_data['requests']}회 / 재시도: {step_data['retries']}회 / "
+                                f"오류: {step_data['errors']}회 / 서킷 차단: {step_data['circuit_opened']}회\n")
+                        f.write(f"  처리량: {step_data['rows_per_sec']:.1f}행사/초\n")
+                        f.write(f"  세션: 유지 {step_data['sessions_unchanged']}개 / "
+                                f"추가 {step_data['sessions_added']}개 / 삭제 {step_data['sessions_removed']}개\n")
+
+                    if step_name == 'geocoding' and step_data['success']:
+                        f.write(f"  대상: {step_data['markets']}개 (고유 장소 {step_data['unique_places']}개, "
+                                f"API 조회 {step_data['api_calls_saved']}회 절약)\n")
+                        f.write(f"  성공: {step_data['geocoded']}개 / 실패: {step_data['failed']}개 / "
+                                f"단계 종료 후 좌표 복제: {step_data['replicated']}개\n")
+                        f.write(f"  캐시 적중: {step_data['cache_hits']}회 / 미적중: {step_data['cache_misses']}회 "
+                                f"(적중률 {step_data['cache_hit_rate']:.0%}) / 중복 합침: {step_data['coalesced']}회 / "
+                                f"장소 사전: {step_data['gazetteer_hits']}회\n")
+                        if step_data['failure_report']:
+                            f.write(f"  실패 리포트: {step_data['failure_report']}\n")
 
                     f.write("\n")
 
@@ -189,12 +219,18 @@ def save_to_local_db():
         from structured_to_db import structured_to_db
 
         logger.info("로컬 SQLite DB 저장 시작")
-        structured_to_db("fleamarket_structured.json", skip_existing=False)
+        # 지난 실행 이후 바뀐 게시글만 저장 (sync_state)
+        result = structured_to_db("fleamarket_structured.json", skip_existing=False, changed_only=True)
+        if result is None:
+            raise RuntimeError("fleamarket_structured.json 로드 실패")
         logger.info("로컬 DB 저장 완료")
 
         duration = (datetime.now() - step_start).total_seconds()
         stats.steps['local_db']['success'] = True
         stats.steps['local_db']['duration'] = duration
+        stats.steps['local_db']['pushed'] = result['new'] + result['updated']
+        stats.steps['local_db']['deleted'] = result['deleted']
+        stats.steps['local_db']['unchanged'] = result['unchanged']
 
         return True
     except Exception as e:
@@ -209,45 +245,54 @@ def save_to_local_db():
 
 
 def save_to_supabase():
-    """Supabase 저장"""
-    print_step(4, "Supabase 저장")
+    """Supabase 복제 (로컬 저장 때 쌓인 outbox 대기열 드레인)"""
+    print_step(4, "Supabase 복제")
     step_start = datetime.now()
 
     try:
-        from supabase_manager import save_to_db
+        from outbox import drain_outbox, enqueue_pending
+        from supabase_manager import WRITE_STATS
+
+        before = WRITE_STATS.copy()
 
         # structured.json 읽기
         with open("fleamarket_structured.json", "r", encoding="utf-8") as f:
             structured_data = json.load(f)
 
-        logger.info(f"{len(structured_data)}개 데이터 Supabase 저장 시작")
-
-        success_count = 0
-        fail_count = 0
+        # 로컬 저장이 실패했거나 outbox 도입 전 데이터처럼 Supabase만 뒤처진 게시글 보충
+        added = enqueue_pending(structured_data)
+        if added:
+            logger.info(f"복제 대기열 보충: {added}개")
 
-        for i, data in enumerate(structured_data, 1):
-            market_name = data.get("market_name", "제목 미정")
-            image_url = data.get("_source", {}).get("image_url", "")
-
-            print(f"[{i}/{len(structured_data)}] {market_name[:50]}")
-
-            if save_to_db(data, image_url):
-                success_count += 1
-            else:
-                fail_count += 1
+        # 제한 시간 안에서만 복제, 남은 항목은 다음 실행 또는 `python outbox.py --loop`가 처리
+        result = drain_outbox(time_budget=OUTBOX_DRAIN_SECONDS)
+        success_count = result["applied"]
+        fail_count = result["failed"]
 
         print()
         print("-" * 80)
-        logger.info(f"Supabase 저장 완료 - 성공: {success_count}개, 실패: {fail_count}개")
+        logger.info(f"Supabase 복제 완료 - 성공: {success_count}개, 실패: {fail_count}개, "
+                    f"남은 대기열: {result['pending']}개")
         print("-" * 80)
 
         duration = (datetime.now() - step_start).total_seconds()
-        stats.steps['supabase']['success'] = success_count > 0
+        success = fail_count == 0
+        stats.steps['supabase']['success'] = success
         stats.steps['supabase']['duration'] = duration
         stats.steps['supabase']['success_count'] = success_count
         stats.steps['supabase']['fail_count'] = fail_count
+        for key in ('sessions_unchanged', 'sessions_added', 'sessions_removed', 'pending'):
+            stats.steps['supabase'][key] = result[key]
 
-        return success_count > 0
+        # 쓰기 풀 카운터 (이번 단계에서 늘어난 만큼)
+        written = WRITE_STATS - before
+        for key in ('requests', 'retries', 'errors', 'circuit_opened'):
+            stats.steps['supabase'][key] = written[key]
+        stats.steps['supabase']['rows_per_sec'] = (
+            (written['markets_saved'] + written['markets_deleted']) / duration if duration else 0.0
+        )
+
+        return success
 
     except FileNotFoundError:
         logger.error("fleamarket_structured.json 파일이 없습니다")
@@ -259,7 +304,7 @@ def save_to_supabase():
 
         return False
     except Exception as e:
-        logger.error(f"Supabase 저장 오류: {e}", exc_info=True)
+        logger.error(f"Supabase 복제 오류: {e}", exc_info=True)
 
         duration = (datetime.now() - step_start).total_seconds()
         stats.steps['supabase']['success'] = False
@@ -269,7 +314,55 @@ def save_to_supabase():
         return False
 
 
-def main(skip_crawling=False, skip_llm=False, force_update=False):
+def run_geocoding():
+    """증분 지오코딩 (좌표 없는 신규/장소 변경 행사만, 입력 대기 없음)"""
+    print_step(5, "지오코딩 (Supabase 복제와 동시 실행)")
+    step_start = datetime.now()
+
+    try:
+        if not (os.getenv("KAKAO_REST_API_KEY") or os.getenv("GOOGLE_API_KEY")):
+            raise RuntimeError("KAKAO_REST_API_KEY / GOOGLE_API_KEY 없음")
+
+        from add_geocoding import geocode_new_markets
+
+        logger.info("지오코딩 시작")
+        failure_log = LOG_DIR / f"geocoding_failures_{stats.start_time.strftime('%Y%m%d_%H%M%S')}.json"
+        result = geocode_new_markets(failure_log=str(failure_log))
+        logger.info(f"지오코딩 완료 - 성공: {result['geocoded']}개, 실패: {result['failed']}개, "
+                    f"캐시 적중률: {result['cache_hit_rate']:.0%}")
+
+        duration = (datetime.now() - step_start).total_seconds()
+        stats.steps['geocoding']['success'] = True
+        stats.steps['geocoding']['duration'] = duration
+        for key in ('markets', 'unique_places', 'geocoded', 'failed', 'api_calls_saved', 'cache_hits',
+                    'cache_misses', 'cache_hit_rate', 'coalesced', 'gazetteer_hits', 'failure_report'):
+            stats.steps['geocoding'][key] = result[key]
+
+        return True
+    except Exception as e:
+        logger.error(f"지오코딩 실패: {e}", exc_info=True)
+
+        duration = (datetime.now() - step_start).total_seconds()
+        stats.steps['geocoding']['success'] = False
+        stats.steps['geocoding']['error'] = str(e)
+        stats.steps['geocoding']['duration'] = duration
+
+        return False
+
+
+def replicate_coordinates():
+    """Supabase 복제 단계가 끝난 뒤 대기열에 들어온 좌표 복제"""
+    try:
+        from outbox import drain_outbox
+
+        result = drain_outbox(time_budget=OUTBOX_DRAIN_SECONDS)
+        stats.steps['geocoding']['replicated'] = result['applied']
+        logger.info(f"좌표 복제 완료 - 성공: {result['applied']}개, 실패: {result['failed']}개")
+    except Exception as e:
+        logger.warning(f"좌표 복제 실패 (outbox에 남김): {e}")
+
+
+def main(skip_crawling=False, skip_llm=False, force_update=False, skip_geocoding=False):
     """
     메인 파이프라인 실행
 
@@ -277,6 +370,7 @@ def main(skip_crawling=False, skip_llm=False, force_update=False):
         skip_crawling: 크롤링 단계 건너뛰기
         skip_llm: LLM 정제 단계 건너뛰기 (structured.json 재사용)
         force_update: 기존 데이터 덮어쓰기
+        skip_geocoding: 지오코딩 단계 건너뛰기
     """
     stats.start_time = datetime.now()
 
@@ -316,13 +410,23 @@ def main(skip_crawling=False, skip_llm=False, force_update=False):
         logger.warning("로컬 DB 저장 실패 (계속 진행)")
         print("\n⚠️  로컬 DB 저장 실패 (계속 진행)")
 
-    # Step 4: Supabase 저장
-    if not save_to_supabase():
-        logger.error("Supabase 저장 실패")
-        print("\n❌ Supabase 저장 실패")
-        stats.end_time = datetime.now()
-        stats.save_report()
-        return False
+    # Step 4 + 5: Supabase 복제와 지오코딩 동시 실행
+    # (지오코딩은 API 대기, 복제는 Supabase 대기라 겹쳐도 서로 늦추지 않음, 좌표는 outbox로 복제)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        geocoding = None if skip_geocoding else pool.submit(run_geocoding)
+
+        # 실패한 항목은 outbox에 남아 다음 실행에서 재시도
+        if not save_to_supabase():
+            logger.warning("Supabase 복제 일부 실패 (outbox에 남김)")
+            print("\n⚠️  Supabase 복제 일부 실패 → outbox에 남겨 다음 실행에서 재시도")
+
+        if geocoding is None:
+            print_step(5, "지오코딩 건너뛰기")
+        elif not geocoding.result():
+            logger.warning("지오코딩 실패 (계속 진행)")
+            print("\n⚠️  지오코딩 실패 (계속 진행)")
+        elif stats.steps['geocoding']['geocoded']:
+            replicate_coordinates()
 
     # 완료
     stats.end_time = datetime.now()
@@ -350,13 +454,15 @@ if __name__ == "__main__":
     parser.add_argument("--skip-crawling", action="store_true", help="크롤링 단계 건너뛰기")
     parser.add_argument("--skip-llm", action="store_true", help="LLM 정제 단계 건너뛰기")
     parser.add_argument("--force", "-f", action="store_true", help="전체 재처리 모드")
+    parser.add_argument("--skip-geocoding", action="store_true", help="지오코딩 단계 건너뛰기")
 
     args = parser.parse_args()
 
     success = main(
         skip_crawling=args.skip_crawling,
         skip_llm=args.skip_llm,
-        force_update=args.force
+        force_update=args.force,
+        skip_geocoding=args.skip_geocoding
     )
 
     sys.exit(0 if success else 1)
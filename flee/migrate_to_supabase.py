@@ -2,8 +2,11 @@
 SQLite → Supabase 데이터 마이그레이션
 """
 import json
+import os
 import sys
 import io
+import time
+from itertools import groupby
 
 # Windows 인코딩 처리 (직접 실행시)
 try:
@@ -12,11 +15,85 @@ try:
 except:
     pass
 
-from supabase_manager import save_to_db
+from supabase_manager import MARKET_CHUNK_SIZE, save_many
 
+# 진행 위치 파일 (중단 후 재실행 시 이어서 진행)
+CURSOR_FILE = "migrate_cursor.json"
 
-def migrate_from_sqlite():
-    """SQLite DB → Supabase 마이그레이션"""
+# SQLite에서 한 번에 가져올 행 수
+FETCH_SIZE = 2000
+
+
+def load_cursor():
+    """마이그레이션 진행 위치 (이 id까지의 행사는 모두 전송 완료)"""
+    try:
+        with open(CURSOR_FILE, "r", encoding="utf-8") as f:
+            return json.load(f).get("last_market_id", 0)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+
+
+def save_cursor(last_market_id):
+    with open(CURSOR_FILE, "w", encoding="utf-8") as f:
+        json.dump({"last_market_id": last_market_id, "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")}, f)
+
+
+def stream_markets(conn, after_id=0, fetch_size=FETCH_SIZE):
+    """
+    markets ⟕ sessions를 id 순 쿼리 1번으로 읽어 행사별로 묶어서 반환 (제너레이터)
+
+    Yields:
+        (market id, structured 데이터, 읽은 행 수)
+    """
+    cur = conn.execute("""
+        SELECT m.id, m.market_name, m.place, m.url, m.image_url, m.lat, m.lng,
+               s.id, s.start_date, s.end_date, s.start_time, s.end_time, s.notes
+        FROM markets m
+        LEFT JOIN sessions s ON s.market_id = m.id
+        WHERE m.id > ?
+        ORDER BY m.id, s.id
+    """, (after_id,))
+
+    def rows():
+        while True:
+            batch = cur.fetchmany(fetch_size)
+            if not batch:
+                return
+            yield from batch
+
+    for market_id, group in groupby(rows(), key=lambda row: row[0]):
+        group = list(group)
+        _, market_name, place, url, image_url, lat, lng = group[0][:7]
+        data = {
+            "market_name": market_name,
+            "place": place,
+            "url": url,
+            "image_url": image_url or "",
+            "sessions": [
+                {
+                    "start_date": row[8],
+                    "end_date": row[9],
+                    "start_time": row[10],
+                    "end_time": row[11],
+                    "notes": row[12],
+                }
+                for row in group if row[7] is not None
+            ],
+        }
+        # 좌표가 있는 행사만 전송 (없는 행사는 Supabase의 기존 좌표 유지)
+        if lat is not None and lng is not None:
+            data["lat"], data["lng"] = lat, lng
+        yield market_id, data, len(group)
+
+
+def migrate_from_sqlite(db_path="fleamarket.db", chunk_size=MARKET_CHUNK_SIZE, restart=False):
+    """
+    SQLite DB → Supabase 마이그레이션 (스트리밍)
+    - markets/sessions를 조인 쿼리 1번으로 읽고 행사 chunk_size개씩 일괄 upsert
+    - 청크마다 진행 위치를 migrate_cursor.json에 저장 → 중단 후 다시 실행하면 이어서 진행
+    - 실패한 행사가 있으면 그 앞까지만 진행 위치 저장 (다시 실행 시 실패 지점부터 재전송, upsert라 중복 없음)
+    - 실패 없이 끝나면 진행 위치 파일 삭제 (다음 실행은 처음부터 전체 전송)
+    """
     
     print("=" * 80)
     print("🔄 SQLite → Supabase 데이터 마이그레이션")
@@ -24,69 +101,72 @@ def migrate_from_sqlite():
     print()
     
     import sqlite3
+
+    if restart and os.path.exists(CURSOR_FILE):
+        os.remove(CURSOR_FILE)
+    cursor = load_cursor()
+    if cursor:
+        print(f"⏩ market id {cursor} 이후부터 이어서 진행 ({CURSOR_FILE})")
     
     try:
-        # SQLite 연결
-        conn = sqlite3.connect("fleamarket.db")
-        cur = conn.cursor()
-        
-        # 전체 데이터 조회
-        cur.execute("""
-            SELECT m.id, m.market_name, m.place, m.url, m.image_url
-            FROM markets m
-        """)
-        markets = cur.fetchall()
-        
-        print(f"📊 SQLite에서 {len(markets)}개 행사 발견")
+        conn = sqlite3.connect(db_path)
+        total = conn.execute("SELECT COUNT(*) FROM markets WHERE id > ?", (cursor,)).fetchone()[0]
+        print(f"📊 SQLite에서 {total}개 행사 전송 예정")
         print()
-        
+        if not total:
+            if cursor:
+                print(f"✅ 남은 행사 없음 (처음부터 다시 전송하려면 --restart 또는 {CURSOR_FILE} 삭제)")
+            conn.close()
+            return
+
+        started = time.time()
         success_count = 0
         fail_count = 0
-        
-        for market in markets:
-            market_id, market_name, place, url, image_url = market
-            
-            print(f"[{success_count + fail_count + 1}/{len(markets)}] {market_name[:40]}")
-            
-            # sessions 조회
-            cur.execute("""
-                SELECT start_date, end_date, start_time, end_time, notes
-                FROM sessions
-                WHERE market_id = ?
-            """, (market_id,))
-            sessions_data = cur.fetchall()
-            
-            # structured 형식으로 변환
-            structured = {
-                "market_name": market_name,
-                "place": place,
-                "url": url,
-                "sessions": [
-                    {
-                        "start_date": s[0],
-                        "end_date": s[1],
-                        "start_time": s[2],
-                        "end_time": s[3],
-                        "notes": s[4]
-                    }
-                    for s in sessions_data
-                ]
-            }
-            
-            # Supabase에 저장
-            if save_to_db(structured, image_url):
-                success_count += 1
-            else:
-                fail_count += 1
-            
-            print()
-        
+        row_count = 0
+        market_count = 0
+        blocked = False  # 실패가 나온 뒤로는 진행 위치를 더 옮기지 않음
+
+        def flush(chunk):
+            nonlocal success_count, fail_count, blocked
+            result = save_many([data for _, data in chunk])
+            success_count += result["saved"]
+            fail_count += result["failed"]
+
+            failed = set(result["failed_urls"])
+            if not blocked:
+                failed_ids = [market_id for market_id, data in chunk if data["url"] in failed]
+                if failed_ids:
+                    save_cursor(min(failed_ids) - 1)
+                    blocked = True
+                else:
+                    save_cursor(chunk[-1][0])
+
+            elapsed = max(time.time() - started, 1e-6)
+            print(f"  📈 {market_count}/{total}개 행사 / {row_count}행 읽음 "
+                  f"({row_count / elapsed:.0f} rows/s, {market_count / elapsed:.0f} 행사/s)")
+
+        chunk = []
+        for market_id, data, rows in stream_markets(conn, cursor):
+            chunk.append((market_id, data))
+            row_count += rows
+            market_count += 1
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+
         conn.close()
-        
+
+        elapsed = time.time() - started
         print("=" * 80)
-        print(f"✅ 마이그레이션 완료")
+        print(f"✅ 마이그레이션 완료 ({elapsed:.1f}초, {row_count / max(elapsed, 1e-6):.0f} rows/s)")
         print(f"   성공: {success_count}개")
         print(f"   실패: {fail_count}개")
+        if blocked:
+            print(f"   ⚠️  실패한 행사부터 다시 전송하려면 같은 명령을 다시 실행하세요 ({CURSOR_FILE})")
+        elif os.path.exists(CURSOR_FILE):
+            os.remove(CURSOR_FILE)
         print("=" * 80)
         
     except Exception as e:
@@ -110,21 +190,10 @@ def migrate_from_structured():
         print(f"📊 {len(structured_data)}개 행사 발견")
         print()
         
-        success_count = 0
-        fail_count = 0
-        
-        for i, data in enumerate(structured_data, 1):
-            market_name = data.get("market_name", "제목 미정")
-            print(f"[{i}/{len(structured_data)}] {market_name[:40]}")
-            
-            # 이미지 URL 추출
-            image_url = data.get("_source", {}).get("image_url", "")
-            
-            # Supabase에 저장
-            if save_to_db(data, image_url):
-                success_count += 1
-            else:
-                fail_count += 1
+        # 청크 단위 일괄 upsert (이미지 URL은 _source.image_url 사용)
+        result = save_many(structured_data)
+        success_count = result["saved"]
+        fail_count = result["failed"]
         
         print()
         print("=" * 80)
@@ -146,7 +215,7 @@ if __name__ == "__main__":
     
     if "--sqlite" in sys.argv:
         print("📌 SQLite DB에서 마이그레이션\n")
-        migrate_from_sqlite()
+        migrate_from_sqlite(restart="--restart" in sys.argv)
     else:
         print("📌 structured.json에서 마이그레이션 (권장)\n")
         migrate_from_structured()
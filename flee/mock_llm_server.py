@@ -0,0 +1,493 @@
+"""
+로컬 OpenAI 호환 mock LLM 서버 (비용 없이 정제 단계 벤치마크/부하 테스트)
+- POST /v1/chat/completions 만 구현
+- 응답 결정 순서
+    1. 녹화본 재생: 요청(model + messages + response_format) 해시로 녹화 파일 조회
+    2. --record 모드: 실제 API로 전달하고 응답을 녹화 파일에 저장
+    3. 합성 응답: 프롬프트에서 원문/장소/작성일을 꺼내 규칙 파서로 JSON 생성
+- 지연 시간 분포(fixed / uniform / normal / lognormal), 429 / 잘못된 JSON 주입
+- 같은 --seed면 요청 순서(동시성)와 무관하게 같은 프롬프트에 같은 결과
+- GET /mock/stats 로 서버측 요청/오류/토큰 집계, POST /mock/reset 으로 초기화
+
+사용법:
+    python mock_llm_server.py --latency lognormal:-0.7,0.4 --rate-429 0.05 --malformed 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python extract_to_json.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rule_parser import clean_place, parse_dates, parse_times
+
+RECORDINGS_FILE = "mock_llm_recordings.json"
+DEFAULT_PORT = 8765
+UPSTREAM_URL = "https://api.openai.com/v1"
+
+# 서버가 광고하는 한도 (x-ratelimit-* 헤더, 비동기 엔진의 RateLimiter가 사용)
+DEFAULT_RPM = 10000
+DEFAULT_TPM = 10000000
+
+IMAGE_TOKENS = 765        # 이미지 1장당 프롬프트 토큰 (gpt-4o-mini high detail 1024px 기준 근사)
+CHARS_PER_TOKEN = 2.5     # 한국어 위주 텍스트 근사치
+
+
+def parse_latency(spec):
+    """
+    지연 시간 분포 문자열 → (이름, 파라미터 리스트) [초]
+    예: "fixed:0.3", "uniform:0.2,1.0", "normal:0.8,0.2", "lognormal:-0.5,0.4"
+    """
+    name, _, params = (spec or "fixed:0").partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] if params else []
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+    if name not in expected or len(values) != expected[name]:
+        raise ValueError(f"지연 시간 분포 형식 오류: {spec!r}")
+    return name, values
+
+
+def sample_latency(rng, latency):
+    name, values = latency
+    if name == "fixed":
+        return values[0]
+    if name == "uniform":
+        return rng.uniform(values[0], values[1])
+    if name == "normal":
+        return max(0.0, rng.gauss(values[0], values[1]))
+    return rng.lognormvariate(values[0], values[1])
+
+
+def request_key(body):
+    """녹화본 조회 키 (temperature 등 샘플링 옵션은 제외)"""
+    canonical = json.dumps(
+        {
+            "model": body.get("model"),
+            "messages": body.get("messages"),
+            "response_format": body.get("response_format"),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def message_text(messages):
+    """메시지의 텍스트 부분과 이미지 개수"""
+    texts, images = [], 0
+    for message in messages or []:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                texts.append(part.get("text", ""))
+            elif part.get("type") == "image_url":
+                images += 1
+    return "\n".join(texts), images
+
+
+def count_tokens(text):
+    return int(math.ceil(len(text or "") / CHARS_PER_TOKEN))
+
+
+# 🔹 합성 응답 (녹화본이 없을 때)
+def _field(text, pattern):
+    match = re.search(pattern, text)
+    return match.group(1).strip() if match else ""
+
+
+def _section(text, header):
+    """'[header]\\n---\\n ... \\n---' 블록 본문"""
+    match = re.search(re.escape(header) + r"\s*\n---\n(.*?)\n---", text, re.S)
+    return match.group(1).strip() if match else ""
+
+
+def synthetic_poster(key):
+    """이미지는 읽을 수 없으므로 요청 해시로 결정되는 가짜 포스터 정보"""
+    seed = int(key[:8], 16)
+    month, day = seed % 12 + 1, seed % 27 + 1
+    return {
+        "date_info": f"{month}월 {day}일",
+        "time_info": "오후 1시~6시" if seed % 2 else "11:00-17:00",
+    }
+
+
+def synthetic_market(text, images, key):
+    """텍스트/통합/보정/중복 검증 프롬프트 → 시장 JSON"""
+    # 중복 검증: 기존 결과에 url만 교체
+    match = re.search(r"\[기존 추출 결과\]\s*\n(\{.*?\})\s*\n\s*\[달라진 줄\]", text, re.S)
+    base_json = match.group(1) if match else ""
+    if base_json:
+        try:
+            data = json.loads(base_json)
+            data["url"] = _field(text, r'url은 "([^"]*)"')
+            return data
+        except json.JSONDecodeError:
+            pass
+
+    raw_text = _section(text, "[게시글 원문]") or _section(text, "[게시글 일부]")
+    post_date = _field(text, r'게시글 작성일\s*(?:=\s*"|:\s*)(\d{4}-\d{2}-\d{2})')
+    place = (
+        _field(text, r'크롤링 원본 장소명 = "([^"]*)"')
+        or _field(text, r"장소\(게시글 기준\):\s*(.*)")
+        or _field(text, r"(?m)^장소:\s*(.*)$")
+    )
+    if not place:
+        place = _field(raw_text, r"(?:장소|위치)\s*[:：]\s*(.+)")
+    url = _field(text, r'"url": "([^"]*)"') or _field(text, r'url은 "([^"]*)"')
+
+    date_text = _field(text, r"- 날짜:\s*(.*)") or raw_text
+    time_text = _field(text, r"- 시간:\s*(.*)") or raw_text
+    dates = parse_dates(date_text, post_date)
+    if not dates and images:
+        poster = synthetic_poster(key)
+        dates = parse_dates(poster["date_info"], post_date)
+        time_text = poster["time_info"]
+    start_time, end_time = parse_times(time_text)
+
+    return {
+        "market_name": _field(text, r"행사명:\s*(.*)") or (raw_text.strip().splitlines() or [""])[0][:60],
+        "place": clean_place(place),
+        "url": url,
+        "sessions": [
+            {"start_date": s, "end_date": e, "start_time": start_time, "end_time": end_time, "notes": ""}
+            for s, e in dates
+        ] or [{"start_date": "", "end_date": "", "start_time": "", "end_time": "", "notes": ""}],
+    }
+
+
+def synthetic_fix_fields(text):
+    """필드 재질의: 원문을 규칙 파서로 다시 읽어 경로별 값"""
+    context = _section(text, "[원문]")
+    dates = parse_dates(context)
+    times = parse_times(context)
+    fixed = {}
+    for path in re.findall(r'^- "([^"]+)":', text, re.M):
+        leaf = path.rsplit(".", 1)[-1]
+        value = ""
+        if leaf in ("start_date", "end_date") and dates:
+            value = dates[0][0 if leaf == "start_date" else 1]
+        elif leaf in ("start_time", "end_time"):
+            value = times[0 if leaf == "start_time" else 1]
+        elif leaf == "place":
+            value = clean_place(_field(context, r"(?:장소|위치)\s*[:：]\s*(.+)"))
+        fixed[path] = value
+    return fixed
+
+
+def synthetic_content(body, key):
+    text, images = message_text(body.get("messages"))
+    if "[잘못된 필드]" in text:
+        data = synthetic_fix_fields(text)
+    elif images and "date_info" in text:
+        data = {"market_name": "", "place": "", **synthetic_poster(key)}
+    else:
+        data = synthetic_market(text, images, key)
+    return json.dumps(data, ensure_ascii=False)
+
+
+def malform(content, rng):
+    """잘못된 JSON: 중간에서 잘리거나 설명 문장이 붙은 응답"""
+    if rng.random() < 0.5:
+        return content[: max(1, len(content) // 2)]
+    return "다음은 추출 결과입니다.\n" + content
+
+
+class MockConfig:
+    """mock 서버 동작 설정"""
+
+    def __init__(self, latency="fixed:0", rate_429=0.0, malformed=0.0, seed=0,
+                 rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, retry_after=1.0,
+                 recordings_file=RECORDINGS_FILE, record=False, upstream=UPSTREAM_URL):
+        self.latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.malformed = malformed
+        self.seed = seed
+        self.rpm = rpm
+        self.tpm = tpm
+        self.retry_after = retry_after
+        self.recordings_file = recordings_file
+        self.record = record
+        self.upstream = upstream.rstrip("/")
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            latency=os.getenv("MOCK_LLM_LATENCY", "fixed:0"),
+            rate_429=float(os.getenv("MOCK_LLM_RATE_429", "0")),
+            malformed=float(os.getenv("MOCK_LLM_MALFORMED", "0")),
+            seed=int(os.getenv("MOCK_LLM_SEED", "0")),
+        )
+
+
+class MockState:
+    """녹화본 + 집계 + 분당 한도 창 (요청 스레드들이 공유)"""
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.seen = Counter()          # 요청 해시 → 받은 횟수 (재시도마다 다른 난수)
+        self.window_started = time.time()
+        self.window_requests = 0
+        self.window_tokens = 0
+        try:
+            with open(config.recordings_file, "r", encoding="utf-8") as f:
+                self.recordings = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.recordings = {}
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+            self.seen.clear()
+            self.window_started = time.time()
+            self.window_requests = 0
+            self.window_tokens = 0
+
+    def next_rng(self, key):
+        with self.lock:
+            self.seen[key] += 1
+            attempt = self.seen[key]
+        return random.Random(f"{self.config.seed}:{key}:{attempt}")
+
+    def take_quota(self, tokens):
+        """
+        분당 요청/토큰 한도 차감
+        Returns: (한도 초과 여부, 응답 헤더)
+        """
+        with self.lock:
+            now = time.time()
+            if now - self.window_started >= 60:
+                self.window_started = now
+                self.window_requests = 0
+                self.window_tokens = 0
+            reset = max(0.0, 60 - (now - self.window_started))
+            exceeded = self.window_requests + 1 > self.config.rpm or self.window_tokens + tokens > self.config.tpm
+            if not exceeded:
+                self.window_requests += 1
+                self.window_tokens += tokens
+            headers = {
+                "x-ratelimit-limit-requests": str(self.config.rpm),
+                "x-ratelimit-limit-tokens": str(self.config.tpm),
+                "x-ratelimit-remaining-requests": str(max(0, self.config.rpm - self.window_requests)),
+                "x-ratelimit-remaining-tokens": str(max(0, self.config.tpm - self.window_tokens)),
+                "x-ratelimit-reset-requests": f"{reset:.3f}s",
+                "x-ratelimit-reset-tokens": f"{reset:.3f}s",
+            }
+        return exceeded, headers
+
+    def count(self, **values):
+        with self.lock:
+            self.stats.update(values)
+
+    def store_recording(self, key, entry):
+        with self.lock:
+            self.recordings[key] = entry
+            with open(self.config.recordings_file, "w", encoding="utf-8") as f:
+                json.dump(self.recordings, f, ensure_ascii=False)
+
+
+def fetch_upstream(config, body, authorization):
+    """실제 API 호출 (녹화 모드) → (상태 코드, 응답 JSON)"""
+    request = urllib.request.Request(
+        f"{config.upstream}/chat/completions",
+        data=json.dumps(body).encode("utf-8"),
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": authorization or f"Bearer {os.getenv('OPENAI_API_KEY', '')}",
+        },
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "MockLLM/1.0"
+
+    def log_message(self, format, *args):
+        pass  # 요청마다 로그 출력하지 않음
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        state = self.server.state
+        if self.path.rstrip("/").endswith("/mock/stats"):
+            with state.lock:
+                self._send_json(200, dict(state.stats))
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        state = self.server.state
+        if self.path.rstrip("/").endswith("/mock/reset"):
+            state.reset()
+            self._send_json(200, {"ok": True})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {"error": {"message": "invalid JSON body", "type": "invalid_request_error"}})
+            return
+        self.handle_completion(state, body)
+
+    def handle_completion(self, state, body):
+        config = state.config
+        key = request_key(body)
+        rng = state.next_rng(key)
+        text, images = message_text(body.get("messages"))
+        prompt_tokens = count_tokens(text) + images * IMAGE_TOKENS
+
+        state.count(requests=1)
+        time.sleep(sample_latency(rng, config.latency))
+
+        exceeded, headers = state.take_quota(prompt_tokens)
+        if exceeded or rng.random() < config.rate_429:
+            state.count(rate_limited=1)
+            headers["retry-after"] = f"{config.retry_after:g}"
+            headers["retry-after-ms"] = str(int(config.retry_after * 1000))
+            self._send_json(429, {"error": {
+                "message": "Rate limit reached (mock)",
+                "type": "requests",
+                "code": "rate_limit_exceeded",
+            }}, headers)
+            return
+
+        recording = state.recordings.get(key)
+        if recording:
+            state.count(replayed=1)
+            content = recording["content"]
+            usage = recording.get("usage")
+        elif config.record:
+            status, payload = fetch_upstream(config, body, self.headers.get("Authorization"))
+            if status != 200:
+                state.count(upstream_errors=1)
+                self._send_json(status, payload, headers)
+                return
+            content = payload["choices"][0]["message"]["content"]
+            usage = payload.get("usage")
+            state.store_recording(key, {
+                "content": content,
+                "usage": usage,
+                "model": body.get("model"),
+                "recorded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            })
+            state.count(recorded=1)
+        else:
+            state.count(synthetic=1)
+            content = synthetic_content(body, key)
+            usage = None
+
+        if rng.random() < config.malformed:
+            state.count(malformed=1)
+            content = malform(content, rng)
+
+        usage = usage or {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": count_tokens(content),
+            "total_tokens": prompt_tokens + count_tokens(content),
+        }
+        state.count(ok=1, prompt_tokens=usage["prompt_tokens"], completion_tokens=usage["completion_tokens"])
+
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{key[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }, headers)
+
+
+def start_server(config, host="127.0.0.1", port=DEFAULT_PORT):
+    """
+    백그라운드 스레드로 mock 서버 실행
+
+    Returns:
+        (server, base_url) - server.shutdown()으로 종료
+    """
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def fetch_stats(base_url):
+    """mock 서버 집계 조회 (mock 서버가 아니면 None)"""
+    try:
+        with urllib.request.urlopen(f"{base_url.rstrip('/')}/mock/stats", timeout=5) as response:
+            return json.loads(response.read())
+    except Exception:
+        return None
+
+
+def reset_stats(base_url):
+    try:
+        request = urllib.request.Request(f"{base_url.rstrip('/')}/mock/reset", data=b"", method="POST")
+        urllib.request.urlopen(request, timeout=5).close()
+    except Exception:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="로컬 OpenAI 호환 mock LLM 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default="fixed:0", help='지연 시간 분포 (예: "lognormal:-0.7,0.4")')
+    parser.add_argument("--rate-429", type=float, default=0.0, help="429 응답 확률")
+    parser.add_argument("--malformed", type=float, default=0.0, help="잘못된 JSON 응답 확률")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_RPM, help="분당 요청 한도")
+    parser.add_argument("--tpm", type=int, default=DEFAULT_TPM, help="분당 토큰 한도")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 응답의 retry-after (초)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recordings", default=RECORDINGS_FILE, help="녹화 파일")
+    parser.add_argument("--record", action="store_true", help="녹화본이 없으면 실제 API로 전달하고 저장")
+    parser.add_argument("--upstream", default=UPSTREAM_URL, help="녹화 모드에서 사용할 실제 API 주소")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency, rate_429=args.rate_429, malformed=args.malformed, seed=args.seed,
+        rpm=args.rpm, tpm=args.tpm, retry_after=args.retry_after,
+        recordings_file=args.recordings, record=args.record, upstream=args.upstream,
+    )
+    server, base_url = start_server(config, args.host, args.port)
+    print(f"🧪 mock LLM 서버 실행 중: {base_url}")
+    print(f"   녹화본 {len(server.state.recordings)}개 / 지연 {args.latency} / 429 {args.rate_429:.0%} / 잘못된 JSON {args.malformed:.0%}")
+    print(f"   OPENAI_BASE_URL={base_url} 로 설정해서 사용 (Ctrl+C 종료)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\n👋 mock 서버 종료")
@@ -0,0 +1,139 @@
+"""
+저비용 우선 모델 라우팅
+- 게시글을 가장 싼 단계부터 처리하고, 결과의 완성도/유효성 점수가
+  기준 미달일 때만 다음 단계로 승격
+    rule   : 규칙 기반 파서 (LLM 호출 없음)
+    small  : 소형 모델 (호스팅 소형 모델 또는 OpenAI 호환 로컬 서버)
+    strong : 기존 gpt-4o-mini 파이프라인 (이미지 보완 포함, 마지막 단계)
+- 어느 단계가 처리했는지는 structured 데이터의 _source.tier에 기록
+"""
+import os
+from datetime import datetime, timedelta
+
+from llm_processor import LLM_STATS, extract_from_text, finalize_result
+from output_schema import validate_market
+from prompt_templates import get_text_prompt
+from rule_parser import parse_post
+
+# strong 앞에서 시도할 저비용 단계 (쉼표 구분, 순서대로)
+ROUTING_TIERS = [t.strip() for t in os.getenv("LLM_ROUTING_TIERS", "rule,small").split(",") if t.strip()]
+
+# small 단계 설정 (LLM_SMALL_BASE_URL로 로컬 OpenAI 호환 서버 지정 가능)
+SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "gpt-4.1-nano")
+SMALL_BASE_URL = os.getenv("LLM_SMALL_BASE_URL") or None
+SMALL_API_KEY = os.getenv("LLM_SMALL_API_KEY") or os.getenv("OPENAI_API_KEY") or "local"
+
+# 이 점수 이상이면 해당 단계 결과를 그대로 사용
+ACCEPT_SCORE = float(os.getenv("LLM_ACCEPT_SCORE", "0.85"))
+
+_small_client = None
+
+
+def score_result(data, post_date=""):
+    """
+    결과 신뢰도 점수 (0.0 ~ 1.0)
+    - 스키마 검증 실패 → 0
+    - 행사명 0.1 / 장소 0.3 / 날짜 0.4 / 시작·종료 시간 0.15 / 날짜 순서 0.05
+    - 작성일 기준으로 말이 안 되는 날짜면 절반으로 감점
+    """
+    if not data or validate_market(data):
+        return 0.0
+
+    score = 0.0
+    if data.get("market_name", "").strip():
+        score += 0.1
+
+    # 지역명만 있는 장소("서울", "홍대")는 검색 불가 → 점수 없음
+    place = data.get("place", "").strip()
+    if len(place.replace(" ", "")) >= 4:
+        score += 0.3
+
+    sessions = data.get("sessions") or []
+    first = sessions[0] if sessions else {}
+    start_date = first.get("start_date", "")
+    end_date = first.get("end_date", "")
+    if start_date:
+        score += 0.4
+    if first.get("start_time"):
+        score += 0.1
+    if first.get("end_time"):
+        score += 0.05
+    if start_date and (not end_date or end_date >= start_date):
+        score += 0.05
+
+    if start_date and post_date:
+        try:
+            posted = datetime.strptime(post_date, "%Y-%m-%d")
+            event = datetime.strptime(start_date, "%Y-%m-%d")
+            if not (posted - timedelta(days=60) <= event <= posted + timedelta(days=400)):
+                score *= 0.5
+        except ValueError:
+            pass
+
+    return round(score, 3)
+
+
+def get_small_client():
+    """small 단계 클라이언트 (최초 사용 시 생성)"""
+    global _small_client
+    if _small_client is None:
+        from openai import OpenAI
+
+        _small_client = OpenAI(api_key=SMALL_API_KEY, base_url=SMALL_BASE_URL)
+    return _small_client
+
+
+def run_rule_tier(detail):
+    return parse_post(detail)
+
+
+def run_small_tier(detail):
+    prompt = get_text_prompt(
+        detail.get("raw_text", "").strip(),
+        detail.get("url", ""),
+        detail.get("place", "").strip(),
+        detail.get("post_date", "").strip(),
+    )
+    return extract_from_text(prompt, max_retries=1, model=SMALL_MODEL, llm_client=get_small_client(), kind="small")
+
+
+TIER_RUNNERS = {
+    "rule": run_rule_tier,
+    "small": run_small_tier,
+}
+
+
+def route_cheap(detail, tiers=None):
+    """
+    저비용 단계를 순서대로 시도
+
+    Returns:
+        (data, tier, score) - 기준을 넘긴 단계가 없으면 (None, None, 최고 점수)
+        → 호출측에서 strong 단계(기존 파이프라인)로 승격
+    """
+    best_score = 0.0
+    post_date = detail.get("post_date", "").strip()
+
+    for tier in tiers or ROUTING_TIERS:
+        runner = TIER_RUNNERS.get(tier)
+        if not runner:
+            continue
+        try:
+            data = runner(detail)
+        except Exception as e:
+            print(f"  ⚠️  [{tier}] 단계 오류: {e}")
+            data = None
+
+        score = score_result(data, post_date)
+        best_score = max(best_score, score)
+        if score >= ACCEPT_SCORE:
+            data["url"] = detail.get("url", "")
+            if not data.get("market_name"):
+                data["market_name"] = detail.get("title", "").strip() or "제목 미정"
+            LLM_STATS[f"tier_{tier}"] += 1
+            print(f"  🪙 [{tier}] 단계에서 처리 (신뢰도 {score:.2f})")
+            return finalize_result(data), tier, score
+
+        LLM_STATS["escalations"] += 1
+
+    return None, None, best_score
@@ -0,0 +1,306 @@
+"""
+Supabase 복제 대기열 (transactional outbox, fleamarket.db의 outbox 테이블)
+- 로컬 DB 저장/삭제와 같은 트랜잭션에서 대기열에 기록 (db_manager.save_many/delete_markets의 outbox=True)
+- 드레이너가 대기열을 배치 단위로 Supabase에 복제 → 파이프라인은 Supabase 상태와 무관하게 로컬 속도로 끝남
+- 순서 보장: 같은 url의 이전 항목이 재시도 대기 중이면 이후 항목도 대기, 배치 안에서는 url별 마지막 상태만 전송
+- 멱등성: 항목마다 idempotency_key(url:해시), 전송은 url 기준 upsert/세션 차이 반영/url 삭제라 여러 번 보내도 결과 동일
+- 실패한 url은 지수 백오프 후 재시도 (1분 → 2분 → 4분 ... 최대 1시간)
+- 지오코딩 좌표는 별도 항목(coords)으로 기록 → 행사 upsert 뒤에 url 기준 좌표만 update
+  (이후에 기록된 upsert/delete가 있으면 그 좌표 항목은 버림, upsert에는 저장 시점의 로컬 좌표가 들어 있음)
+
+사용법:
+    python outbox.py                  # 대기열 상태
+    python outbox.py --drain          # 대기열 전부 복제
+    python outbox.py --loop 60        # 60초마다 복제 (별도 프로세스로 실행)
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from db_manager import DB_PATH, get_write_connection, init_db
+
+OUTBOX_BATCH_SIZE = 500
+
+BASE_BACKOFF_SECONDS = 60
+MAX_BACKOFF_SECONDS = 3600
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SINK = "supabase"
+
+
+def _now():
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+def backoff_delay(attempts):
+    """attempts번 실패 후 다음 재시도까지 대기 시간"""
+    seconds = min(BASE_BACKOFF_SECONDS * (2 ** (attempts - 1)), MAX_BACKOFF_SECONDS)
+    return timedelta(seconds=seconds)
+
+
+def _payload(data):
+    """Supabase에 보낼 필드만 (원문/메타데이터 제외)"""
+    return {
+        "url": data["url"],
+        "market_name": data.get("market_name", "제목 미정"),
+        "place": data.get("place", ""),
+        "image_url": data.get("image_url") or (data.get("_source") or {}).get("image_url", ""),
+        "sessions": data.get("sessions", []),
+    }
+
+
+def _enqueue(cur, rows):
+    """
+    rows: (url, op, payload, 해시)
+    - 같은 키가 아직 대기 중이면 지우고 맨 뒤에 다시 추가 (A → B → A로 되돌린 경우 마지막 A가 적용되도록)
+    """
+    now = _now()
+    rows = [(url, op, payload, digest, f"{url}:{digest}") for url, op, payload, digest in rows]
+    cur.executemany("DELETE FROM outbox WHERE idempotency_key = ?", [(row[4],) for row in rows])
+    cur.executemany(
+        """INSERT INTO outbox (url, op, payload, content_hash, idempotency_key, next_attempt_at, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        [(*row, now, now) for row in rows],
+    )
+
+
+def enqueue_upserts(cur, records, place_changed=()):
+    """
+    structured 데이터 저장을 대기열에 기록 (호출측 트랜잭션 안에서, markets 저장 뒤에 실행)
+    - 저장 후 로컬 좌표를 함께 기록 (장소가 그대로면 기존 좌표 유지)
+    - place_changed: 장소가 바뀐 url → 좌표를 null로 보내 Supabase의 예전 장소 좌표를 지움
+    """
+    from db_manager import LOOKUP_BATCH_SIZE
+    from sync_state import content_hash
+
+    records = list(records)
+    urls = list({data["url"] for data in records})
+    coords = {}
+    for start in range(0, len(urls), LOOKUP_BATCH_SIZE):
+        batch = urls[start:start + LOOKUP_BATCH_SIZE]
+        coords.update((url, (lat, lng)) for url, lat, lng in cur.execute(
+            f"""SELECT url, lat, lng FROM markets
+                WHERE lat IS NOT NULL AND lng IS NOT NULL AND url IN ({",".join("?" * len(batch))})""",
+            batch,
+        ))
+
+    rows = []
+    for data in records:
+        payload = _payload(data)
+        if data["url"] in coords:
+            payload["lat"], payload["lng"] = coords[data["url"]]
+        elif data["url"] in place_changed:
+            payload["lat"] = payload["lng"] = None
+        rows.append((data["url"], "upsert", json.dumps(payload, ensure_ascii=False), content_hash(data)))
+    _enqueue(cur, rows)
+
+
+def enqueue_deletes(cur, urls):
+    """행사 삭제를 대기열에 기록 (호출측 트랜잭션 안에서 실행)"""
+    from sync_state import TOMBSTONE
+
+    _enqueue(cur, [(url, "delete", None, TOMBSTONE) for url in urls])
+
+
+def enqueue_coordinates(cur, rows):
+    """
+    지오코딩 좌표를 대기열에 기록 (호출측 트랜잭션 안에서 실행)
+
+    Args:
+        rows: (url, lat, lng)
+    """
+    _enqueue(cur, [
+        (url, "coords", json.dumps({"url": url, "lat": lat, "lng": lng}), f"coords:{lat},{lng}")
+        for url, lat, lng in rows
+    ])
+
+
+def enqueue_pending(records, db_path=DB_PATH):
+    """
+    sync_state 기준으로 Supabase에 반영 안 된 게시글을 대기열에 보충
+    (outbox 도입 전 데이터, 로컬은 그대로인데 Supabase만 뒤처진 경우)
+
+    Returns:
+        대기열에 추가한 항목 수
+    """
+    from sync_state import plan_sync
+
+    changed, deleted, _ = plan_sync(records, SINK, db_path)
+    conn = get_write_connection(db_path)
+    try:
+        init_db(conn)
+        queued = {url for (url,) in conn.execute("SELECT DISTINCT url FROM outbox WHERE op != 'coords'")}
+        changed = [data for data in changed if data["url"] not in queued]
+        deleted = [url for url in deleted if url not in queued]
+        with conn:
+            enqueue_upserts(conn, changed)
+            enqueue_deletes(conn, deleted)
+    finally:
+        conn.close()
+    return len(changed) + len(deleted)
+
+
+def _next_batch(conn, batch_size):
+    """재시도 대기 중인 항목이 없는 url 중 오래된 순으로 batch_size개 url의 항목 전부"""
+    return conn.execute(
+        """SELECT id, url, op, payload, content_hash, attempts FROM outbox
+           WHERE url IN (
+               SELECT url FROM outbox
+               GROUP BY url
+               HAVING MAX(next_attempt_at) <= ?
+               ORDER BY MIN(id)
+               LIMIT ?
+           )
+           ORDER BY id""",
+        (_now(), batch_size),
+    ).fetchall()
+
+
+def _replicate(latest, coords):
+    """
+    url별 마지막 항목을 Supabase에 전송 (행사 upsert → 좌표 update → 삭제 순서)
+
+    Args:
+        latest: url → 마지막 upsert/delete 항목
+        coords: url → 마지막 좌표 항목 (이후에 upsert/delete가 기록된 url 제외)
+
+    Returns:
+        (실패한 url → 오류 메시지, save_many 결과)
+    """
+    from supabase_manager import delete_markets, save_many, update_coordinates_by_url
+
+    upserts = [json.loads(entry[3]) for entry in latest.values() if entry[2] == "upsert"]
+    deletes = [url for url, entry in latest.items() if entry[2] == "delete"]
+
+    failed = {}
+    result = save_many(upserts) if upserts else {}
+    for url in result.get("failed_urls", []):
+        failed[url] = "upsert 실패"
+    # 행사 upsert가 실패한 url은 좌표도 보류 (행사 행 없이 좌표만 생기지 않도록)
+    rows = [json.loads(entry[3]) for url, entry in coords.items() if url not in failed]
+    if rows:
+        _, _, coords_failed = update_coordinates_by_url(rows)
+        for url in coords_failed:
+            failed[url] = "좌표 update 실패"
+    if deletes:
+        _, delete_failed = delete_markets(deletes)
+        for url in delete_failed:
+            failed[url] = "delete 실패"
+    return failed, result
+
+
+def drain_outbox(batch_size=OUTBOX_BATCH_SIZE, time_budget=None, db_path=DB_PATH):
+    """
+    대기열을 Supabase에 복제
+
+    Args:
+        time_budget: 초 단위 제한 (None이면 재시도 가능한 항목이 없을 때까지)
+
+    Returns:
+        {"applied", "failed", "pending", "sessions_unchanged", "sessions_added", "sessions_removed"} 개수
+    """
+    from sync_state import record_pushed
+
+    stats = {"applied": 0, "failed": 0, "pending": 0,
+             "sessions_unchanged": 0, "sessions_added": 0, "sessions_removed": 0}
+    started = time.time()
+
+    conn = get_write_connection(db_path)
+    try:
+        init_db(conn)
+        while time_budget is None or time.time() - started < time_budget:
+            entries = _next_batch(conn, batch_size)
+            if not entries:
+                break
+
+            # 같은 url은 마지막 상태만 전송 (upsert/delete 모두 전체 상태라 중간 상태 생략 가능)
+            # 좌표는 행사 상태와 따로 마지막 값만 전송
+            # (id 순이라 뒤에 나온 upsert/delete가 앞의 좌표를 버림 → 바뀐 장소에 예전 좌표가 붙지 않음)
+            latest = {}
+            coords = {}
+            for entry in entries:
+                if entry[2] == "coords":
+                    coords[entry[1]] = entry
+                    continue
+                latest[entry[1]] = entry
+                coords.pop(entry[1], None)
+            urls = set(latest) | set(coords)
+
+            try:
+                failed, result = _replicate(latest, coords)
+            except Exception as e:
+                # 자격 증명 누락 등 배치 전체 실패
+                failed, result = {url: str(e) for url in urls}, {}
+                print(f"❌ Supabase 복제 실패: {e}")
+
+            for key in ("sessions_unchanged", "sessions_added", "sessions_removed"):
+                stats[key] += result.get(key, 0)
+
+            now = datetime.now()
+            with conn:
+                conn.executemany(
+                    "DELETE FROM outbox WHERE id = ?",
+                    [(entry[0],) for entry in entries if entry[1] not in failed],
+                )
+                conn.executemany(
+                    "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    [
+                        (entry[5] + 1, (now + backoff_delay(entry[5] + 1)).strftime(TIME_FORMAT),
+                         failed[entry[1]], entry[0])
+                        for entry in entries if entry[1] in failed
+                    ],
+                )
+                record_pushed(conn, SINK, {
+                    url: entry[4] for url, entry in latest.items() if url not in failed
+                })
+
+            stats["applied"] += len(urls) - len(failed)
+            stats["failed"] += len(failed)
+            print(f"  ☁️  복제 {len(urls) - len(failed)}개 / 실패 {len(failed)}개")
+
+            # 배치 전체가 실패하면 Supabase 장애로 보고 다음 실행에 재시도
+            if len(failed) == len(urls):
+                break
+
+        stats["pending"] = conn.execute("SELECT COUNT(DISTINCT url) FROM outbox").fetchone()[0]
+    finally:
+        conn.close()
+
+    return stats
+
+
+def print_status(db_path=DB_PATH):
+    conn = get_write_connection(db_path)
+    try:
+        init_db(conn)
+        total, urls, waiting = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT url), COUNT(DISTINCT CASE WHEN attempts > 0 THEN url END) FROM outbox"
+        ).fetchone()
+        print(f"📬 복제 대기열: 항목 {total}개 / 행사 {urls}개 (재시도 대기 {waiting}개)")
+        for url, attempts, next_attempt_at, last_error in conn.execute(
+            """SELECT url, MAX(attempts), MAX(next_attempt_at), last_error FROM outbox
+               WHERE attempts > 0 GROUP BY url ORDER BY MAX(attempts) DESC LIMIT 10"""
+        ):
+            print(f"  ⏳ {url} - {attempts}회 실패, 다음 시도 {next_attempt_at} ({last_error})")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Supabase 복제 대기열 (outbox)")
+    parser.add_argument("--drain", action="store_true", help="대기열 전부 복제")
+    parser.add_argument("--loop", type=int, metavar="SECONDS", help="N초마다 복제 반복")
+    args = parser.parse_args()
+
+    if args.loop:
+        while True:
+            stats = drain_outbox()
+            print(f"[{_now()}] 복제 {stats['applied']}개 / 실패 {stats['failed']}개 / 남은 행사 {stats['pending']}개")
+            time.sleep(args.loop)
+    elif args.drain:
+        stats = drain_outbox()
+        print(f"✅ 복제 {stats['applied']}개 / 실패 {stats['failed']}개 / 남은 행사 {stats['pending']}개")
+    else:
+        print_status()
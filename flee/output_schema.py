@@ -0,0 +1,171 @@
+"""
+LLM 출력 JSON 스키마 + 검증기
+- OpenAI Structured Outputs(response_format=json_schema)에 넘길 스키마
+- 스키마를 한 번 컴파일해 재사용하는 검증기 (잘못된 필드 경로 목록 반환)
+"""
+import re
+from datetime import datetime
+
+# LLM이 출력하면 안 되는 플레이스홀더
+FORBIDDEN_PLACEHOLDERS = ["미정", "추후 공지", "TBD", "미확정", "추가 예정", "추후 안내"]
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_TIME_RE = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+
+
+def _is_date(value):
+    if not _DATE_RE.match(value):
+        return False
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+def _is_time(value):
+    return bool(_TIME_RE.match(value))
+
+
+# "x-format"은 로컬 검증 전용 키 (API 전송 시 제거)
+_FORMAT_CHECKS = {
+    "date": _is_date,
+    "time": _is_time,
+}
+
+SESSION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "start_date": {"type": "string", "x-format": "date", "description": "YYYY-MM-DD, 모르면 빈 문자열"},
+        "end_date": {"type": "string", "x-format": "date", "description": "YYYY-MM-DD, 모르면 빈 문자열"},
+        "start_time": {"type": "string", "x-format": "time", "description": "HH:mm (24시간제), 모르면 빈 문자열"},
+        "end_time": {"type": "string", "x-format": "time", "description": "HH:mm (24시간제), 모르면 빈 문자열"},
+        "notes": {"type": "string"},
+    },
+    "required": ["start_date", "end_date", "start_time", "end_time", "notes"],
+    "additionalProperties": False,
+}
+
+MARKET_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "market_name": {"type": "string"},
+        "place": {"type": "string", "description": "카카오맵 검색 가능한 장소명 또는 주소, 모르면 빈 문자열"},
+        "url": {"type": "string"},
+        "sessions": {"type": "array", "items": SESSION_SCHEMA},
+    },
+    "required": ["market_name", "place", "url", "sessions"],
+    "additionalProperties": False,
+}
+
+
+def api_schema(schema):
+    """로컬 전용 키(x-*)를 제거한 API 전송용 스키마"""
+    if isinstance(schema, dict):
+        return {k: api_schema(v) for k, v in schema.items() if not k.startswith("x-")}
+    if isinstance(schema, list):
+        return [api_schema(v) for v in schema]
+    return schema
+
+
+def response_format(name, schema):
+    """chat.completions.create(response_format=...)용 값"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": api_schema(schema)},
+    }
+
+
+def compile_validator(schema):
+    """
+    스키마 → 검증 함수
+
+    Returns:
+        validate(data) → 잘못된 필드 경로 리스트 (예: ["place", "sessions.0.start_date"])
+    """
+    return _compile(schema, "")
+
+
+def _join(path, key):
+    return f"{path}.{key}" if path else str(key)
+
+
+def _compile(schema, path):
+    kind = schema.get("type")
+
+    if kind == "object":
+        props = {key: _compile(sub, key) for key, sub in schema.get("properties", {}).items()}
+        required = schema.get("required", [])
+
+        def validate_object(value, prefix=path):
+            if not isinstance(value, dict):
+                return [prefix or "$"]
+            errors = []
+            for key in required:
+                if key not in value:
+                    errors.append(_join(prefix, key))
+            for key, check in props.items():
+                if key in value:
+                    errors.extend(check(value[key], _join(prefix, key)))
+            return errors
+
+        return validate_object
+
+    if kind == "array":
+        check_item = _compile(schema.get("items", {}), path)
+
+        def validate_array(value, prefix=path):
+            if not isinstance(value, list):
+                return [prefix]
+            errors = []
+            for i, item in enumerate(value):
+                errors.extend(check_item(item, _join(prefix, i)))
+            return errors
+
+        return validate_array
+
+    fmt = _FORMAT_CHECKS.get(schema.get("x-format"))
+
+    def validate_string(value, prefix=path):
+        if not isinstance(value, str):
+            return [prefix]
+        value = value.strip()
+        if not value:
+            return []  # 빈 문자열 = "정보 없음" 허용
+        if value in FORBIDDEN_PLACEHOLDERS:
+            return [prefix]
+        if fmt and not fmt(value):
+            return [prefix]
+        return []
+
+    return validate_string
+
+
+def get_path(data, path):
+    """"sessions.0.start_date" 형식 경로의 값"""
+    node = data
+    for key in path.split("."):
+        if isinstance(node, list):
+            node = node[int(key)] if key.isdigit() and int(key) < len(node) else None
+        elif isinstance(node, dict):
+            node = node.get(key)
+        else:
+            return None
+    return node
+
+
+def set_path(data, path, value):
+    """"sessions.0.start_date" 형식 경로에 값 설정"""
+    keys = path.split(".")
+    node = data
+    for key in keys[:-1]:
+        node = node[int(key)] if isinstance(node, list) else node.setdefault(key, {})
+    last = keys[-1]
+    if isinstance(node, list):
+        node[int(last)] = value
+    else:
+        node[last] = value
+
+
+validate_market = compile_validator(MARKET_SCHEMA)
+MARKET_RESPONSE_FORMAT = response_format("fleamarket", MARKET_SCHEMA)
@@ -226,3 +226,74 @@ def get_refine_prompt(market_name: str, place: str, url: str, date_info: str, ti
   ]
 }}
 """
+
+
+def get_duplicate_verify_prompt(base_json: str, diff_text: str, url: str) -> str:
+    """근접 중복 게시글 검증용 프롬프트 (차이점만 전달)"""
+    return f"""
+아래 JSON은 거의 동일한 플리마켓 게시글에서 이미 추출한 결과입니다.
+새 게시글은 일부 줄만 다릅니다. 달라진 줄(+ 추가, - 삭제)을 보고 JSON을 수정하세요.
+
+[기존 추출 결과]
+{base_json}
+
+[달라진 줄]
+{diff_text}
+
+[규칙]
+1. 달라진 줄이 날짜/시간/장소/행사명에 영향을 주면 해당 필드만 수정
+2. 영향이 없으면 기존 값을 그대로 유지
+3. url은 "{url}"로 설정
+4. 날짜는 YYYY-MM-DD, 시간은 HH:mm, 모르면 빈 문자열("")
+5. JSON만 출력 (설명 금지)
+"""
+
+
+def get_fix_fields_prompt(context_text: str, invalid_fields: dict) -> str:
+    """검증에 실패한 필드만 다시 묻는 짧은 프롬프트"""
+    fields = "\n".join(f'- "{path}": {value!r}' for path, value in invalid_fields.items())
+    return f"""
+아래 필드 값이 형식에 맞지 않습니다. 원문을 참고해 해당 필드만 다시 작성하세요.
+
+[잘못된 필드]
+{fields}
+
+[형식]
+- *_date: YYYY-MM-DD / *_time: HH:mm (24시간제)
+- place: 카카오맵 검색 가능한 장소명 또는 주소 (괄호 금지)
+- "미정", "추후 공지" 같은 플레이스홀더 금지, 모르면 빈 문자열("")
+
+[원문]
+---
+{context_text}
+---
+
+필드 경로를 키로 하는 JSON만 출력하세요. 예: {{"sessions.0.start_date": "2025-10-25"}}
+"""
+
+
+def get_combined_image_prompt(market_name: str, place: str, url: str, post_date: str = "", raw_text: str = "") -> str:
+    """포스터 이미지 + 게시글 문맥을 한 번에 보내 최종 세션까지 받는 프롬프트"""
+    post_date_line = f"게시글 작성일: {post_date} (연도가 없는 날짜는 이 날짜 기준으로 추론, 지난 날짜는 다음해)" if post_date else ""
+    return f"""
+이 이미지는 플리마켓 행사 포스터이고, 아래는 같은 행사의 게시글 정보입니다.
+포스터와 게시글을 함께 보고 최종 JSON을 작성하세요.
+
+행사명: {market_name}
+장소(게시글 기준): {place}
+{post_date_line}
+
+[게시글 일부]
+---
+{raw_text}
+---
+
+[출력 규칙]
+1. 날짜는 YYYY-MM-DD, 시간은 24시간제 HH:mm ("오후 2시" → "14:00")
+2. 여러 날짜면 sessions 배열로 분리
+3. place는 카카오맵 검색 가능한 장소명 또는 주소 (괄호, 층수 제외)
+4. "미정", "추후 공지" 같은 플레이스홀더 금지, 모르면 빈 문자열("")
+5. url은 "{url}"
+
+JSON만 출력 (설명 금지).
+"""
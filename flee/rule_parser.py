@@ -0,0 +1,173 @@
+"""
+규칙 기반 플리마켓 정보 파서 (LLM 호출 없음)
+- 크롤링 단계에서 뽑은 date_time / place / market_name 필드와 본문 정규식으로
+  날짜·시간·장소가 명확한 게시글을 바로 구조화
+- 결과 형식은 LLM 출력(sessions 포함)과 동일
+"""
+import re
+from datetime import date, datetime
+
+# "2025.10.25", "2025-10-25", "2025년 10월 25일", "10월 25일", "10/25", "10.25"
+_DATE_TOKEN = re.compile(
+    r"(?:(\d{4})\s*(?:년|[.\-/])\s*)?(\d{1,2})\s*(?:월|[.\-/])\s*(\d{1,2})\s*일?"
+)
+# 토큰 바로 뒤의 "~26일" (같은 달 범위)
+_SAME_MONTH_END = re.compile(r"^\s*(?:\([^)]*\))?\s*[~\-–]\s*(\d{1,2})\s*일")
+# 토큰 바로 뒤의 "~" (다른 날짜 토큰으로 이어지는 범위)
+_RANGE_SEP = re.compile(r"^\s*(?:\([^)]*\))?\s*[~\-–]\s*")
+
+# "오후 1시", "13:00", "6시 반", "오전 11시 30분"
+_TIME_TOKEN = re.compile(
+    r"(오전|오후|낮|저녁|밤)?\s*(\d{1,2})\s*(?::\s*(\d{2})|시\s*(반|\d{1,2}\s*분)?)"
+)
+
+# 본문에서 날짜/시간/장소 줄을 찾을 때 쓰는 키워드
+_DATE_LINE = re.compile(r"(날짜|일시|일정|기간|행사일)")
+_TIME_LINE = re.compile(r"(시간|운영|일시)")
+_PLACE_LINE = re.compile(r"(장소|위치)\s*[:：]\s*(.+)")
+
+_PM_WORDS = ("오후", "저녁", "밤")
+
+
+def infer_year(month, day, post_date=""):
+    """
+    연도 추론 (프롬프트 규칙과 동일)
+    - 게시글 작성일 기준 연도 사용
+    - 이벤트 월이 작성월보다 이전이면 다음해
+    """
+    base = None
+    if post_date:
+        try:
+            base = datetime.strptime(post_date, "%Y-%m-%d").date()
+        except ValueError:
+            base = None
+    base = base or date.today()
+    return base.year + 1 if month < base.month else base.year
+
+
+def _to_iso(year, month, day):
+    try:
+        return date(int(year), int(month), int(day)).isoformat()
+    except ValueError:
+        return ""
+
+
+def parse_dates(text, post_date=""):
+    """
+    날짜 문자열 → [(start_date, end_date), ...]
+
+    예: "10월 25일~26일, 11월 2일" → [("2025-10-25", "2025-10-26"), ("2025-11-02", "2025-11-02")]
+    """
+    ranges = []
+    matches = list(_DATE_TOKEN.finditer(text or ""))
+    i = 0
+    while i < len(matches):
+        m = matches[i]
+        year, month, day = m.group(1), int(m.group(2)), int(m.group(3))
+        if not (1 <= month <= 12 and 1 <= day <= 31):
+            i += 1
+            continue
+        year = int(year) if year else infer_year(month, day, post_date)
+        start = _to_iso(year, month, day)
+        end = start
+        rest = text[m.end():]
+
+        same_month = _SAME_MONTH_END.match(rest)
+        sep = _RANGE_SEP.match(rest)
+        if same_month:
+            end = _to_iso(year, month, int(same_month.group(1))) or start
+        elif sep and i + 1 < len(matches) and matches[i + 1].start() == m.end() + sep.end():
+            nxt = matches[i + 1]
+            end_month, end_day = int(nxt.group(2)), int(nxt.group(3))
+            end_year = int(nxt.group(1)) if nxt.group(1) else (year + 1 if end_month < month else year)
+            end = _to_iso(end_year, end_month, end_day) or start
+            i += 1
+
+        if start:
+            ranges.append((start, end))
+        i += 1
+    return ranges
+
+
+def parse_times(text):
+    """시간 문자열 → (start_time, end_time) HH:mm, 없으면 빈 문자열"""
+    times = []
+    for m in _TIME_TOKEN.finditer(text or ""):
+        meridiem, hour, minute_colon, minute_word = m.groups()
+        hour = int(hour)
+        if minute_colon:
+            minute = int(minute_colon)
+        elif minute_word == "반":
+            minute = 30
+        elif minute_word:
+            minute = int(re.sub(r"\D", "", minute_word))
+        else:
+            minute = 0
+
+        if meridiem in _PM_WORDS and hour < 12:
+            hour += 12
+        elif meridiem is None and times and hour < 12 and f"{hour:02d}:{minute:02d}" < times[-1]:
+            # "오후 1시~6시", "낮 12시~6시" → 종료 시간이 시작보다 이르면 오후
+            hour += 12
+
+        if hour > 24 or minute > 59:
+            continue
+        times.append(f"{hour % 24:02d}:{minute:02d}")
+        if len(times) == 2:
+            break
+
+    start = times[0] if times else ""
+    end = times[1] if len(times) > 1 else ""
+    return start, end
+
+
+def clean_place(text):
+    """괄호, 층수 제거"""
+    cleaned = re.sub(r"\([^)]*\)", "", text or "")
+    cleaned = re.sub(r"\d+층", "", cleaned)
+    return " ".join(cleaned.split()).strip(" ,")
+
+
+def _find_line(raw_text, pattern):
+    for line in (raw_text or "").splitlines():
+        if pattern.search(line):
+            return line
+    return ""
+
+
+def parse_post(detail):
+    """
+    detail.json 항목 → LLM 출력과 같은 형식의 dict
+
+    Returns:
+        {"market_name", "place", "url", "sessions"} (세션을 못 찾으면 빈 리스트)
+    """
+    raw_text = detail.get("raw_text", "")
+    post_date = detail.get("post_date", "")
+
+    date_text = detail.get("date_time", "") or _find_line(raw_text, _DATE_LINE)
+    date_ranges = parse_dates(date_text, post_date)
+
+    time_text = date_text if _TIME_TOKEN.search(date_text) else _find_line(raw_text, _TIME_LINE)
+    start_time, end_time = parse_times(time_text)
+
+    place = detail.get("place", "")
+    if not place:
+        place_match = _PLACE_LINE.search(raw_text)
+        place = place_match.group(2) if place_match else ""
+
+    return {
+        "market_name": detail.get("market_name", "") or detail.get("title", "").strip(),
+        "place": clean_place(place),
+        "url": detail.get("url", ""),
+        "sessions": [
+            {
+                "start_date": start,
+                "end_date": end,
+                "start_time": start_time,
+                "end_time": end_time,
+                "notes": "",
+            }
+            for start, end in date_ranges
+        ],
+    }
@@ -5,18 +5,35 @@ fleamarket_structured.json → DB 저장
 import json
 import sys
 import io
-from db_manager import save_to_db, is_url_exist
+from db_manager import delete_markets, save_many, fill_search_raw_text
 
 # Windows 인코딩: BAT 파일의 chcp 65001이 처리
 
 
-def structured_to_db(input_file="fleamarket_structured.json", skip_existing=True):
+def load_raw_texts(detail_file="fleamarket_detail.json"):
+    """detail.json → {url: 원문} (검색 인덱스용, 파일이 없으면 빈 dict)"""
+    try:
+        with open(detail_file, "r", encoding="utf-8") as f:
+            details = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return {d["url"]: d.get("raw_text", "") for d in details if d.get("url")}
+
+
+def structured_to_db(input_file="fleamarket_structured.json", skip_existing=True, detail_file="fleamarket_detail.json",
+                     changed_only=False):
     """
     structured.json → DB 저장
     
     Args:
         input_file: 입력 JSON 파일
         skip_existing: True면 기존 URL 스킵, False면 덮어쓰기
+        detail_file: 검색 인덱스에 넣을 원문(raw_text)이 있는 detail JSON
+        changed_only: True면 지난 저장 이후 바뀐 게시글만 덮어쓰고 사라진 게시글은 삭제 (sync_state)
+                      변경분은 Supabase 복제 대기열(outbox)에도 기록
+
+    Returns:
+        저장 통계 dict (파일 오류 시 None)
     """
     
     print("=" * 80)
@@ -37,55 +54,56 @@ def structured_to_db(input_file="fleamarket_structured.json", skip_existing=True
         print(f"❌ JSON 파싱 오류: {e}")
         return
     
-    # 2. DB 저장
-    new_count = 0
-    skip_count = 0
-    fail_count = 0
-    
+    # 2. DB 저장 (연결 1개 + 청크 단위 트랜잭션, 기존 url은 쿼리 1회로 미리 조회)
     print(f"\n💾 DB 저장 시작...\n")
-    
-    for i, data in enumerate(structured_data, 1):
-        url = data.get("url", "")
-        market_name = data.get("market_name", "제목 미정")
-        
-        if not url:
-            fail_count += 1
-            continue
-        
-        # 이미 있으면 스킵
-        if skip_existing and is_url_exist(url):
-            skip_count += 1
-            continue
-        
-        print(f"[{i}/{len(structured_data)}] {market_name[:40]}")
-        
-        # 이미지 URL 추출 (메타데이터에서)
-        image_url = data.get("_source", {}).get("image_url", "")
-        
-        # DB 저장
-        try:
-            save_to_db(data, image_url)
-            new_count += 1
-            print(f"  ✅ 저장 완료")
-        except Exception as e:
-            fail_count += 1
-            print(f"  ❌ 저장 실패: {e}")
-    
+
+    raw_texts = load_raw_texts(detail_file)
+
+    if changed_only:
+        from sync_state import mark_pushed, plan_sync
+
+        records, deleted_urls, unchanged = plan_sync(structured_data, "local", detail_file=detail_file)
+        print(f"🔍 변경 {len(records)}개 / 삭제 {len(deleted_urls)}개 / 변경 없음 {unchanged}개")
+        # 로컬 변경과 같은 트랜잭션에서 Supabase 복제 대기열(outbox)에 기록
+        stats = save_many(records, skip_existing=False, raw_texts=raw_texts, outbox=True)
+        stats["deleted"] = delete_markets(deleted_urls, outbox=True)
+        stats["unchanged"] = unchanged
+
+        failed = set(stats["failed_urls"])
+        mark_pushed("local", [d["url"] for d in records if d["url"] not in failed] + deleted_urls)
+    else:
+        stats = save_many(structured_data, skip_existing=skip_existing, raw_texts=raw_texts)
+
+    # 이전에 원문 없이 저장된 행사의 검색 인덱스 보충
+    filled = fill_search_raw_text(raw_texts) if raw_texts else 0
+
     print()
     print("=" * 80)
     print(f"✅ DB 저장 완료")
-    print(f"   신규 저장: {new_count}개")
-    print(f"   기존 스킵: {skip_count}개")
-    print(f"   실패: {fail_count}개")
+    print(f"   신규 저장: {stats['new']}개")
+    if stats["updated"]:
+        print(f"   덮어쓰기: {stats['updated']}개")
+    print(f"   기존 스킵: {stats['skipped']}개")
+    if changed_only:
+        print(f"   변경 없음: {stats['unchanged']}개")
+        print(f"   삭제: {stats['deleted']}개")
+    print(f"   실패: {stats['failed']}개")
+    if filled:
+        print(f"   검색 원문 보충: {filled}개")
     print("=" * 80)
 
+    return stats
+
 
 if __name__ == "__main__":
     import sys
     
     force = "--force" in sys.argv or "-f" in sys.argv
     
-    if force:
+    if "--changed" in sys.argv:
+        print("🔍 변경분만 저장\n")
+        structured_to_db(skip_existing=False, changed_only=True)
+    elif force:
         print("⚠️  덮어쓰기 모드 활성화\n")
         structured_to_db(skip_existing=False)
     else:
@@ -3,8 +3,17 @@ Supabase 데이터베이스 관리 모듈
 db_manager.py와 동일한 인터페이스를 제공하되 Supabase를 사용
 """
 import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from supabase import create_client
+
+try:
+    from httpx import TransportError  # supabase 클라이언트의 HTTP 라이브러리 (연결/타임아웃 오류)
+except ImportError:
+    TransportError = ConnectionError
 
 load_dotenv()
 
@@ -12,10 +21,46 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")  # .env의 실제 변수명과 일치
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("❌ SUPABASE_URL 또는 SUPABASE_SERVICE_KEY가 설정되지 않았습니다. .env 파일을 확인하세요!")
+# 일괄 동기화 설정 (요청 1번에 보낼 행 수, 청크별 재시도)
+MARKET_CHUNK_SIZE = 500
+SESSION_CHUNK_SIZE = 1000
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0
+
+# 쓰기 동시 실행 수 (청크 단위 작업, 같은 행사는 항상 한 작업 안에서 순서대로 처리)
+WRITE_WORKERS = int(os.getenv("SUPABASE_WRITE_WORKERS", "4"))
+
+# 서킷 브레이커: 일시적 오류가 연속 N번이면 COOLDOWN초 동안 모든 요청 중지 후 1건만 시험
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+# 재시도할 Postgres 오류 코드 (연결, 직렬화 실패, 교착, 자원 부족, 타임아웃 취소) / HTTP 상태
+TRANSIENT_PG_CODES = ("08", "40001", "40P01", "53", "57014")
+TRANSIENT_HTTP_CODES = ("408", "429", "500", "502", "503", "504")
+
+# 조회 페이지 크기 (PostgREST 응답 최대 행 수 이하, 초과하면 서버가 조용히 잘라냄)
+READ_PAGE_SIZE = 1000
+
+# 기존 세션 조회 시 한 번에 IN (...)으로 묻는 행사 수
+SESSION_LOOKUP_CHUNK = 200
+
+# 세션 비교에 쓰는 자연 키 (날짜, 시간, 메모)
+SESSION_KEY_COLUMNS = ("start_date", "end_date", "start_time", "end_time", "notes")
+
+# Supabase 클라이언트는 첫 사용 때 생성 (import만 하는 단계는 키/supabase 패키지 불필요)
+_supabase = None
+
+
+def get_supabase():
+    """Supabase 클라이언트 (최초 사용 시 생성 후 재사용)"""
+    global _supabase
+    if _supabase is None:
+        from supabase import create_client
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise ValueError("❌ SUPABASE_URL 또는 SUPABASE_SERVICE_KEY가 설정되지 않았습니다. .env 파일을 확인하세요!")
+        _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase
 
 
 def sanitize_value(value, allow_empty=False):
@@ -37,7 +82,7 @@ def sanitize_value(value, allow_empty=False):
 def is_url_exist(url: str) -> bool:
     """해당 url이 markets 테이블에 이미 존재하는지 확인"""
     try:
-        response = supabase.table("markets").select("id").eq("url", url).execute()
+        response = get_supabase().table("markets").select("id").eq("url", url).execute()
         return len(response.data) > 0
     except Exception as e:
         print(f"❌ URL 존재 확인 오류: {e}")
@@ -56,12 +101,12 @@ def save_to_db(data, image_url=None):
         place = data.get("place", "")  # "미정" 대신 빈 문자열
 
         # 1) markets 중복 확인 및 저장/업데이트
-        response = supabase.table("markets").select("id").eq("url", url).execute()
+        response = get_supabase().table("markets").select("id").eq("url", url).execute()
 
         if response.data:
             # 기존 데이터가 있으면 업데이트
             market_id = response.data[0]["id"]
-            supabase.table("markets").update({
+            get_supabase().table("markets").update({
                 "market_name": market_name,
                 "place": place,
                 "image_url": image_url or ""
@@ -69,7 +114,7 @@ def save_to_db(data, image_url=None):
             print(f"  🔄 기존 행사 업데이트: {market_name}")
         else:
             # 새로운 데이터 삽입
-            insert_response = supabase.table("markets").insert({
+            insert_response = get_supabase().table("markets").insert({
                 "market_name": market_name,
                 "place": place,
                 "url": url,
@@ -78,22 +123,9 @@ def save_to_db(data, image_url=None):
             market_id = insert_response.data[0]["id"]
             print(f"  ✅ 신규 행사 저장: {market_name}")
 
-        # 2) sessions 저장
-        # 기존 세션 삭제 후 재생성 (업데이트 간단화)
-        supabase.table("sessions").delete().eq("market_id", market_id).execute()
-
-        # 새로운 세션 삽입 ("미정" 값을 적절히 변환)
-        for session in data.get("sessions", []):
-            supabase.table("sessions").insert({
-                "market_id": market_id,
-                "start_date": sanitize_value(session.get("start_date")),  # NULL 반환 (DATE 타입)
-                "end_date": sanitize_value(session.get("end_date")),      # NULL 반환 (DATE 타입)
-                "start_time": sanitize_value(session.get("start_time")),  # NULL 허용
-                "end_time": sanitize_value(session.get("end_time")),      # NULL 허용
-                "notes": session.get("notes", "")
-            }).execute()
-
-        return True
+        # 2) sessions 저장 (기존 세션과 비교해 바뀐 세션만 추가/삭제)
+        result = sync_sessions({market_id: data.get("sessions", [])})
+        return not result["failed"]
 
     except Exception as e:
         print(f"❌ Supabase 저장 오류: {e}")
@@ -102,11 +134,526 @@ def save_to_db(data, image_url=None):
         return False
 
 
+# 요청/재시도/오류 카운터 (파이프라인 리포트용, 여러 스레드에서 갱신)
+WRITE_STATS = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        WRITE_STATS[key] += n
+
+
+class CircuitBreaker:
+    """
+    일시적 오류가 연속 threshold번 나면 cooldown초 동안 모든 요청을 멈춤 (서비스 부하 완화)
+    - 대기 시간이 지나면 요청 1건만 시험으로 통과, 성공하면 정상화 / 실패하면 다시 대기
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial = False
+
+    def wait(self):
+        """요청 전 호출 → 차단 중이면 풀릴 때까지 대기"""
+        while True:
+            with self.lock:
+                if self.failures < self.threshold:
+                    return
+                now = time.time()
+                if now >= self.open_until and not self.trial:
+                    self.trial = True
+                    return
+                delay = max(self.open_until - now, 0.1)
+            time.sleep(delay)
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial = False
+            now = time.time()
+            if self.failures >= self.threshold and now >= self.open_until:
+                self.open_until = now + self.cooldown
+                _count("circuit_opened")
+                print(f"  🔌 Supabase 오류 연속 {self.failures}회 → {self.cooldown:.0f}초 동안 요청 중지")
+
+
+_breaker = CircuitBreaker()
+
+
+def is_transient(error):
+    """
+    재시도하면 성공할 수 있는 오류인지
+    - O: 네트워크 오류(연결/타임아웃), 서버 과부하/일시 장애 코드
+    - X: 제약 조건 위반/잘못된 요청, 코드 없는 예외(프로그래밍 오류, 응답 파싱 오류 등)
+    """
+    if isinstance(error, (TransportError, ConnectionError, TimeoutError)):
+        return True
+    code = str(getattr(error, "code", "") or "")
+    return code in TRANSIENT_HTTP_CODES or (bool(code) and code.startswith(TRANSIENT_PG_CODES))
+
+
+def _execute_with_retry(label, build_query, idempotent=True):
+    """
+    청크 요청 1개 실행 (일시적 오류는 full jitter 지수 백오프로 재시도)
+
+    Args:
+        label: 로그용 이름
+        build_query: 실행할 쿼리를 만드는 함수 (재시도마다 새로 생성)
+        idempotent: False면 재시도하지 않음 (응답 없이 끊긴 insert는 이미 반영됐을 수 있어
+                    호출측이 현재 상태를 확인한 뒤 다시 보내야 함)
+    """
+    for attempt in range(MAX_RETRIES):
+        _breaker.wait()
+        _count("requests")
+        try:
+            response = build_query().execute()
+        except Exception as e:
+            transient = is_transient(e)
+            if transient:
+                _breaker.failure()
+            else:
+                # 서비스는 응답했으므로 정상으로 기록 (시험 요청이었다면 차단 해제, 안 하면 대기가 끝나지 않음)
+                _breaker.success()
+            if not transient or not idempotent or attempt == MAX_RETRIES - 1:
+                _count("errors")
+                raise
+            _count("retries")
+            wait = random.uniform(0, BACKOFF_BASE * (2 ** attempt))
+            print(f"  ⚠️  {label} 실패 ({e}) → {wait:.1f}초 후 재시도 ({attempt + 1}/{MAX_RETRIES - 1})")
+            time.sleep(wait)
+        else:
+            _breaker.success()
+            return response
+
+
+def run_in_pool(fn, items, workers=WRITE_WORKERS):
+    """items 각각에 fn 실행 (최대 workers개 동시) → 결과를 입력 순서대로 반환"""
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, items))
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def market_row(data, image_url=None):
+    """structured 데이터 → markets 행"""
+    if image_url is None:
+        image_url = data.get("image_url") or (data.get("_source") or {}).get("image_url", "")
+    row = {
+        "market_name": data.get("market_name", "제목 미정"),
+        "place": data.get("place", ""),
+        "url": data["url"],
+        "image_url": image_url or "",
+    }
+    # 좌표는 키가 있을 때만 (키가 없으면 Supabase의 기존 좌표 유지, 값이 None이면 장소 변경으로 좌표 초기화)
+    if "lat" in data and "lng" in data:
+        row["lat"], row["lng"] = data["lat"], data["lng"]
+    return row
+
+
+def session_row(market_id, session):
+    """structured 세션 → sessions 행 ("미정" 값을 적절히 변환)"""
+    return {
+        "market_id": market_id,
+        "start_date": sanitize_value(session.get("start_date")),
+        "end_date": sanitize_value(session.get("end_date")),
+        "start_time": sanitize_value(session.get("start_time")),
+        "end_time": sanitize_value(session.get("end_time")),
+        "notes": session.get("notes", "") or "",
+    }
+
+
+def upsert_markets(records, chunk_size=MARKET_CHUNK_SIZE):
+    """
+    markets를 청크 단위로 upsert (on_conflict=url, markets.url에 UNIQUE 제약 필요)
+
+    Returns:
+        (url → market_id, 실패한 url 집합)
+    """
+    ids = {}
+    failed = set()
+    # 다중 행 upsert는 컬럼이 같은 행끼리 (섞이면 좌표 없는 행의 lat/lng가 NULL로 저장됨)
+    groups = {}
+    for data in records:
+        row = market_row(data)
+        groups.setdefault(tuple(row), []).append(row)
+    chunks = [chunk for rows in groups.values() for chunk in _chunks(rows, chunk_size)]
+
+    for chunk in chunks:
+        urls = [row["url"] for row in chunk]
+        try:
+            response = _execute_with_retry(
+                "markets upsert",
+                lambda: get_supabase().table("markets").upsert(chunk, on_conflict="url"),
+            )
+            for row in response.data:
+                ids[row["url"]] = row["id"]
+        except Exception as e:
+            print(f"  ❌ markets 청크 저장 실패 ({len(chunk)}개): {e}")
+            failed.update(urls)
+
+    return ids, failed
+
+
+def update_coordinates_by_url(rows, chunk_size=MARKET_CHUNK_SIZE):
+    """
+    url 기준으로 좌표만 갱신 (행사명/장소는 건드리지 않음)
+    - 같은 좌표(같은 장소)의 행사는 url 목록으로 묶어 update 1번
+    - 행에 "place"가 있으면 장소가 그대로인 행사만 갱신 (지오코딩 중에 장소가 바뀐 행사에 예전 좌표 방지)
+
+    Args:
+        rows: {"url", "lat", "lng"} (+ 선택 "place": 지오코딩한 장소)
+
+    Returns:
+        (반영한 행 수, 보낸 요청 수, 실패한 url 집합)
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault((row["lat"], row["lng"], row.get("place")), []).append(row["url"])
+
+    updated = 0
+    sent = 0
+    failed = set()
+    for (lat, lng, place), urls in groups.items():
+        for chunk in _chunks(urls, chunk_size):
+            sent += 1
+
+            def build_query():
+                query = get_supabase().table("markets").update({"lat": lat, "lng": lng}).in_("url", chunk)
+                return query.eq("place", place) if place is not None else query
+
+            try:
+                response = _execute_with_retry("markets 좌표 update", build_query)
+                updated += len(response.data) if response.data is not None else len(chunk)
+            except Exception as e:
+                print(f"  ❌ 좌표 갱신 실패 ({len(chunk)}개): {e}")
+                failed.update(chunk)
+    return updated, sent, failed
+
+
+def insert_sessions(rows, chunk_size=SESSION_CHUNK_SIZE):
+    """
+    sessions 행을 청크 단위 다중 행 insert
+    - insert는 멱등이 아니므로 일시적 오류 후에는 현재 세션을 다시 조회해 빠진 행만 재전송
+      (타임아웃 전에 커밋된 insert를 그대로 다시 보내면 세션이 중복됨)
+
+    Returns:
+        실패한 market_id 집합
+    """
+    failed = set()
+    for chunk in _chunks(rows, chunk_size):
+        pending = chunk
+        for attempt in range(MAX_RETRIES):
+            try:
+                _execute_with_retry(
+                    "sessions insert",
+                    lambda pending=pending: get_supabase().table("sessions").insert(pending),
+                    idempotent=False,
+                )
+                break
+            except Exception as e:
+                if not is_transient(e) or attempt == MAX_RETRIES - 1:
+                    print(f"  ❌ sessions 청크 저장 실패 ({len(chunk)}개): {e}")
+                    failed.update(row["market_id"] for row in chunk)
+                    break
+                _count("retries")
+                wait = random.uniform(0, BACKOFF_BASE * (2 ** attempt))
+                print(f"  ⚠️  sessions insert 실패 ({e}) → {wait:.1f}초 후 반영 여부 확인 후 재시도")
+                time.sleep(wait)
+                pending = _missing_sessions(pending)
+                if pending is None:
+                    failed.update(row["market_id"] for row in chunk)
+                    break
+                if not pending:
+                    break
+    return failed
+
+
+def _missing_sessions(rows):
+    """
+    insert한 세션 행 중 Supabase에 아직 없는 행 (조회 실패 시 None)
+    """
+    by_market = {}
+    for row in rows:
+        by_market.setdefault(row["market_id"], []).append(row)
+    existing, lookup_failed = fetch_sessions(by_market.keys())
+    if lookup_failed:
+        return None
+    missing = []
+    for market_id, new_rows in by_market.items():
+        missing.extend(diff_sessions(existing[market_id], new_rows)[0])
+    return missing
+
+
+def delete_sessions(session_ids, chunk_size=SESSION_CHUNK_SIZE):
+    """
+    세션 id 목록을 청크 단위로 삭제
+
+    Returns:
+        삭제에 실패한 세션 id 집합
+    """
+    failed = set()
+    session_ids = list(session_ids)
+    for chunk in _chunks(session_ids, chunk_size):
+        try:
+            _execute_with_retry("sessions delete", lambda: get_supabase().table("sessions").delete().in_("id", chunk))
+        except Exception as e:
+            print(f"  ❌ sessions 청크 삭제 실패 ({len(chunk)}개): {e}")
+            failed.update(chunk)
+    return failed
+
+
+def iter_rows(table, columns="*", filters=(), page_size=READ_PAGE_SIZE):
+    """
+    테이블을 id 순 keyset 페이지로 스트리밍 조회 (제너레이터, 메모리 사용량은 페이지 크기만큼)
+    - offset 방식과 달리 조회 중 행이 필터에서 빠져도(예: 좌표 채움) 건너뛰는 행이 없음
+    - 페이지마다 청크 재시도 적용
+
+    Args:
+        columns: 가져올 컬럼 ("id"가 없으면 자동 추가)
+        filters: 서버 필터 [(메서드, 인자...)]
+                 예) [("is_", "lat", "null")], [("in_", "market_id", ids)], [("or_", "lat.is.null,lng.is.null")]
+        page_size: 요청 1번에 가져올 행 수
+
+    Yields:
+        행 dict
+    """
+    if columns != "*" and "id" not in [c.strip() for c in columns.split(",")]:
+        columns = "id, " + columns
+
+    last_id = None
+    while True:
+        def build_query():
+            query = get_supabase().table(table).select(columns)
+            for method, *args in filters:
+                query = getattr(query, method)(*args)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            return query.order("id").limit(page_size)
+
+        rows = _execute_with_retry(f"{table} select", build_query).data
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def count_rows(table, filters=()):
+    """필터에 맞는 행 수 (행은 가져오지 않음)"""
+    query = get_supabase().table(table).select("id", count="exact")
+    for method, *args in filters:
+        query = getattr(query, method)(*args)
+    return query.limit(1).execute().count
+
+
+def fetch_sessions(market_ids, chunk_size=SESSION_LOOKUP_CHUNK):
+    """
+    여러 행사의 기존 세션 조회 (id 순 페이지 단위)
+
+    Returns:
+        (market_id → 세션 행 리스트, 조회에 실패한 market_id 집합)
+    """
+    columns = "id, market_id, " + ", ".join(SESSION_KEY_COLUMNS)
+    sessions = {market_id: [] for market_id in market_ids}
+    failed = set()
+
+    for chunk in _chunks(list(sessions), chunk_size):
+        try:
+            for row in iter_rows("sessions", columns, [("in_", "market_id", chunk)]):
+                sessions[row["market_id"]].append(row)
+        except Exception as e:
+            print(f"  ❌ 기존 세션 조회 실패 ({len(chunk)}개 행사): {e}")
+            failed.update(chunk)
+
+    return sessions, failed
+
+
+def session_key(row):
+    """세션 자연 키 (DB의 TIME 값 "10:00:00"과 입력값 "10:00"을 같게 취급)"""
+    key = []
+    for column in SESSION_KEY_COLUMNS:
+        value = row.get(column) or ""
+        if column.endswith("_time"):
+            value = value[:5]
+        key.append(value)
+    return tuple(key)
+
+
+def diff_sessions(existing_rows, new_rows):
+    """
+    기존 세션과 새 세션 비교 (같은 키가 여러 개면 개수까지 맞춤)
+
+    Returns:
+        (추가할 행 리스트, 삭제할 세션 id 리스트, 변경 없는 세션 수)
+    """
+    remaining = {}
+    for row in existing_rows:
+        remaining.setdefault(session_key(row), []).append(row["id"])
+
+    to_insert = []
+    unchanged = 0
+    for row in new_rows:
+        ids = remaining.get(session_key(row))
+        if ids:
+            ids.pop()
+            unchanged += 1
+        else:
+            to_insert.append(row)
+
+    to_delete = [session_id for ids in remaining.values() for session_id in ids]
+    return to_insert, to_delete, unchanged
+
+
+def sync_sessions(sessions_by_market):
+    """
+    행사별 세션을 기존 행과 비교해 필요한 추가/삭제만 일괄 전송
+
+    Args:
+        sessions_by_market: market_id → structured 세션 리스트
+
+    Returns:
+        {"unchanged", "added", "removed", "failed_ids"(실패한 market_id 집합), "failed"(개수)}
+    """
+    existing, failed_ids = fetch_sessions(sessions_by_market.keys())
+
+    inserts = []
+    deletes = {}
+    unchanged = 0
+    for market_id, sessions in sessions_by_market.items():
+        if market_id in failed_ids:
+            continue
+        new_rows = [session_row(market_id, session) for session in sessions]
+        to_insert, to_delete, same = diff_sessions(existing[market_id], new_rows)
+        inserts.extend(to_insert)
+        for session_id in to_delete:
+            deletes[session_id] = market_id
+        unchanged += same
+
+    failed_deletes = delete_sessions(deletes)
+    failed_ids |= {deletes[session_id] for session_id in failed_deletes}
+    failed_ids |= insert_sessions(inserts)
+
+    return {
+        "unchanged": unchanged,
+        "added": sum(1 for row in inserts if row["market_id"] not in failed_ids),
+        "removed": len(deletes) - len(failed_deletes),
+        "failed_ids": failed_ids,
+        "failed": len(failed_ids),
+    }
+
+
+def _save_chunk(chunk):
+    """행사 청크 1개 동기화 (upsert → 세션 차이 반영, 같은 행사의 요청은 이 안에서 순서대로)"""
+    ids, failed_urls = upsert_markets(chunk, len(chunk))
+    sessions = sync_sessions({
+        ids[data["url"]]: data.get("sessions", []) for data in chunk if data["url"] in ids
+    })
+    failed_urls |= {url for url, market_id in ids.items() if market_id in sessions["failed_ids"]}
+    failed_urls |= {data["url"] for data in chunk} - set(ids)
+    _count("markets_saved", len(chunk) - len(failed_urls))
+    return failed_urls, sessions
+
+
+def save_many(records, chunk_size=MARKET_CHUNK_SIZE, workers=WRITE_WORKERS):
+    """
+    structured 데이터 여러 개를 일괄 동기화 (markets upsert → sessions 차이만 반영)
+    - 행사 1,000개 기준 요청 수십 번 (행사마다 select/update/insert 하던 save_to_db 대비)
+    - 청크마다 작업 1개, 최대 workers개 청크를 동시에 처리
+    - 재시도는 요청 단위, 실패한 청크의 행사만 failed로 집계
+
+    Args:
+        records: structured 데이터 iterable (image_url은 _source.image_url 사용)
+
+    Returns:
+        {"saved", "failed", "sessions_unchanged", "sessions_added", "sessions_removed"} 개수
+        + "failed_urls" (저장 실패한 url 리스트)
+    """
+    # 같은 url이 한 upsert에 두 번 들어가면 Postgres가 거부 → 마지막 값만 사용
+    by_url = {}
+    failed_count = 0
+    for data in records:
+        if not data.get("url"):
+            failed_count += 1
+            continue
+        by_url[data["url"]] = data
+
+    print(f"☁️  Supabase 일괄 동기화: {len(by_url)}개 행사")
+    failed_urls = set()
+    sessions = Counter()
+    for chunk_failed, chunk_sessions in run_in_pool(_save_chunk, _chunks(list(by_url.values()), chunk_size), workers):
+        failed_urls |= chunk_failed
+        for key in ("unchanged", "added", "removed"):
+            sessions[key] += chunk_sessions[key]
+
+    result = {
+        "saved": len(by_url) - len(failed_urls),
+        "failed": failed_count + len(failed_urls),
+        "sessions_unchanged": sessions["unchanged"],
+        "sessions_added": sessions["added"],
+        "sessions_removed": sessions["removed"],
+        "failed_urls": sorted(failed_urls),
+    }
+    print(f"  ✅ 저장 {result['saved']}개 / 실패 {result['failed']}개")
+    print(f"  🗓️  세션 유지 {result['sessions_unchanged']}개 / 추가 {result['sessions_added']}개"
+          f" / 삭제 {result['sessions_removed']}개")
+    return result
+
+
+def _delete_chunk(chunk):
+    """url 청크 1개 삭제 → (삭제한 행사 수, 실패한 url 리스트)"""
+    try:
+        response = _execute_with_retry(
+            "markets select", lambda: get_supabase().table("markets").select("id").in_("url", chunk)
+        )
+        market_ids = [row["id"] for row in response.data]
+        if market_ids:
+            _execute_with_retry(
+                "sessions delete", lambda: get_supabase().table("sessions").delete().in_("market_id", market_ids)
+            )
+            _execute_with_retry(
+                "markets delete", lambda: get_supabase().table("markets").delete().in_("id", market_ids)
+            )
+        _count("markets_deleted", len(market_ids))
+        return len(market_ids), []
+    except Exception as e:
+        print(f"  ❌ markets 청크 삭제 실패 ({len(chunk)}개): {e}")
+        return 0, list(chunk)
+
+
+def delete_markets(urls, chunk_size=MARKET_CHUNK_SIZE, workers=WRITE_WORKERS):
+    """
+    url 목록의 행사 삭제 (세션 먼저 삭제 후 markets 삭제, 청크 단위로 동시 처리)
+
+    Returns:
+        (삭제한 행사 수, 실패한 url 리스트)
+    """
+    deleted = 0
+    failed = []
+    for chunk_deleted, chunk_failed in run_in_pool(_delete_chunk, _chunks(list(urls), chunk_size), workers):
+        deleted += chunk_deleted
+        failed.extend(chunk_failed)
+    return deleted, failed
+
+
 def get_all_markets():
-    """모든 행사 데이터 조회"""
+    """모든 행사 데이터 조회 (페이지 단위로 끝까지, 대량이면 iter_rows 사용)"""
     try:
-        response = supabase.table("markets").select("*").execute()
-        return response.data
+        return list(iter_rows("markets"))
     except Exception as e:
         print(f"❌ 데이터 조회 오류: {e}")
         return []
@@ -115,8 +662,7 @@ def get_all_markets():
 def get_market_sessions(market_id):
     """특정 행사의 모든 세션 조회"""
     try:
-        response = supabase.table("sessions").select("*").eq("market_id", market_id).execute()
-        return response.data
+        return list(iter_rows("sessions", filters=[("eq", "market_id", market_id)]))
     except Exception as e:
         print(f"❌ 세션 조회 오류: {e}")
         return []
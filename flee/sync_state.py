@@ -0,0 +1,261 @@
+"""
+변경분 동기화 상태 (fleamarket.db의 sync_state / sync_pushed 테이블)
+- 게시글별로 정규화한 structured 데이터의 해시를 저장
+- 싱크(local, supabase)별로 마지막으로 보낸 해시를 저장 → 해시가 다른 게시글만 전송
+- structured.json과 크롤링 원본(fleamarket_detail.json) 모두에서 사라진 게시글만 삭제 표시(tombstone)
+  → 싱크마다 삭제 1회 전송 (정제 실패로 structured.json에서만 빠진 게시글은 삭제하지 않음)
+- 한 번에 추적 중인 게시글의 MAX_TOMBSTONE_RATIO보다 많이 사라지면 입력 이상으로 보고 삭제 표시 생략
+- 모든 싱크에 삭제가 반영되면 삭제 표시 정리
+
+사용법:
+    python sync_state.py                    # 싱크별 대기 중인 변경/삭제 수
+    python sync_state.py --reset supabase   # 해당 싱크 전체 재전송
+"""
+import argparse
+import hashlib
+import json
+from datetime import datetime
+
+from db_manager import DB_PATH, LOOKUP_BATCH_SIZE, get_write_connection, init_db
+
+SINKS = ("local", "supabase")
+
+# 삭제 표시 해시
+TOMBSTONE = "deleted"
+
+# 게시글이 실제로 삭제됐는지 확인할 크롤링 원본
+DETAIL_FILE = "fleamarket_detail.json"
+
+# 한 번에 삭제 표시할 수 있는 최대 비율 (MIN_TOMBSTONE_GUARD개 이하는 비율과 무관하게 허용)
+MAX_TOMBSTONE_RATIO = 0.2
+MIN_TOMBSTONE_GUARD = 10
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _clean(value):
+    value = str(value or "").strip()
+    return "" if value == "미정" else value
+
+
+def normalize_record(data):
+    """싱크에 전송되는 필드만 정규화 (_source 메타데이터, 세션 순서는 해시에 영향 없음)"""
+    sessions = sorted(
+        [
+            _clean(session.get("start_date")),
+            _clean(session.get("end_date")),
+            _clean(session.get("start_time"))[:5],
+            _clean(session.get("end_time"))[:5],
+            str(session.get("notes") or "").strip(),
+        ]
+        for session in data.get("sessions") or []
+    )
+    return {
+        "url": data["url"],
+        "market_name": str(data.get("market_name") or "").strip(),
+        "place": _clean(data.get("place")),
+        "image_url": data.get("image_url") or (data.get("_source") or {}).get("image_url") or "",
+        "lat": data.get("lat"),
+        "lng": data.get("lng"),
+        "sessions": sessions,
+    }
+
+
+def content_hash(data):
+    """정규화한 structured 데이터의 해시"""
+    payload = json.dumps(normalize_record(data), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def load_source_urls(detail_file=DETAIL_FILE):
+    """크롤링 원본에 남아 있는 url 집합 (파일이 없거나 손상되면 None → 삭제 여부 확인 불가)"""
+    try:
+        with open(detail_file, "r", encoding="utf-8") as f:
+            return {d["url"] for d in json.load(f) if d.get("url")}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def record_snapshot(conn, records, mark_missing=True, source_urls=None):
+    """
+    현재 structured 데이터 해시를 sync_state에 반영
+
+    Args:
+        mark_missing: True면 이번 데이터와 크롤링 원본 모두에 없는 url을 삭제 표시
+        source_urls: 크롤링 원본에 남아 있는 url 집합 (None이면 삭제 여부를 알 수 없어 삭제 표시 안 함)
+
+    Returns:
+        url → 해시 (이번 데이터)
+    """
+    hashes = {data["url"]: content_hash(data) for data in records if data.get("url")}
+    now = datetime.now().strftime(TIME_FORMAT)
+
+    with conn:
+        conn.executemany(
+            """INSERT INTO sync_state (url, content_hash, updated_at) VALUES (?, ?, ?)
+               ON CONFLICT(url) DO UPDATE SET
+                   content_hash = excluded.content_hash,
+                   updated_at = excluded.updated_at
+               WHERE sync_state.content_hash != excluded.content_hash""",
+            [(url, digest, now) for url, digest in hashes.items()],
+        )
+        # 빈 데이터로 전체가 삭제 표시되는 사고 방지
+        if mark_missing and hashes and source_urls is not None:
+            tracked = [
+                url for (url,) in conn.execute("SELECT url FROM sync_state WHERE content_hash != ?", (TOMBSTONE,))
+            ]
+            # 정제 실패(--force 재처리 중 API 장애 등)로 structured.json에서만 빠진 게시글은 유지
+            missing = [url for url in tracked if url not in hashes and url not in source_urls]
+            if len(missing) > MIN_TOMBSTONE_GUARD and len(missing) > MAX_TOMBSTONE_RATIO * len(tracked):
+                print(f"⚠️  추적 중인 게시글 {len(tracked)}개 중 {len(missing)}개가 사라짐 → 입력 이상으로 보고 삭제 생략")
+                missing = []
+            conn.executemany(
+                "UPDATE sync_state SET content_hash = ?, updated_at = ? WHERE url = ?",
+                [(TOMBSTONE, now, url) for url in missing],
+            )
+
+    return hashes
+
+
+def pending_changes(conn, sink):
+    """
+    싱크에 아직 반영되지 않은 변경
+
+    Returns:
+        (변경/신규 url 집합, 삭제할 url 리스트)
+    """
+    changed = set()
+    deleted = []
+    for url, digest, pushed in conn.execute(
+        """SELECT s.url, s.content_hash, p.pushed_hash
+           FROM sync_state s LEFT JOIN sync_pushed p ON p.url = s.url AND p.sink = ?
+           WHERE p.pushed_hash IS NOT s.content_hash""",
+        (sink,),
+    ):
+        if digest != TOMBSTONE:
+            changed.add(url)
+        elif pushed is not None:
+            # 한 번도 보낸 적 없는 게시글은 삭제할 필요 없음
+            deleted.append(url)
+    return changed, deleted
+
+
+def plan_sync(records, sink, db_path=DB_PATH, detail_file=DETAIL_FILE):
+    """
+    structured 데이터 중 싱크에 보낼 것만 선택
+
+    Args:
+        detail_file: 게시글 삭제 여부를 확인할 크롤링 원본
+
+    Returns:
+        (보낼 structured 데이터 리스트, 삭제할 url 리스트, 변경 없는 게시글 수)
+    """
+    source_urls = load_source_urls(detail_file)
+    conn = get_write_connection(db_path)
+    try:
+        init_db(conn)
+        hashes = record_snapshot(conn, records, source_urls=source_urls)
+        changed, deleted = pending_changes(conn, sink)
+    finally:
+        conn.close()
+
+    # 같은 url이 여러 번 있으면 마지막 값 사용 (해시도 마지막 값 기준)
+    latest = {data["url"]: data for data in records if data.get("url") in changed}
+    return list(latest.values()), deleted, len(hashes) - len(latest)
+
+
+def mark_pushed(sink, urls, db_path=DB_PATH):
+    """
+    싱크에 반영된 url의 현재 해시를 기록 (삭제 표시는 모든 싱크 반영 후 정리)
+
+    Returns:
+        기록한 url 수
+    """
+    urls = list(urls)
+    now = datetime.now().strftime(TIME_FORMAT)
+    conn = get_write_connection(db_path)
+    try:
+        init_db(conn)
+        with conn:
+            for start in range(0, len(urls), LOOKUP_BATCH_SIZE):
+                batch = urls[start:start + LOOKUP_BATCH_SIZE]
+                conn.execute(
+                    f"""INSERT INTO sync_pushed (url, sink, pushed_hash, pushed_at)
+                        SELECT url, ?, content_hash, ? FROM sync_state
+                        WHERE url IN ({",".join("?" * len(batch))})
+                        ON CONFLICT(url, sink) DO UPDATE SET
+                            pushed_hash = excluded.pushed_hash,
+                            pushed_at = excluded.pushed_at""",
+                    [sink, now, *batch],
+                )
+            purge_tombstones(conn)
+    finally:
+        conn.close()
+    return len(urls)
+
+
+def record_pushed(conn, sink, hashes):
+    """
+    싱크에 실제로 보낸 해시 기록 (호출측 트랜잭션 안에서 실행)
+
+    Args:
+        hashes: url → 보낸 상태의 해시 (삭제는 TOMBSTONE)
+    """
+    now = datetime.now().strftime(TIME_FORMAT)
+    conn.executemany(
+        """INSERT INTO sync_pushed (url, sink, pushed_hash, pushed_at) VALUES (?, ?, ?, ?)
+           ON CONFLICT(url, sink) DO UPDATE SET
+               pushed_hash = excluded.pushed_hash,
+               pushed_at = excluded.pushed_at""",
+        [(url, sink, digest, now) for url, digest in hashes.items()],
+    )
+    purge_tombstones(conn)
+
+
+def purge_tombstones(conn):
+    """삭제가 남아 있는 싱크가 없는 삭제 표시 정리"""
+    conn.execute(
+        """DELETE FROM sync_state
+           WHERE content_hash = ?
+             AND NOT EXISTS (
+                 SELECT 1 FROM sync_pushed p WHERE p.url = sync_state.url AND p.pushed_hash != ?
+             )""",
+        (TOMBSTONE, TOMBSTONE),
+    )
+    conn.execute("DELETE FROM sync_pushed WHERE url NOT IN (SELECT url FROM sync_state)")
+
+
+def reset_sink(sink, db_path=DB_PATH):
+    """싱크의 전송 기록 삭제 → 다음 실행에서 전체 재전송"""
+    conn = get_write_connection(db_path)
+    try:
+        init_db(conn)
+        with conn:
+            removed = conn.execute("DELETE FROM sync_pushed WHERE sink = ?", (sink,)).rowcount
+    finally:
+        conn.close()
+    return removed
+
+
+def print_status(db_path=DB_PATH):
+    conn = get_write_connection(db_path)
+    try:
+        init_db(conn)
+        total = conn.execute("SELECT COUNT(*) FROM sync_state WHERE content_hash != ?", (TOMBSTONE,)).fetchone()[0]
+        print(f"📊 추적 중인 게시글: {total}개")
+        for sink in SINKS:
+            changed, deleted = pending_changes(conn, sink)
+            print(f"  [{sink}] 전송 대기 {len(changed)}개 / 삭제 대기 {len(deleted)}개")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="변경분 동기화 상태 확인")
+    parser.add_argument("--reset", choices=SINKS, help="해당 싱크 전송 기록 삭제 (전체 재전송)")
+    args = parser.parse_args()
+
+    if args.reset:
+        print(f"🔄 [{args.reset}] 전송 기록 {reset_sink(args.reset)}개 삭제 → 다음 실행에서 전체 재전송")
+    else:
+        print_status()
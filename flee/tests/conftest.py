@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# flee/ 모듈을 패키지 없이 import (스크립트 실행과 같은 방식)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
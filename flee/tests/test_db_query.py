@@ -0,0 +1,70 @@
+"""db_query 쿼리 플랜 회귀 테스트 (임시 DB에 예시 데이터를 넣고 EXPLAIN QUERY PLAN 확인)"""
+import pytest
+
+import db_manager
+import db_query
+
+
+def _record(i):
+    day = f"2025-{10 + i % 3:02d}-{1 + i % 28:02d}"
+    return {
+        "url": f"https://example.com/post/{i}",
+        "market_name": "빈티지 플리마켓" if i == 0 else f"망원 플리마켓 {i}",
+        "place": f"서울특별시 마포구 망원동 {i}",
+        "lat": 37.54 + (i % 50) * 0.001,
+        "lng": 126.89 + (i % 50) * 0.001,
+        "sessions": [{"start_date": day, "end_date": day, "start_time": "11:00", "end_time": "18:00", "notes": ""}],
+    }
+
+
+@pytest.fixture
+def query_db(tmp_path):
+    db_path = str(tmp_path / "fleamarket.db")
+    db_manager.save_many([_record(i) for i in range(200)], db_path=db_path)
+    db_query.close()
+    db_query.get_read_connection(db_path).execute("ANALYZE")
+    yield db_path
+    db_query.close()
+
+
+@pytest.mark.parametrize("name", sorted(db_query.QUERIES))
+def test_query_uses_expected_index(query_db, name):
+    plan = db_query.explain(name)
+    assert any(db_query.EXPECTED_PLANS[name] in detail for detail in plan), plan
+    assert not [d for d in plan if d.startswith("SCAN") and "VIRTUAL TABLE" not in d], plan
+
+
+def test_check_query_plans_reports_no_regressions(query_db):
+    assert db_query.check_query_plans(verbose=False) == []
+
+
+def test_queries_return_rows(query_db):
+    assert db_query.upcoming_sessions(5, today="2025-10-01")
+    assert db_query.markets_by_place_prefix("서울특별시 마포구")
+    assert db_query.markets_in_bbox(37.54, 126.89, 37.60, 126.95, "2025-10-01", "2025-12-31")
+
+
+def test_search_ranks_all_matches(query_db):
+    # 가장 오래된 글(rowid 1)도 순위 계산 대상
+    results = db_query.search("빈티지", limit=5)
+    assert [r["url"] for r in results] == ["https://example.com/post/0"]
+    assert "[빈티지]" in results[0]["snippet"]
+
+    results = db_query.search("플리마켓", limit=5)
+    assert len(results) == 5
+    assert [r["score"] for r in results] == sorted(r["score"] for r in results)
+
+
+def test_short_keyword_search(query_db):
+    results = db_query.search("망원", limit=3)
+    assert len(results) == 3
+    assert all("망원" in r["snippet"] for r in results)
+
+
+@pytest.mark.parametrize("start, end", [("다음주", None), ("2025-11-01", "언젠가"), ("2025.13.45", None)])
+def test_invalid_dates_raise_value_error(query_db, start, end):
+    with pytest.raises(ValueError):
+        db_query.markets_in_bbox(37.54, 126.89, 37.60, 126.95, start, end)
+    if end is not None:
+        with pytest.raises(ValueError):
+            db_query.markets_active_between(start, end)
@@ -0,0 +1,56 @@
+"""gazetteer.Gazetteer.match 점수 (번들 CSV + 숫자 있는 이력 키)"""
+import pytest
+
+from gazetteer import GAZETTEER_MIN_CONFIDENCE, Gazetteer
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    gazetteer = Gazetteer()
+    gazetteer.load_csv()
+    gazetteer.add("망원동 125-4", 37.5551, 126.9040, "history")
+    return gazetteer
+
+
+def _match(gazetteer, place):
+    entry, score = gazetteer.match(place)
+    return (entry["name"] if entry else None), score
+
+
+@pytest.mark.parametrize("place, name", [
+    ("홍대입구역", "홍대입구역"),
+    ("홍대입구역 9번 출구 앞", "홍대입구역"),
+    ("서울특별시 마포구 망원한강공원", "망원한강공원"),
+    ("서울 중구 시청역", "시청역"),
+    ("종로3가역 1번 출구", "종로3가역"),
+    ("망원동 125-4", "망원동 125-4"),
+])
+def test_confident_matches(gazetteer, place, name):
+    matched, score = _match(gazetteer, place)
+    assert matched == name
+    assert score >= GAZETTEER_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("place", [
+    # 사전 이름이 더 긴 단어의 일부
+    "부천시청역",
+    "대전시청역 광장",
+    "남동대문역",
+    "구서울역",
+    # 다른 지역/자치구
+    "대전 시청역",
+    "부천시 시청역",
+    "은평구 신사역",
+    # 번지가 다른 주소
+    "망원동 123-4",
+    "망원동 1234",
+    "망원동 125",
+])
+def test_low_confidence(gazetteer, place):
+    _, score = _match(gazetteer, place)
+    assert score < GAZETTEER_MIN_CONFIDENCE
+
+
+def test_other_region_is_low_confidence_not_miss(gazetteer):
+    assert gazetteer.lookup("대전 시청역") is None
+    assert gazetteer.stats["low_confidence"] >= 1
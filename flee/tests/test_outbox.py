@@ -0,0 +1,147 @@
+"""outbox 대기열 순서/백오프/좌표 항목 정리 (Supabase 전송은 _replicate를 대체해 확인)"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import outbox
+from db_manager import get_write_connection, init_db, save_many, update_coordinates
+from outbox import TIME_FORMAT, drain_outbox
+
+
+def _record(i, place="망원한강공원"):
+    return {
+        "url": f"u{i}",
+        "market_name": f"플리마켓 {i}",
+        "place": place,
+        "sessions": [{"start_date": "2025-11-01", "end_date": "2025-11-01"}],
+    }
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "fleamarket.db")
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = get_write_connection(db_path)
+    init_db(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def replicated(monkeypatch):
+    """_replicate 대체: 호출마다 (latest, coords)를 기록, fail에 든 url은 실패 처리"""
+    calls = []
+    fail = set()
+
+    def fake_replicate(latest, coords):
+        calls.append(({url: (entry[2], json.loads(entry[3] or "null")) for url, entry in latest.items()},
+                      {url: json.loads(entry[3]) for url, entry in coords.items()}))
+        urls = set(latest) | set(coords)
+        return {url: "실패" for url in urls & fail}, {}
+
+    monkeypatch.setattr(outbox, "_replicate", fake_replicate)
+    replicated.calls, replicated.fail = calls, fail
+    return replicated
+
+
+def _outbox(conn):
+    return conn.execute("SELECT url, op, attempts FROM outbox ORDER BY id").fetchall()
+
+
+def test_latest_state_per_url_is_sent_once(db_path, conn, replicated):
+    save_many([_record(1), _record(2)], db_path=db_path, outbox=True)
+    save_many([_record(1, place="서울숲")], skip_existing=False, db_path=db_path, outbox=True)
+
+    stats = drain_outbox(db_path=db_path)
+    (latest, coords), = replicated.calls
+    assert latest["u1"] == ("upsert", latest["u1"][1]) and latest["u1"][1]["place"] == "서울숲"
+    assert set(latest) == {"u1", "u2"} and coords == {}
+    assert (stats["applied"], stats["failed"], stats["pending"]) == (2, 0, 0)
+    assert _outbox(conn) == []
+
+
+def test_pushed_hashes_match_replicated_state(db_path, conn, replicated):
+    from sync_state import content_hash, pending_changes, record_snapshot
+
+    record = _record(1, place="서울숲")
+    save_many([_record(1)], db_path=db_path, outbox=True)
+    save_many([record], skip_existing=False, db_path=db_path, outbox=True)
+    # 파이프라인처럼 현재 structured 상태를 sync_state에 기록한 뒤 복제
+    record_snapshot(conn, [record], source_urls={"u1"})
+    assert pending_changes(conn, "supabase")[0] == {"u1"}
+    drain_outbox(db_path=db_path)
+
+    pushed = dict(conn.execute("SELECT url, pushed_hash FROM sync_pushed WHERE sink = 'supabase'"))
+    assert pushed == {"u1": content_hash(record)}
+    assert pending_changes(conn, "supabase") == (set(), [])
+
+
+def test_coords_before_a_later_upsert_are_dropped(db_path, conn, replicated):
+    save_many([_record(1), _record(2), _record(3)], db_path=db_path, outbox=True)
+    drain_outbox(db_path=db_path)
+
+    update_coordinates({"u1": (37.1, 126.1), "u2": (37.2, 126.2)}, db_path=db_path, outbox=True)
+    # u1은 장소가 바뀜 (로컬 좌표 초기화), u2는 그대로 다시 저장
+    save_many([_record(1, place="서울숲"), _record(2)], skip_existing=False, db_path=db_path, outbox=True)
+    update_coordinates({"u3": (37.3, 126.3)}, db_path=db_path, outbox=True)
+    drain_outbox(db_path=db_path)
+
+    latest, coords = replicated.calls[-1]
+    assert coords == {"u3": {"url": "u3", "lat": 37.3, "lng": 126.3}}
+    # 장소가 바뀐 행사는 좌표를 null로, 그대로인 행사는 로컬 좌표를 upsert에 실어 보냄
+    assert (latest["u1"][1]["lat"], latest["u1"][1]["lng"]) == (None, None)
+    assert (latest["u2"][1]["lat"], latest["u2"][1]["lng"]) == (37.2, 126.2)
+
+
+def test_delete_drops_pending_coords(db_path, conn, replicated):
+    from db_manager import delete_markets
+
+    save_many([_record(1)], db_path=db_path, outbox=True)
+    update_coordinates({"u1": (37.1, 126.1)}, db_path=db_path, outbox=True)
+    delete_markets(["u1"], db_path=db_path, outbox=True)
+    drain_outbox(db_path=db_path)
+
+    (latest, coords), = replicated.calls
+    assert latest == {"u1": ("delete", None)} and coords == {}
+
+
+def test_failed_url_backs_off_and_blocks_later_entries(db_path, conn, replicated):
+    save_many([_record(1), _record(2)], db_path=db_path, outbox=True)
+    replicated.fail.add("u1")
+    stats = drain_outbox(db_path=db_path)
+    assert (stats["applied"], stats["failed"], stats["pending"]) == (1, 1, 1)
+    assert _outbox(conn) == [("u1", "upsert", 1)]
+
+    # 백오프 중에는 같은 url의 새 항목도 보내지 않음
+    replicated.fail.clear()
+    save_many([_record(1, place="서울숲")], skip_existing=False, db_path=db_path, outbox=True)
+    assert outbox._next_batch(conn, 10) == []
+    drain_outbox(db_path=db_path)
+    assert len(replicated.calls) == 1
+
+    # 대기 시간이 지나면 마지막 상태만 전송
+    past = (datetime.now() - timedelta(seconds=1)).strftime(TIME_FORMAT)
+    with conn:
+        conn.execute("UPDATE outbox SET next_attempt_at = ?", (past,))
+    drain_outbox(db_path=db_path)
+    latest, _ = replicated.calls[-1]
+    assert latest["u1"][1]["place"] == "서울숲"
+    assert _outbox(conn) == []
+
+
+def test_next_batch_orders_urls_by_oldest_entry(db_path, conn):
+    save_many([_record(1), _record(2), _record(3)], db_path=db_path, outbox=True)
+    save_many([_record(1, place="서울숲")], skip_existing=False, db_path=db_path, outbox=True)
+
+    batch = outbox._next_batch(conn, 2)
+    assert [(entry[1], entry[2]) for entry in batch] == [("u1", "upsert"), ("u2", "upsert"), ("u1", "upsert")]
+
+
+def test_backoff_delay_is_capped():
+    assert outbox.backoff_delay(1) == timedelta(seconds=outbox.BASE_BACKOFF_SECONDS)
+    assert outbox.backoff_delay(3) == timedelta(seconds=outbox.BASE_BACKOFF_SECONDS * 4)
+    assert outbox.backoff_delay(50) == timedelta(seconds=outbox.MAX_BACKOFF_SECONDS)
@@ -0,0 +1,122 @@
+"""sync_state 변경분 계산 / 삭제 표시(tombstone) 보호 조건"""
+import json
+
+import pytest
+
+from db_manager import get_write_connection, init_db
+from sync_state import TOMBSTONE, mark_pushed, pending_changes, plan_sync, record_snapshot
+
+
+def _record(i, place="망원한강공원"):
+    return {
+        "url": f"https://example.com/post/{i}",
+        "market_name": f"플리마켓 {i}",
+        "place": place,
+        "sessions": [{"start_date": "2025-11-01", "end_date": "2025-11-01", "start_time": "11:00"}],
+    }
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "fleamarket.db")
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = get_write_connection(db_path)
+    init_db(conn)
+    yield conn
+    conn.close()
+
+
+def _hashes(conn):
+    return dict(conn.execute("SELECT url, content_hash FROM sync_state"))
+
+
+def _snapshot_pushed(conn, db_path, records):
+    """records를 기록하고 local 싱크에 반영된 상태로 만듦"""
+    record_snapshot(conn, records, source_urls={r["url"] for r in records})
+    mark_pushed("local", [r["url"] for r in records], db_path)
+
+
+def test_pending_changes_only_reports_changed_records(conn, db_path):
+    records = [_record(i) for i in range(3)]
+    _snapshot_pushed(conn, db_path, records)
+    assert pending_changes(conn, "local") == (set(), [])
+
+    records[1] = _record(1, place="서울숲")
+    record_snapshot(conn, records, source_urls={r["url"] for r in records})
+    changed, deleted = pending_changes(conn, "local")
+    assert changed == {records[1]["url"]}
+    assert deleted == []
+    # 다른 싱크는 아직 아무것도 보내지 않음
+    assert pending_changes(conn, "supabase")[0] == {r["url"] for r in records}
+
+
+def test_tombstone_only_when_gone_from_crawl_source(conn, db_path):
+    records = [_record(i) for i in range(3)]
+    _snapshot_pushed(conn, db_path, records)
+
+    # post/1은 정제 실패로 structured에서만 빠짐, post/2는 크롤링 원본에서도 사라짐
+    kept = [records[0]]
+    record_snapshot(conn, kept, source_urls={records[0]["url"], records[1]["url"]})
+    hashes = _hashes(conn)
+    assert hashes[records[1]["url"]] != TOMBSTONE
+    assert hashes[records[2]["url"]] == TOMBSTONE
+    assert pending_changes(conn, "local") == (set(), [records[2]["url"]])
+
+
+def test_no_tombstones_without_source_urls(conn, db_path):
+    records = [_record(i) for i in range(3)]
+    _snapshot_pushed(conn, db_path, records)
+
+    record_snapshot(conn, records[:1], source_urls=None)
+    assert TOMBSTONE not in _hashes(conn).values()
+
+
+def test_mass_disappearance_is_not_tombstoned(conn, db_path):
+    records = [_record(i) for i in range(50)]
+    _snapshot_pushed(conn, db_path, records)
+
+    # 50개 중 20개(> 20%, > MIN_TOMBSTONE_GUARD)가 한 번에 사라지면 입력 이상으로 보고 생략
+    kept = records[:30]
+    record_snapshot(conn, kept, source_urls={r["url"] for r in kept})
+    assert TOMBSTONE not in _hashes(conn).values()
+
+    # 보호 한도 이하의 소량 삭제는 반영
+    kept = records[:45]
+    record_snapshot(conn, kept, source_urls={r["url"] for r in kept})
+    assert list(_hashes(conn).values()).count(TOMBSTONE) == 5
+
+
+def test_tombstones_are_purged_after_every_sink_deletes(conn, db_path):
+    records = [_record(i) for i in range(3)]
+    _snapshot_pushed(conn, db_path, records)
+    mark_pushed("supabase", [r["url"] for r in records], db_path)
+
+    gone = records[2]["url"]
+    record_snapshot(conn, records[:2], source_urls={r["url"] for r in records[:2]})
+    mark_pushed("local", [gone], db_path)
+    assert gone in _hashes(conn)            # supabase에는 아직 삭제 전
+    mark_pushed("supabase", [gone], db_path)
+    assert gone not in _hashes(conn)
+
+
+def test_plan_sync_reads_detail_file(tmp_path, db_path):
+    records = [_record(i) for i in range(3)]
+    detail_file = tmp_path / "fleamarket_detail.json"
+    detail_file.write_text(json.dumps([{"url": r["url"]} for r in records]), encoding="utf-8")
+
+    changed, deleted, unchanged = plan_sync(records, "local", db_path, detail_file=str(detail_file))
+    assert [r["url"] for r in changed] == [r["url"] for r in records]
+    assert (deleted, unchanged) == ([], 0)
+    mark_pushed("local", [r["url"] for r in changed], db_path)
+
+    detail_file.write_text(json.dumps([{"url": r["url"]} for r in records[:2]]), encoding="utf-8")
+    changed, deleted, unchanged = plan_sync(records[:2], "local", db_path, detail_file=str(detail_file))
+    assert (changed, deleted, unchanged) == ([], [records[2]["url"]], 2)
+
+    # 크롤링 원본이 없으면 삭제 여부를 알 수 없어 삭제하지 않음
+    changed, deleted, _ = plan_sync(records[:1], "local", db_path, detail_file=str(tmp_path / "missing.json"))
+    assert deleted == [records[2]["url"]]   # 이전 실행의 삭제 표시만 남음 (post/1은 삭제 표시 안 함)
+